@@ -0,0 +1,113 @@
+"""
+Benchmark the c7n cleanup policies generated by
+:py:meth:`manheim_c7n_tools.policygen.PolicyGen._generate_cleanup_policies`,
+comparing the current single ``not-in`` value filter with the previous chain
+of one ``ne`` value filter per policy: generation time, size of the generated
+YAML, and time for c7n to evaluate the filters against a set of Lambda
+functions.
+
+Usage: ``python benchmarks/cleanup_filters.py [-r RESOURCES] [COUNT ...]``
+(default policy counts: 100 1000 10000)
+"""
+
+import argparse
+import logging
+import time
+from types import SimpleNamespace
+
+import yaml
+from c7n.filters.core import ValueFilter
+from tabulate import tabulate
+
+from manheim_c7n_tools.policygen import PolicyGen
+
+
+def ne_filters(names):
+    """Exclusion filters as previously generated; one ``ne`` per policy."""
+    return [
+        {'type': 'value', 'key': 'tag:Component', 'op': 'ne', 'value': n}
+        for n in ['c7n-cleanup-lambda', 'c7n-cleanup-cwe'] + names
+    ]
+
+
+def lambda_funcs(names, count):
+    """Lambda function resources; every other one is orphaned."""
+    res = []
+    for i in range(count):
+        if i % 2 == 0:
+            component = names[(i // 2) % len(names)]
+        else:
+            component = 'orphaned-%d' % i
+        res.append({
+            'FunctionName': 'custodian-%s' % component,
+            'Tags': [
+                {'Key': 'Project', 'Value': 'cloud-custodian'},
+                {'Key': 'Component', 'Value': component}
+            ]
+        })
+    return res
+
+
+def evaluate(filters, resources):
+    """Return the resources matching all filters, and the time taken."""
+    vfilters = [ValueFilter(f) for f in filters]
+    start = time.perf_counter()
+    matched = [r for r in resources if all(f.match(r) for f in vfilters)]
+    return matched, time.perf_counter() - start
+
+
+def run(count, num_resources):
+    names = ['policy-%05d' % i for i in range(count)]
+    policies = [{'name': n} for n in names]
+    pg = PolicyGen(SimpleNamespace(
+        account_name='bench', account_id='000000000000',
+        cleanup_notify=['bench@example.com']
+    ))
+    start = time.perf_counter()
+    lcleanup, cwecleanup = pg._generate_cleanup_policies(policies)
+    gen_time = time.perf_counter() - start
+    new_filters = lcleanup['filters'][2:]
+    old_filters = ne_filters(names)
+    old_policies = [
+        dict(lcleanup, filters=lcleanup['filters'][:2] + old_filters),
+        dict(cwecleanup, filters=cwecleanup['filters'][:1] + [
+            dict(f, key='Name', value='custodian-%s' % f['value'])
+            for f in old_filters
+        ])
+    ]
+    resources = lambda_funcs(names, num_resources)
+    old_matched, old_time = evaluate(old_filters, resources)
+    new_matched, new_time = evaluate(new_filters, resources)
+    assert old_matched == new_matched
+    return [
+        count,
+        '%.4f' % gen_time,
+        len(yaml.dump({'policies': old_policies})),
+        len(yaml.dump({'policies': [lcleanup, cwecleanup]})),
+        '%.4f' % old_time,
+        '%.4f' % new_time
+    ]
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('-r', '--resources', type=int, default=1000,
+                   help='number of Lambda functions to evaluate filters '
+                        'against (default: 1000)')
+    p.add_argument('COUNT', type=int, nargs='*',
+                   default=[100, 1000, 10000],
+                   help='numbers of policies to benchmark')
+    args = p.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(tabulate(
+        [run(c, args.resources) for c in args.COUNT],
+        headers=[
+            'Policies', 'Generate (s)', 'YAML bytes (ne)',
+            'YAML bytes (not-in)', 'Evaluate (s, ne)',
+            'Evaluate (s, not-in)'
+        ]
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark writing and loading a generated ``custodian_REGION`` config in each
+format that :py:class:`manheim_c7n_tools.policygen.PolicyGen` can write: YAML
+with the pure-Python dumper (as policygen used before), YAML with the
+libyaml-based ``CSafeDumper`` (if available), YAML with identical subtrees
+written as anchors and aliases (as policygen writes it), and JSON. Load times
+are for c7n's own ``c7n.utils.load_file()``, as used by the ``validate``,
+``mugc`` and ``custodian`` runner steps.
+
+Usage: ``python benchmarks/config_formats.py [COUNT ...]``
+(default policy counts: 500 2000 5000)
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import yaml
+from c7n.utils import load_file
+from tabulate import tabulate
+
+from manheim_c7n_tools.policygen import SafeDumper, share_subtrees
+
+
+def make_policies(count):
+    """Policies shaped like typical generated ones, with defaults applied."""
+    return {'policies': [
+        {
+            'name': 'policy-%05d' % i,
+            'resource': 'ec2',
+            'comment': 'Stop instances missing the Owner tag (%d)' % i,
+            'mode': {
+                'type': 'periodic',
+                'schedule': 'rate(1 day)',
+                'role': 'arn:aws:iam::123456789012:role/custodian',
+                'execution-options': {'output_dir': 's3://bucket/logs'},
+                'tags': {'Project': 'cloud-custodian', 'Component': str(i)}
+            },
+            'filters': [
+                {'tag:Owner': 'absent'},
+                {'type': 'marked-for-op', 'tag': 'c7n-stop', 'op': 'stop'},
+                {
+                    'type': 'value', 'key': 'LaunchTime',
+                    'value_type': 'age', 'op': 'greater-than', 'value': 7
+                }
+            ],
+            'actions': [
+                {'type': 'stop'},
+                {
+                    'type': 'notify',
+                    'to': ['resource-owner', 'team@example.com'],
+                    'transport': {
+                        'type': 'sqs',
+                        'queue': 'https://sqs.us-east-1.amazonaws.com/1/q'
+                    },
+                    'template': 'default.html',
+                    'subject': 'Stopped instance without an Owner tag'
+                }
+            ]
+        } for i in range(count)
+    ]}
+
+
+def write_formats(data):
+    """Yield (format name, file extension, writer callable) tuples."""
+    yield 'yaml (pure Python)', 'yml', lambda: yaml.dump(data)
+    if SafeDumper is not yaml.SafeDumper:
+        yield 'yaml (CSafeDumper)', 'yml', lambda: yaml.dump(
+            data, Dumper=SafeDumper
+        )
+    yield 'yaml (aliases)', 'yml', lambda: yaml.dump(
+        share_subtrees(data), Dumper=SafeDumper
+    )
+    yield 'json', 'json', lambda: json.dumps(data, sort_keys=True, indent=2)
+
+
+def run(count, tmpdir):
+    data = make_policies(count)
+    rows = []
+    for name, ext, writer in write_formats(data):
+        start = time.perf_counter()
+        content = writer()
+        write_time = time.perf_counter() - start
+        path = os.path.join(tmpdir, 'custodian_bench.%s' % ext)
+        with open(path, 'w') as fh:
+            fh.write(content)
+        start = time.perf_counter()
+        loaded = load_file(path)
+        load_time = time.perf_counter() - start
+        assert loaded == data
+        rows.append([
+            count, name, '%.3f' % write_time, '%.3f' % load_time, len(content)
+        ])
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('COUNT', type=int, nargs='*', default=[500, 2000, 5000],
+                   help='numbers of policies to benchmark')
+    args = p.parse_args()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for c in args.COUNT:
+            rows.extend(run(c, tmpdir))
+    print(tabulate(rows, headers=[
+        'Policies', 'Format', 'Write (s)', 'Load (s)', 'Bytes'
+    ]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the import time of the module behind each console script in
+``setup.py``, as reported by ``python -X importtime``, and check it against a
+per-entry-point budget. Each module is imported in a fresh interpreter
+several times, and the fastest run is reported, to reduce noise from disk
+caches and other load. Exits non-zero if any entry point is over budget.
+
+Usage: ``python benchmarks/import_time.py [-n RUNS] [-s SCALE]``
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+from tabulate import tabulate
+
+SETUP_PY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'setup.py'
+)
+
+#: Import time budget in milliseconds for each console script. ``policygen``
+#: and ``manheim-c7n-runner`` import c7n, c7n-mailer and sphinx only when they
+#: are needed; the others need boto3 (and ``mugc``, c7n) to do anything.
+BUDGETS = {
+    'policygen': 250,
+    's3-archiver': 400,
+    'dryrun-diff': 400,
+    'mugc': 1200,
+    'manheim-c7n-runner': 250,
+    'errorscan': 400
+}
+
+
+def console_scripts():
+    """Return a list of (name, module) for each console script in setup.py."""
+    with open(SETUP_PY) as fh:
+        tree = ast.parse(fh.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.keyword) and node.arg == 'entry_points':
+            entry_points = ast.literal_eval(node.value)
+            break
+    else:
+        raise RuntimeError('No entry_points in %s' % SETUP_PY)
+    res = []
+    for spec in entry_points['console_scripts']:
+        name, target = [x.strip() for x in spec.split('=')]
+        res.append((name, target.split(':')[0]))
+    return res
+
+
+def import_time(module):
+    """Return the cumulative import time of ``module`` in milliseconds."""
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    for line in reversed(p.stderr.splitlines()):
+        parts = [x.strip() for x in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError('No import time reported for %s' % module)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('-n', '--runs', type=int, default=5,
+                   help='number of times to import each module (default: 5)')
+    p.add_argument('-s', '--scale', type=float, default=1.0,
+                   help='multiply budgets by this factor, i.e. for slower '
+                        'machines (default: 1.0)')
+    args = p.parse_args()
+    rows = []
+    over = []
+    for name, module in console_scripts():
+        ms = min(import_time(module) for _ in range(args.runs))
+        budget = BUDGETS.get(name)
+        if budget is None:
+            status = 'NO BUDGET'
+            over.append(name)
+        else:
+            budget *= args.scale
+            status = 'ok' if ms <= budget else 'OVER'
+            if ms > budget:
+                over.append(name)
+        rows.append([
+            name, module, '%.1f' % ms,
+            '-' if budget is None else '%.0f' % budget, status
+        ])
+    print(tabulate(rows, headers=[
+        'Entry point', 'Module', 'Import (ms)', 'Budget (ms)', 'Status'
+    ]))
+    if over:
+        print('\nOver budget: %s' % ', '.join(over))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark matching Lambda function names to current policy names in the
+vendored mugc's ``region_gc``: upstream's comparison of every function name
+with every policy name (``str.endswith()``), against
+:py:class:`manheim_c7n_tools.vendor.mugc.PolicyNameMatcher`. Some of the
+policies use a different ``function-prefix``, and some of the functions are
+orphaned, so that both the set lookup and the trie fallback are exercised.
+
+Usage: ``python benchmarks/mugc_matching.py [-f FUNCTIONS] [-p POLICIES]``
+(default: 5000 functions, 3000 policies)
+"""
+
+import argparse
+import time
+
+from tabulate import tabulate
+
+from manheim_c7n_tools.vendor.mugc import PolicyNameMatcher
+
+PREFIX = 'custodian-'
+
+
+def make_names(num_functions, num_policies):
+    """Return (function names, policy names)."""
+    policies = ['policy-%05d' % i for i in range(num_policies)]
+    funcs = []
+    for i in range(num_functions):
+        if i % 10 == 0:
+            funcs.append('%sorphaned-%05d' % (PREFIX, i))
+        elif i % 10 == 1:
+            funcs.append('other-prefix-%s' % policies[i % num_policies])
+        else:
+            funcs.append(PREFIX + policies[i % num_policies])
+    return funcs, policies
+
+
+def endswith_match(funcs, policies):
+    """Upstream mugc's matching."""
+    res = []
+    for fname in funcs:
+        match = False
+        for pn in policies:
+            if fname.endswith(pn):
+                match = True
+        res.append(match)
+    return res
+
+
+def matcher_match(funcs, policies):
+    matcher = PolicyNameMatcher(policies, PREFIX)
+    return [matcher.match(fname) for fname in funcs]
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('-f', '--functions', type=int, default=5000,
+                   help='number of Lambda functions (default: 5000)')
+    p.add_argument('-p', '--policies', type=int, default=3000,
+                   help='number of current policies (default: 3000)')
+    args = p.parse_args()
+    funcs, policies = make_names(args.functions, args.policies)
+    rows = []
+    results = []
+    for name, func in [
+        ('endswith (upstream)', endswith_match),
+        ('PolicyNameMatcher', matcher_match)
+    ]:
+        start = time.perf_counter()
+        res = func(funcs, policies)
+        rows.append([
+            name, args.functions, args.policies,
+            '%.4f' % (time.perf_counter() - start), sum(res)
+        ])
+        results.append(res)
+    assert results[0] == results[1]
+    print(tabulate(rows, headers=[
+        'Method', 'Functions', 'Policies', 'Time (s)', 'Matched'
+    ]))
+
+
+if __name__ == '__main__':
+    main()
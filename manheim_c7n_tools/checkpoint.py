@@ -0,0 +1,168 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Checkpoint journal of completed :py:mod:`~.runner` tasks, used to resume a
+failed run without repeating work that is already done.
+"""
+
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+#: Default path (relative to the current directory) of the journal file.
+DEFAULT_PATH = '.c7n-runner-checkpoint.json'
+
+
+class CheckpointJournal(object):
+    """
+    Journal of the (step, region) tasks completed by a
+    :py:class:`~.CustodianRunner` run, stored as JSON on disk.
+
+    Each completed task is recorded along with a fingerprint of its inputs
+    (see :py:meth:`~.fingerprint`). When resuming, a task is only considered
+    complete if its fingerprint is unchanged, i.e. neither the config nor the
+    generated policy files it uses have changed since it ran. The journal is
+    written after every completed task, so that it survives the run failing.
+    """
+
+    def __init__(self, path, account_name, action, resume=False):
+        """
+        Initialize the journal. If ``resume`` is True, load the completed
+        tasks from an existing journal at ``path`` (if there is one, and it is
+        for the same account and action); otherwise start a new, empty
+        journal, removing any existing one.
+
+        :param path: path to the journal file
+        :type path: str
+        :param account_name: name of the account being run
+        :type account_name: str
+        :param action: Name of the action being run, "run" or "dryrun"
+        :type action: str
+        :param resume: whether to resume from an existing journal
+        :type resume: bool
+        """
+        self.path = path
+        self.account_name = account_name
+        self.action = action
+        self._completed = {}
+        self._started = {}
+        if resume:
+            self._load()
+        else:
+            self.remove()
+
+    def _load(self):
+        """
+        Load completed tasks from the journal file at :py:attr:`~.path`, if
+        it exists and matches this account and action.
+        """
+        if not os.path.exists(self.path):
+            logger.info(
+                'No checkpoint journal at %s; nothing to resume', self.path
+            )
+            return
+        with open(self.path, 'r') as fh:
+            data = json.load(fh)
+        if (
+            data.get('account_name') != self.account_name or
+            data.get('action') != self.action
+        ):
+            logger.warning(
+                'Ignoring checkpoint journal at %s; it is for %s of account '
+                '%s, not %s of account %s', self.path, data.get('action'),
+                data.get('account_name'), self.action, self.account_name
+            )
+            return
+        self._completed = data.get('completed', {})
+        logger.info(
+            'Resuming from checkpoint journal at %s with %d completed tasks',
+            self.path, len(self._completed)
+        )
+
+    def _write(self):
+        """Atomically write the journal to :py:attr:`~.path`."""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({
+                'account_name': self.account_name,
+                'action': self.action,
+                'completed': self._completed
+            }, fh, sort_keys=True, indent=2)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def fingerprint(config, paths):
+        """
+        Return a fingerprint (SHA256 hex digest) of a task's inputs: its
+        config and the contents of the given files. Files that do not exist
+        are fingerprinted as missing.
+
+        :param config: the config the task is run with
+        :type config: ManheimConfig
+        :param paths: paths of the files that the task reads
+        :type paths: list
+        :return: fingerprint of the inputs
+        :rtype: str
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps(
+            config.as_dict(), sort_keys=True, default=str
+        ).encode('utf-8'))
+        for path in sorted(paths):
+            h.update(b'\0' + path.encode('utf-8') + b'\0')
+            if not os.path.exists(path):
+                h.update(b'missing')
+                continue
+            with open(path, 'rb') as fh:
+                h.update(hashlib.sha256(fh.read()).digest())
+        return h.hexdigest()
+
+    def is_complete(self, key, fingerprint):
+        """
+        Return whether the task identified by ``key`` is recorded as complete
+        with the given input fingerprint. If not, remember the fingerprint so
+        that :py:meth:`~.complete` can record it once the task has run.
+
+        :param key: unique identifier for the task
+        :type key: str
+        :param fingerprint: fingerprint of the task's current inputs
+        :type fingerprint: str
+        :return: whether the task is already complete
+        :rtype: bool
+        """
+        if self._completed.get(key) == fingerprint:
+            return True
+        self._started[key] = fingerprint
+        return False
+
+    def complete(self, key):
+        """
+        Record the task identified by ``key`` as complete, with the
+        fingerprint passed to :py:meth:`~.is_complete` before it ran, and
+        write the journal.
+
+        :param key: unique identifier for the task
+        :type key: str
+        """
+        self._completed[key] = self._started.pop(key)
+        self._write()
+
+    def remove(self):
+        """Remove the journal file, if it exists."""
+        if os.path.exists(self.path):
+            logger.debug('Removing checkpoint journal at %s', self.path)
+            os.unlink(self.path)
@@ -12,18 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import jsonschema
 import logging
 import yaml
 import os
 
-from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
+from manheim_c7n_tools.utils import MacroSubstituter, env_macros
 
-#: Schema of the ``manheim-c7n-tools.yml`` configuration file. This is a schema
-#: designed for use with the ``jsonschema`` package. This schema is for ONE
-#: ACCOUNT in the config file; the file itself is made up of an array of objects
-#: matching this schema.
-MANHEIM_CONFIG_SCHEMA = {
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # nocoverage
+    from yaml import SafeLoader  # nocoverage
+
+#: Schema of the ``manheim-c7n-tools.yml`` configuration file, except for the
+#: ``mailer_config`` key. Importing c7n-mailer's config schema is slow, so the
+#: complete schema, ``MANHEIM_CONFIG_SCHEMA``, is only built from this when it
+#: is first used; see :py:func:`~._config_schema`.
+_BASE_CONFIG_SCHEMA = {
     'type': 'object',
     'additionalProperties': False,
     'required': [
@@ -97,16 +101,78 @@ MANHEIM_CONFIG_SCHEMA = {
                         }
                     }]
             },
-        },
-
-        # Incorporate c7n-mailer's config schema nested under a
-        # ``mailer_config`` key. See upstream source of c7n_mailer.
-        'mailer_config': MAILER_SCHEMA
+        }
     }
 }
 
 logger = logging.getLogger(__name__)
 
+#: jsonschema validator for ``MANHEIM_CONFIG_SCHEMA``; built (and the schema
+#: itself checked) on first use by :py:func:`~.validate_config`
+_validator = None
+
+
+def _config_schema():
+    """
+    Build (on first use) and return ``MANHEIM_CONFIG_SCHEMA``, the schema of
+    the ``manheim-c7n-tools.yml`` configuration file. This is a schema
+    designed for use with the ``jsonschema`` package. This schema is for ONE
+    ACCOUNT in the config file; the file itself is made up of an array of
+    objects matching this schema.
+
+    ``MANHEIM_CONFIG_SCHEMA`` is also available as a module attribute, built
+    by this function when it is first accessed.
+
+    :return: the complete schema for one account
+    :rtype: dict
+    """
+    if 'MANHEIM_CONFIG_SCHEMA' in globals():
+        return globals()['MANHEIM_CONFIG_SCHEMA']
+    from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
+    schema = dict(_BASE_CONFIG_SCHEMA)
+    schema['properties'] = dict(
+        _BASE_CONFIG_SCHEMA['properties'],
+        # Incorporate c7n-mailer's config schema nested under a
+        # ``mailer_config`` key. See upstream source of c7n_mailer.
+        mailer_config=MAILER_SCHEMA
+    )
+    globals()['MANHEIM_CONFIG_SCHEMA'] = schema
+    return schema
+
+
+def __getattr__(name):
+    """
+    Build ``MANHEIM_CONFIG_SCHEMA`` the first time that it is accessed
+    (:pep:`562`), via :py:func:`~._config_schema`.
+    """
+    if name == 'MANHEIM_CONFIG_SCHEMA':
+        return _config_schema()
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name)
+    )
+
+
+def validate_config(config):
+    """
+    Validate the configuration for one account against
+    ``MANHEIM_CONFIG_SCHEMA``. The validator is only built once per process,
+    rather than for every validation as ``jsonschema.validate()`` does.
+
+    :param config: configuration for one account
+    :type config: dict
+    :raises: jsonschema.exceptions.ValidationError if the config is invalid
+    """
+    import jsonschema
+    global _validator
+    if _validator is None:
+        schema = _config_schema()
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        _validator = cls(schema)
+    error = jsonschema.exceptions.best_match(_validator.iter_errors(config))
+    if error is not None:
+        raise error
+
 
 class ManheimConfig(object):
     """
@@ -116,87 +182,221 @@ class ManheimConfig(object):
     def __init__(self, **kwargs):
         self.config_path = kwargs.pop('config_path')
         logger.debug('Validating configuration...')
-        jsonschema.validate(dict(kwargs), MANHEIM_CONFIG_SCHEMA)
+        validate_config(dict(kwargs))
         self._config = kwargs
         self._config['account_id'] = str(self._config['account_id'])
         if 'function_prefix' not in self._config:
             self._config['function_prefix'] = 'custodian-'
         if 'cleanup_notify' not in self._config:
             self._config['cleanup_notify'] = []
+        # memoized results of :py:meth:`~.config_for_region`
+        self._region_configs = {}
+
+    @classmethod
+    def _from_validated(cls, config_path, config):
+        """
+        Construct a new ManheimConfig from a config dict derived from an
+        already-validated and initialized ManheimConfig, without validating it
+        against the schema again.
+
+        :param config_path: path to the config file
+        :type config_path: str
+        :param config: configuration dict, as stored in ``_config``
+        :type config: dict
+        :return: new ManheimConfig object
+        :rtype: ManheimConfig
+        """
+        res = cls.__new__(cls)
+        res.config_path = config_path
+        res._config = config
+        res._region_configs = {}
+        return res
 
     @staticmethod
     def from_file(path, account_name):
         """
-        Construct a new ManheimConfig object from the YML configuration file
-        at the specified path.
+        Return the ManheimConfig object for the specified account from the YML
+        configuration file at the specified path. The file is only read and
+        parsed once per process, and the account's configuration only
+        validated once; see :py:class:`~.ManheimConfigSet`.
 
         :param path: path of the yaml config file to load
         :type path: str
         :param account_name: top-level account name/alias to load
         :type account_name: str
-        :return: new ManheimConfig object for the specified config file
+        :return: ManheimConfig object for the specified account
         :rtype: ManheimConfig
         """
-        logger.info('Loading config from: %s', path)
-        with open(path, 'r') as fh:
-            config_dict = yaml.load(fh.read(), Loader=yaml.SafeLoader)
-        for acct_conf in config_dict:
-            if acct_conf['account_name'] == account_name:
-                acct_conf['config_path'] = path
-                return ManheimConfig(**acct_conf)
-        raise RuntimeError(
-            'ERROR: No account with name "%s" in %s' % (
-                account_name, path
-            )
-        )
+        return ManheimConfigSet.load(path).config(account_name)
 
     @staticmethod
     def list_accounts(path):
         """
         Given the path to a manheim-c7n-tools YML configuration file, return a
         dict of account name to account ID number for each account defined in
-        the file.
+        the file. See :py:class:`~.ManheimConfigSet`.
 
         :param path: path of the yaml config file to load
         :type path: str
         :return: dict of account name/alias used in the file to Account ID
         :rtype: dict
         """
-        logger.info('Loading config from: %s', path)
-        with open(path, 'r') as fh:
-            config_list = yaml.load(fh.read(), Loader=yaml.SafeLoader)
-        return {x['account_name']: str(x['account_id']) for x in config_list}
+        return ManheimConfigSet.load(path).list_accounts()
 
     def config_for_region(self, region_name):
         """
         Return a copy of this configuration for the specified region name.
-        This currently uses an inefficient but simple approach - it serializes
-        the current config to a YAML string, replaces all occurrences of
+        This walks the configuration, replacing all occurrences of
         ``%%AWS_REGION%%`` with the specified ``region_name`` and all
-        occurrences of ``%%POLICYGEN_ENV_name%%`` replaced with the value of the
-        corresponding environment variable, then deserializes the result and
-        returns a new :py:class:`~.ManheimConfig` object using it.
+        occurrences of ``%%POLICYGEN_ENV_name%%`` with the value of the
+        corresponding environment variable (using
+        :py:class:`~.MacroSubstituter`), in both keys and values, and returns a
+        new :py:class:`~.ManheimConfig` object using the result. Any other
+        ``%%NAME%%`` macros are left in place, and logged as a warning.
+
+        As this configuration has already been validated, the result is not
+        validated again. Results are memoized per region name and set of
+        ``POLICYGEN_ENV_*`` environment variables, so repeated calls return the
+        same object; it must not be modified.
 
         :param region_name: the region name to build a config for
         :type region_name: str
         :return: new ManheimConfig for the specified region
         :rtype: ManheimConfig
         """
+        macros = env_macros()
+        key = (region_name, tuple(sorted(macros.items())))
+        if key in self._region_configs:
+            return self._region_configs[key]
+        macros['AWS_REGION'] = region_name
+        config, unresolved = MacroSubstituter(macros).substitute_structure(
+            self._config
+        )
+        if unresolved:
+            logger.warning(
+                'Unresolved macros in configuration for region %s: %s',
+                region_name, ', '.join(unresolved)
+            )
+        res = ManheimConfig._from_validated(self.config_path, config)
+        self._region_configs[key] = res
+        return res
+
+    def as_dict(self):
+        """
+        Return this configuration as a dict, in the form accepted by the
+        constructor (i.e. including ``config_path``).
+
+        :return: dict of configuration keys to values
+        :rtype: dict
+        """
         d = {'config_path': self.config_path}
         d.update(self._config)
-        # AWS_REGION replacement
-        config_str = yaml.dump(
-            d, Dumper=yaml.Dumper
-        ).replace('%%AWS_REGION%%', region_name)
-        # env var replacements
-        for k, v in os.environ.items():
-            if not k.startswith('POLICYGEN_ENV_'):
-                continue
-            config_str = config_str.replace('%%' + k + '%%', v)
-        return ManheimConfig(**yaml.load(config_str, Loader=yaml.SafeLoader))
+        return d
 
     def __getattr__(self, k):
+        if k.startswith('__') or k in ['_config', '_region_configs']:
+            # don't look up dunder attributes (i.e. pickle's ``__setstate__``)
+            # in the config, and don't recurse if ``_config`` isn't set yet
+            # (i.e. during unpickling)
+            raise AttributeError(k)
         try:
             return self._config[k]
         except KeyError:
             raise AttributeError(k)
+
+
+class ManheimConfigSet(object):
+    """
+    All of the accounts' configurations from one ``manheim-c7n-tools.yml``
+    file, parsed once and indexed by account name. Instances should be
+    obtained with :py:meth:`~.load`, which caches them per process.
+    """
+
+    #: cache of :py:meth:`~.load` results; absolute path to 2-tuple of the
+    #: file's (mtime, size) when it was loaded, and the ManheimConfigSet
+    _cache = {}
+
+    def __init__(self, path):
+        """
+        Read and parse the configuration file.
+
+        :param path: path of the yaml config file to load
+        :type path: str
+        """
+        logger.info('Loading config from: %s', path)
+        self.path = path
+        with open(path, 'r') as fh:
+            config_list = yaml.load(fh.read(), Loader=SafeLoader)
+        #: dict of account name to raw (unvalidated) config dict
+        self._accounts = {x['account_name']: x for x in config_list}
+        #: dict of account name to validated ManheimConfig
+        self._configs = {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the ManheimConfigSet for the specified file. The file is only
+        parsed again if its modification time or size have changed since it
+        was last loaded in this process.
+
+        :param path: path of the yaml config file to load
+        :type path: str
+        :return: ManheimConfigSet for the file
+        :rtype: ManheimConfigSet
+        """
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0] == stamp and \
+                cached[1].path == path:
+            return cached[1]
+        res = cls(path)
+        cls._cache[key] = (stamp, res)
+        return res
+
+    @property
+    def account_names(self):
+        """
+        Return the names of all accounts in the file, in file order.
+
+        :return: list of account names
+        :rtype: list
+        """
+        return list(self._accounts.keys())
+
+    def list_accounts(self):
+        """
+        Return a dict of account name to account ID number for each account
+        defined in the file.
+
+        :return: dict of account name/alias used in the file to Account ID
+        :rtype: dict
+        """
+        return {
+            k: str(v['account_id']) for k, v in self._accounts.items()
+        }
+
+    def config(self, account_name):
+        """
+        Return the :py:class:`~.ManheimConfig` for the specified account. The
+        configuration is validated the first time that it is requested, and
+        the same object returned thereafter; it must not be modified.
+
+        :param account_name: top-level account name/alias to load
+        :type account_name: str
+        :return: ManheimConfig object for the specified account
+        :rtype: ManheimConfig
+        :raises: RuntimeError if there is no such account
+        """
+        if account_name not in self._configs:
+            if account_name not in self._accounts:
+                raise RuntimeError(
+                    'ERROR: No account with name "%s" in %s' % (
+                        account_name, self.path
+                    )
+                )
+            acct_conf = dict(self._accounts[account_name])
+            acct_conf['config_path'] = self.path
+            self._configs[account_name] = ManheimConfig(**acct_conf)
+        return self._configs[account_name]
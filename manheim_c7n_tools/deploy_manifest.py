@@ -0,0 +1,152 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Manifest of the Lambda-mode policies deployed by the :py:mod:`~.runner`
+``custodian`` step, stored in the output S3 bucket, so that policies which
+have not changed since they were last deployed don't need to be provisioned
+again.
+"""
+
+import json
+import hashlib
+import logging
+
+from manheim_c7n_tools.policygen import policy_fingerprint
+
+logger = logging.getLogger(__name__)
+
+#: S3 key of the manifest in the output bucket, formatted with the region name.
+MANIFEST_KEY = 'manheim-c7n-tools/deployed-policies/%s.json'
+
+#: Version of the manifest format; manifests with a different version are
+#: ignored, i.e. every policy is provisioned.
+MANIFEST_VERSION = 1
+
+
+def is_lambda_policy(policy):
+    """
+    Return whether a policy runs in a Lambda function, i.e. ``custodian run``
+    provisions it rather than running it.
+
+    :param policy: the policy
+    :type policy: dict
+    :rtype: bool
+    """
+    mode = policy.get('mode') or {}
+    return mode.get('type', 'pull') != 'pull'
+
+
+def deploy_fingerprints(policies, options):
+    """
+    Return the deployment fingerprint of every Lambda-mode policy in a
+    custodian config. This combines the policy's
+    :py:func:`~manheim_c7n_tools.policygen.policy_fingerprint`, the c7n
+    version (which provides the Lambda function's code) and the c7n options
+    that are embedded in the function's configuration, so a change to any of
+    them changes the fingerprint.
+
+    :param policies: the policies in the custodian config
+    :type policies: list
+    :param options: the c7n options that the policies are run with, that end
+      up in the Lambda function configuration (i.e. log group and output
+      directory)
+    :type options: dict
+    :return: dict of policy name to hex SHA256 digest
+    :rtype: dict
+    """
+    from c7n.version import version
+    base = json.dumps(
+        [version, options], sort_keys=True, separators=(',', ':'), default=str
+    )
+    return {
+        p['name']: hashlib.sha256(
+            (base + policy_fingerprint(p)).encode('utf-8')
+        ).hexdigest()
+        for p in policies if is_lambda_policy(p)
+    }
+
+
+class DeployManifest(object):
+    """
+    The fingerprints (see :py:func:`~.deploy_fingerprints`) of the Lambda-mode
+    policies last deployed to one region, stored as a JSON object at
+    :py:const:`~.MANIFEST_KEY` in the output S3 bucket.
+    """
+
+    def __init__(self, bucket_name, region_name, session=None):
+        """
+        :param bucket_name: name of the output S3 bucket
+        :type bucket_name: str
+        :param region_name: name of the region the policies are deployed to
+        :type region_name: str
+        :param session: boto3 Session for the account, or None to use the
+          default session
+        :type session: boto3.session.Session
+        """
+        self.bucket_name = bucket_name
+        self.key = MANIFEST_KEY % region_name
+        if session is None:
+            import boto3
+            self._s3 = boto3.client('s3', region_name=region_name)
+        else:
+            self._s3 = session.client('s3', region_name=region_name)
+
+    def load(self):
+        """
+        Return the deployed fingerprints. A missing manifest, or one from a
+        different manifest version, is treated as empty.
+
+        :return: dict of policy name to deployment fingerprint
+        :rtype: dict
+        """
+        from botocore.exceptions import ClientError
+        try:
+            resp = self._s3.get_object(Bucket=self.bucket_name, Key=self.key)
+        except ClientError as ex:
+            if ex.response['Error']['Code'] not in ['NoSuchKey', '404']:
+                raise
+            logger.info(
+                'No deployed policy manifest at s3://%s/%s',
+                self.bucket_name, self.key
+            )
+            return {}
+        data = json.loads(resp['Body'].read().decode('utf-8'))
+        if data.get('version') != MANIFEST_VERSION:
+            logger.info(
+                'Ignoring deployed policy manifest at s3://%s/%s from a '
+                'different version', self.bucket_name, self.key
+            )
+            return {}
+        return data['policies']
+
+    def save(self, fingerprints):
+        """
+        Write the deployed fingerprints, replacing the existing manifest.
+
+        :param fingerprints: dict of policy name to deployment fingerprint
+        :type fingerprints: dict
+        """
+        logger.info(
+            'Writing deployed policy manifest (%d policies) to s3://%s/%s',
+            len(fingerprints), self.bucket_name, self.key
+        )
+        self._s3.put_object(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            Body=json.dumps(
+                {'version': MANIFEST_VERSION, 'policies': fingerprints},
+                sort_keys=True
+            ).encode('utf-8'),
+            ContentType='application/json'
+        )
@@ -29,11 +29,6 @@ import argparse
 import itertools
 import os
 from zlib import decompress
-from jinja2 import Environment, FileSystemLoader
-from jinja2.exceptions import TemplateNotFound
-
-from c7n.resources import load_available
-from c7n.provider import get_resource_class
 
 from manheim_c7n_tools.utils import set_log_info, set_log_debug
 from manheim_c7n_tools.config import ManheimConfig
@@ -47,15 +42,19 @@ class DryRunDiffer(object):
     RESOURCE_TYPE_KEY = 'resource_type'
     UNKNOWN_RESOURCE_ID = 'unknown_id'
 
-    def __init__(self, config):
+    def __init__(self, config, session=None):
         """
         Initialize a dryrun differ.
 
         :param config: manheim-c7n-tools configuration object
         :type config: ManheimConfig
+        :param session: boto3 Session to use for S3, or None to use the
+          default session
+        :type session: boto3.session.Session
         """
         self._live_results = {}
         self.config = config
+        self._session = session
 
     def run(self, git_dir=None, diff_against='master'):
         dryrun_results = self._get_dryrun_results()
@@ -97,6 +96,9 @@ class DryRunDiffer(object):
         if not all_policies:
             logger.info('no policies found - skipping diff report')
             return ''
+        # imported here, as jinja2 is only needed for the report
+        from jinja2 import Environment, FileSystemLoader
+        from jinja2.exceptions import TemplateNotFound
         t_loader = FileSystemLoader(searchpath="./reporting-template/")
         t_env = Environment(loader=t_loader)
         t_file = "report.j2"
@@ -172,6 +174,9 @@ class DryRunDiffer(object):
             self.RESOURCE_TYPE_KEY, self.UNKNOWN_RESOURCE_TYPE)
         if resource_type == self.UNKNOWN_RESOURCE_TYPE:
             return
+        # imported here, as loading c7n's resources is slow
+        from c7n.resources import load_available
+        from c7n.provider import get_resource_class
         load_available()
         _id = self.UNKNOWN_RESOURCE_ID
         try:
@@ -306,7 +311,10 @@ class DryRunDiffer(object):
         policies. Reads each file and maps resources to ``self._live_results``
         accordingly.
         """
-        s3 = boto3.resource('s3', region_name=region_name)
+        if self._session is None:
+            s3 = boto3.resource('s3', region_name=region_name)
+        else:
+            s3 = self._session.resource('s3', region_name=region_name)
         bktname = self.config.config_for_region(
             region_name
         ).output_s3_bucket_name
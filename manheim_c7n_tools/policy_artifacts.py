@@ -0,0 +1,219 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-process cache of the loaded (and validated) custodian configs generated by
+:py:mod:`~.policygen`, so that the :py:mod:`~.runner` steps which use the
+config for a region only parse and validate it once.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PolicyArtifacts(object):
+    """
+    The loaded contents of one generated custodian config
+    (``custodian_REGION.yml`` or ``custodian_REGION.json``). Instances should
+    be obtained with :py:meth:`~.load` (or :py:meth:`~.validated`), which
+    cache them per process; the data must not be modified.
+    """
+
+    #: cache of :py:meth:`~.load` results; absolute path to 2-tuple of the
+    #: file's (mtime, size) when it was loaded, and the PolicyArtifacts
+    _cache = {}
+
+    def __init__(self, path, data, validated=False):
+        """
+        :param path: path of the custodian config file
+        :type path: str
+        :param data: the parsed contents of the file
+        :type data: dict
+        :param validated: whether ``data`` has been validated by c7n
+        :type validated: bool
+        """
+        self.path = path
+        self.data = data
+        self.validated = validated
+        self._names = None
+
+    @classmethod
+    def load(cls, path, validate=True):
+        """
+        Return the PolicyArtifacts for the specified file. The file is only
+        loaded again if its modification time or size have changed since it
+        was last loaded in this process, or if ``validate`` is True and it has
+        not yet been validated.
+
+        :param path: path of the custodian config file to load
+        :type path: str
+        :param validate: whether the config must be validated; if it has not
+          already been, this does the same schema and policy validation that
+          ``c7n.policy.load()`` does
+        :type validate: bool
+        :return: PolicyArtifacts for the file
+        :rtype: PolicyArtifacts
+        :raises: ``c7n.exceptions.PolicyValidationError`` if ``validate`` is
+          True and the config is invalid
+        """
+        key, stamp = cls._key(path)
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0] == stamp and (
+            cached[1].validated or not validate
+        ):
+            logger.debug('Using loaded policies from %s', path)
+            return cached[1]
+        res = cls(path, cls._load_file(path))
+        if validate:
+            res._validate()
+        cls._cache[key] = (stamp, res)
+        return res
+
+    @classmethod
+    def validated(cls, path):
+        """
+        Load the specified file and record it as validated. This is for use
+        after the file has been validated with ``c7n.commands.validate()``
+        (i.e. by :py:class:`~.ValidateStep`), so that later steps can use it
+        without validating it again.
+
+        :param path: path of the custodian config file to load
+        :type path: str
+        :return: PolicyArtifacts for the file
+        :rtype: PolicyArtifacts
+        """
+        key, stamp = cls._key(path)
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            res = cached[1]
+        else:
+            res = cls(path, cls._load_file(path))
+        res.validated = True
+        cls._cache[key] = (stamp, res)
+        return res
+
+    @classmethod
+    def clear(cls):
+        """Remove all cached PolicyArtifacts."""
+        cls._cache = {}
+
+    @staticmethod
+    def _key(path):
+        """
+        Return the cache key and (mtime, size) stamp for a file.
+
+        :param path: path of the custodian config file
+        :type path: str
+        :return: 2-tuple of absolute path, (mtime, size) 2-tuple
+        :rtype: tuple
+        """
+        st = os.stat(path)
+        return os.path.abspath(path), (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _load_file(path):
+        """
+        Parse a custodian config file with c7n's loader.
+
+        :param path: path of the custodian config file
+        :type path: str
+        :return: parsed file contents
+        :rtype: dict
+        """
+        from c7n.utils import load_file
+        logger.debug('Loading policies from %s', path)
+        return load_file(path) or {}
+
+    def _resource_types(self):
+        """
+        Load the c7n resource types used by the policies, and return them.
+
+        :return: resource types used by the policies
+        :rtype: list
+        """
+        from c7n.resources import load_resources
+        from c7n.schema import StructureParser
+        structure = StructureParser()
+        structure.validate(self.data)
+        rtypes = structure.get_resource_types(self.data)
+        load_resources(rtypes)
+        return rtypes
+
+    def _validate(self):
+        """
+        Validate the config the same way that ``c7n.policy.load()`` does; its
+        schema, then each policy.
+
+        :raises: ``c7n.exceptions.PolicyValidationError`` if the config is
+          invalid
+        """
+        from c7n.config import Config
+        from c7n.exceptions import PolicyValidationError
+        from c7n.schema import validate
+        errors = validate(self.data, resource_types=self._resource_types())
+        if errors:
+            raise PolicyValidationError(
+                "Failed to validate policy %s \n %s" % (errors[1], errors[0])
+            )
+        for p in self.collection(
+            Config.empty(dryrun=True, account_id='na', region='na')
+        ):
+            p.validate()
+        self.validated = True
+
+    @property
+    def policies(self):
+        """
+        Return the list of policy dicts in the config.
+
+        :return: list of policy dicts
+        :rtype: list
+        """
+        return self.data.get('policies') or []
+
+    @property
+    def names(self):
+        """
+        Return the set of policy names in the config.
+
+        :return: policy names
+        :rtype: frozenset
+        """
+        if self._names is None:
+            self._names = frozenset(p['name'] for p in self.policies)
+        return self._names
+
+    def collection(self, options, names=None):
+        """
+        Return a new ``c7n.policy.PolicyCollection`` of the policies, with
+        the specified c7n options (Config).
+
+        :param options: c7n options for the policies
+        :type options: c7n.config.Config
+        :param names: if specified, only include the policies with exactly
+          these names (unlike c7n's ``policy_filters``, these are not glob
+          patterns)
+        :type names: set
+        :return: collection of the policies
+        :rtype: c7n.policy.PolicyCollection
+        """
+        from c7n.policy import PolicyCollection
+        self._resource_types()
+        data = self.data
+        if names is not None:
+            data = dict(data, policies=[
+                p for p in self.policies if p['name'] in names
+            ])
+        return PolicyCollection.from_data(data, options)
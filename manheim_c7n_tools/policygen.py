@@ -22,21 +22,55 @@ from tabulate import tabulate
 import argparse
 import logging
 import shutil
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import yaml
 
 try:
-    from yaml import CSafeLoader as SafeLoader
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
 except ImportError:
-    from yaml import SafeLoader
+    from yaml import SafeLoader, SafeDumper
 
 from manheim_c7n_tools.version import VERSION, PROJECT_URL
 from manheim_c7n_tools.config import ManheimConfig
-from manheim_c7n_tools.utils import git_html_url
-from manheim_c7n_tools.notifyonly import NotifyOnlyPolicy
+from manheim_c7n_tools.utils import (
+    git_html_url, MacroSubstituter, env_macros
+)
+from manheim_c7n_tools.yamlcache import YamlCache, DEFAULT_PATH as CACHE_PATH
 
 whtspc_re = re.compile(r'\s+')
 
+#: Path (relative to the current directory) of the manifest of input hashes
+#: used by incremental runs; see :py:meth:`~.PolicyGen._manifest_keys`.
+MANIFEST_PATH = '.policygen-manifest.json'
+
+#: Formats that :py:class:`~.PolicyGen` can write ``custodian_REGION`` configs
+#: in, to their file extensions.
+OUTPUT_FORMATS = {'yaml': 'yml', 'json': 'json'}
+
+#: Minimum number of uncached policy checks in one region for
+#: :py:meth:`~.PolicyGen._check_policies` to run them in a pool of worker
+#: processes instead of serially.
+CHECK_POOL_THRESHOLD = 2000
+
+#: Minimum number of policy files to parse for
+#: :py:meth:`~.PolicyGen._parse_files` to parse them in a pool of worker
+#: processes instead of serially.
+PARSE_POOL_THRESHOLD = 200
+
+#: Minimum size (total length of keys and scalar values) of a dict or list in
+#: a generated YAML config for identical copies of it to be written once, as
+#: an anchor and aliases; see :py:func:`~.share_subtrees`
+ALIAS_MIN_SIZE = 40
+
+#: Dict keys whose values :py:func:`~.share_subtrees` never shares. c7n
+#: modifies a policy's ``mode`` in place when it loads and provisions the
+#: policy, so any sharing would leak those changes into other policies.
+UNSHARED_KEYS = frozenset(['mode'])
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,40 +98,475 @@ def is_enabled(policy):
     return not(policy.get("disable", False))
 
 
+def custodian_config_name(region_name, output_format='yaml'):
+    """
+    Return the file name of the custodian config that :py:class:`~.PolicyGen`
+    generates for a region.
+
+    :param region_name: the region name
+    :type region_name: str
+    :param output_format: the output format; a key of
+      :py:const:`~.OUTPUT_FORMATS`
+    :type output_format: str
+    :return: config file name, i.e. ``custodian_us-east-1.yml``
+    :rtype: str
+    """
+    return 'custodian_%s.%s' % (region_name, OUTPUT_FORMATS[output_format])
+
+
+def parse_yaml(path, contents):
+    """
+    Parse the YAML ``contents`` of the file at ``path``, writing the path to
+    STDERR if parsing fails.
+    """
+    try:
+        return yaml.load(contents, Loader=SafeLoader)
+    except Exception:
+        sys.stderr.write("Exception loading YAML: %s\n" % path)
+        raise
+
+
+def has_type(obj, type_name):
+    """
+    Helper function to determine if a (possibly nested) filter or action list
+    contains a dict with a ``type`` of ``type_name``.
+
+    :param obj: filter or action list, or item in one
+    :param type_name: filter or action type to look for
+    :type type_name: str
+    :rtype: bool
+    """
+    if isinstance(obj, dict):
+        if obj.get('type') == type_name:
+            return True
+        return any(has_type(v, type_name) for v in obj.values())
+    if isinstance(obj, list):
+        return any(has_type(v, type_name) for v in obj)
+    return False
+
+
+def resource_cache_key(policy):
+    """
+    Return the parts of a policy that c7n's resource cache is keyed on (aside
+    from account and region): the resource type (without any ``aws.``
+    prefix) and the resource ``query``, as JSON. Consecutive pull-mode
+    policies with the same key share the results of one describe.
+
+    :param policy: the policy
+    :type policy: dict
+    :rtype: tuple
+    """
+    resource = policy.get('resource', '')
+    if resource.startswith('aws.'):
+        resource = resource[4:]
+    return (
+        resource,
+        json.dumps(policy.get('query', []), sort_keys=True, default=repr)
+    )
+
+
+def policy_sort_key(policy):
+    """
+    Sort key for the policies in a generated ``custodian_REGION.yml``: by
+    :py:func:`~.resource_cache_key`, then by the policy's filters (as JSON),
+    then by name. This keeps policies on the same resources together, so c7n
+    can reuse cached resources while running them, and policies with the same
+    filters together.
+
+    :param policy: the policy
+    :type policy: dict
+    :rtype: tuple
+    """
+    return resource_cache_key(policy) + (
+        json.dumps(policy.get('filters', []), sort_keys=True, default=repr),
+        policy['name']
+    )
+
+
+def describe_calls(policies, pull_only=True):
+    """
+    Estimate the number of resource describes c7n makes when running
+    ``policies`` in the given order. This assumes that cached resources are
+    only still available to the next policy that runs, i.e. one describe for
+    every run of consecutive policies with the same
+    :py:func:`~.resource_cache_key`.
+
+    :param policies: the policies, in the order they are run
+    :type policies: list
+    :param pull_only: only count pull-mode policies, i.e. for ``custodian
+      run``; other modes only provision Lambda functions. Set to False for a
+      dry run, where every policy is run in pull mode.
+    :type pull_only: bool
+    :rtype: int
+    """
+    calls = 0
+    last = None
+    for policy in policies:
+        mode = policy.get('mode') or {}
+        if pull_only and mode.get('type', 'pull') != 'pull':
+            continue
+        key = resource_cache_key(policy)
+        if key != last:
+            calls += 1
+        last = key
+    return calls
+
+
+def policy_fingerprint(policy):
+    """
+    Return a stable fingerprint of a generated policy's content: a hash of
+    the policy as JSON with sorted keys, so it does not depend on key order,
+    YAML anchors or output format.
+
+    :param policy: the policy
+    :type policy: dict
+    :return: hex SHA256 digest
+    :rtype: str
+    """
+    return hashlib.sha256(json.dumps(
+        policy, sort_keys=True, separators=(',', ':'), default=str
+    ).encode('utf-8')).hexdigest()
+
+
+def share_subtrees(obj, min_size=ALIAS_MIN_SIZE, exclude=UNSHARED_KEYS):
+    """
+    Return a copy of ``obj`` (a structure of dicts, lists and scalars) in
+    which all identical dicts or lists of at least ``min_size`` characters
+    (the total length of their keys and scalar values) are replaced by one
+    shared object, so that ``yaml.dump()`` writes them once, as an anchor
+    followed by aliases. All other dicts and lists are copied, so they are
+    written in full even if they were shared in ``obj``; this includes the
+    values of any dict keys in ``exclude``, and everything under them.
+
+    :param obj: the structure to copy
+    :param min_size: minimum size of a dict or list to share
+    :type min_size: int
+    :param exclude: dict keys whose values are never shared
+    :type exclude: frozenset
+    :return: copy of ``obj`` with identical subtrees shared
+    """
+    # content key -> token; tokens stand in for subtrees in their parents'
+    # keys, so each subtree is only hashed once
+    tokens = {}
+    shared = {}
+
+    def _share(o, private=False):
+        # return (copy, content key, size)
+        if isinstance(o, dict):
+            items = [
+                (k, _share(v, private or k in exclude)) for k, v in o.items()
+            ]
+            res = {k: v[0] for k, v in items}
+            key = ('d', frozenset((k, v[1]) for k, v in items))
+            size = sum(len(str(k)) + v[2] for k, v in items)
+        elif isinstance(o, list):
+            items = [_share(v, private) for v in o]
+            res = [v[0] for v in items]
+            key = ('l', tuple(v[1] for v in items))
+            size = sum(v[2] for v in items)
+        else:
+            return o, (type(o), o), len(str(o))
+        token = tokens.setdefault(key, len(tokens))
+        if size >= min_size and not private:
+            res = shared.setdefault(token, res)
+        return res, token, size
+
+    return _share(obj)[0]
+
+
+def policy_check(*keys):
+    """
+    Decorator to register a :py:class:`~.PolicyGen` method as a policy
+    sanity/safety check, run by :py:meth:`~.PolicyGen._check_policies`. The
+    method is passed a dict of only the given top-level policy keys (those
+    present in the policy) and returns a boolean pass/fail; its docstring
+    describes the failure.
+
+    :param keys: the top-level policy keys the check reads
+    :type keys: str
+    """
+    def decorator(func):
+        func._policy_check_keys = keys
+        return func
+    return decorator
+
+
+#: PolicyGen instance used in worker processes; see
+#: :py:meth:`~.PolicyGen._run_checks` and
+#: :py:meth:`~.PolicyGen._generate_region_configs`
+_worker = None
+
+
+def _init_worker(cls, config, kwargs):
+    global _worker
+    _worker = cls(config, **kwargs)
+
+
+def _run_check_chunk(jobs):
+    return [_worker._run_check(*job) for job in jobs]
+
+
+def _generate_region(policies, defaults, region_name):
+    _worker._generate_configs(policies, defaults, region_name)
+
+
+def _parse_yaml_chunk(items):
+    return [parse_yaml(path, contents) for path, contents in items]
+
+
 class PolicyGen(object):
 
-    def __init__(self, config):
+    def __init__(
+        self, config, incremental=False, yaml_cache=False, workers=1,
+        output_format='yaml', cache_path=CACHE_PATH
+    ):
         """
         Initialize the policy generator tool.
 
         :param config: manheim-c7n-tools configuration object
         :type config: ManheimConfig
+        :param incremental: if True, only regenerate output files whose inputs
+          have changed since the last incremental run, according to the
+          manifest at :py:const:`~.MANIFEST_PATH`
+        :type incremental: bool
+        :param yaml_cache: if True, cache parsed policy files in a
+          :py:class:`~.YamlCache`, so that unchanged files are not parsed again
+          on the next run
+        :type yaml_cache: bool
+        :param workers: maximum number of worker processes to use for parsing
+          policy files, generating per-region configs and running policy
+          checks; if less than 2, everything is done in this process
+        :type workers: int
+        :param output_format: format to write the per-region custodian configs
+          in; a key of :py:const:`~.OUTPUT_FORMATS`. JSON configs are written
+          to ``custodian_REGION.json`` instead of ``custodian_REGION.yml``.
+        :type output_format: str
+        :param cache_path: path to the :py:class:`~.YamlCache` directory
+        :type cache_path: str
         """
         self._config = config
+        self._incremental = incremental
+        self._yaml_cache = YamlCache(cache_path) if yaml_cache else None
+        self._workers = workers
+        self._output_format = output_format
         logger.info(
             'Initialized PolicyGen for account: %s (%s)',
             self._config.account_name, self._config.account_id
         )
         self._policy_sources = defaultdict(set)
+        # (defaults fingerprint, policy fingerprint) -> processed policy; see
+        # :py:meth:`~._process_policy`
+        self._processed = {}
+        # index of policy files; see :py:meth:`~._policy_file_index`
+        self._policy_index = None
+        # path -> parsed policy file; see :py:meth:`~._preload_policies`
+        self._parsed = {}
+        # (check name, policy subset fingerprint) -> (passed, seconds); see
+        # :py:meth:`~._check_policies`
+        self._check_results = {}
 
     def run(self):
+        keys = None
+        stale = None
+        if self._incremental:
+            keys = self._manifest_keys()
+            stale = self._stale_outputs(keys)
+            if not stale:
+                logger.info(
+                    'All generated files are up to date according to %s; '
+                    'nothing to regenerate', MANIFEST_PATH
+                )
+                self._setup_mailer_templates()
+                return
+            logger.info(
+                'Regenerating files with changed inputs: %s',
+                ', '.join(sorted(stale))
+            )
         defaults = self._load_defaults()
         if defaults is None:
             logger.error('Failed to find a `defaults.yml` file')
             raise SystemExit(1)
         acct_configs = self._load_all_policies()
         # generate the per-region configs for each region, for current account
-        for rname in self._config.regions:
-            self._generate_configs(
-                acct_configs[self._config.account_name][rname],
-                defaults,
-                rname
-            )
-        logger.info('Writing policy descriptions to policies.rst...')
-        self._write_file('policies.rst', self._policy_rst(acct_configs))
-        logger.info('Writing region list to regions.rst...')
-        self._write_file('regions.rst', self._regions_rst())
+        self._generate_region_configs(
+            acct_configs[self._config.account_name], defaults, [
+                rname for rname in self._config.regions
+                if stale is None or
+                custodian_config_name(rname, self._output_format) in stale
+            ]
+        )
+        if stale is None or 'policies.rst' in stale:
+            logger.info('Writing policy descriptions to policies.rst...')
+            self._write_file('policies.rst', self._policy_rst(acct_configs))
+        if stale is None or 'regions.rst' in stale:
+            logger.info('Writing region list to regions.rst...')
+            self._write_file('regions.rst', self._regions_rst())
         self._setup_mailer_templates()
+        if self._yaml_cache is not None:
+            self._yaml_cache.save()
+        if keys is not None:
+            self._write_manifest(keys)
+
+    def _input_hashes(self):
+        """
+        Return a dict of the path (relative to ``policies/``) of every YAML
+        file under ``policies/`` to the SHA256 hex digest of its contents.
+
+        :return: dict of policy file paths to content hashes
+        :rtype: dict
+        """
+        res = {}
+        for dirpath, filenames in self._policy_file_index().items():
+            for f in filenames:
+                path = os.path.normpath(os.path.join(dirpath, f))
+                with open(os.path.join('policies', path), 'rb') as fh:
+                    res[path] = hashlib.sha256(fh.read()).hexdigest()
+        return res
+
+    def _file_affects_region(self, path, region_name):
+        """
+        Return whether the YAML file at ``path`` (relative to ``policies/``) is
+        read when generating the config for the specified region of the
+        current account: a ``defaults.yml`` at the top level of ``policies/``
+        or of a ``policy_source_paths`` directory, or a policy in the
+        ``common`` or region directory of ``all_accounts`` or the current
+        account, directly under a ``policy_source_paths`` directory (or under
+        ``policies/``, if there are none). Source paths may be nested any
+        number of directories deep.
+
+        :param path: path of the file, relative to ``policies/``
+        :type path: str
+        :param region_name: the region name
+        :type region_name: str
+        :return: whether the file affects the region's generated config
+        :rtype: bool
+        """
+        def _norm(p):
+            return os.path.normpath(os.path.join('.', p))
+
+        try:
+            roots = [_norm(p) for p in self._config.policy_source_paths]
+        except AttributeError:
+            roots = ['.']
+        dirname, fname = os.path.split(path)
+        dirname = _norm(dirname)
+        if fname == 'defaults.yml' and dirname in ['.'] + roots:
+            return True
+        acct_dir, region_dir = os.path.split(dirname)
+        root, acct = os.path.split(acct_dir)
+        return (
+            _norm(root) in roots and
+            acct in ['all_accounts', self._config.account_name] and
+            region_dir in ['common', region_name]
+        )
+
+    def _manifest_keys(self):
+        """
+        Build the dict of each file that :py:meth:`~.run` generates to a key
+        (SHA256 hex digest) of all of the inputs that can affect it:
+
+        * every output depends on the manheim_c7n_tools version, the contents
+          of the whole config file, and the current account name;
+        * ``policies.rst`` also depends on every policy file for every account;
+        * each ``custodian_REGION.yml`` also depends on the ``POLICYGEN_ENV_*``
+          environment variables and the defaults and policy files for that
+          region of the current account (see
+          :py:meth:`~._file_affects_region`).
+
+        Build information included in ``policies.rst`` (i.e. the git commit
+        and timestamp) is deliberately not an input.
+
+        :return: dict of output file name to input key
+        :rtype: dict
+        """
+        def _key(items):
+            return hashlib.sha256(
+                json.dumps(items, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+
+        files = self._input_hashes()
+        with open(self._config.config_path, 'rb') as fh:
+            common = [
+                VERSION, hashlib.sha256(fh.read()).hexdigest(),
+                self._config.account_name
+            ]
+        env = sorted(
+            [k, v] for k, v in os.environ.items()
+            if k.startswith('POLICYGEN_ENV_')
+        )
+        keys = {
+            'regions.rst': _key(common),
+            'policies.rst': _key([common, sorted(files.items())])
+        }
+        for rname in self._config.regions:
+            keys[custodian_config_name(rname, self._output_format)] = _key([
+                common, env, rname, sorted(
+                    [p, h] for p, h in files.items()
+                    if self._file_affects_region(p, rname)
+                )
+            ])
+        return keys
+
+    def _read_manifest(self):
+        """
+        Read the manifest at :py:const:`~.MANIFEST_PATH`.
+
+        :return: dict of output file name to dict with ``inputs`` (input key)
+          and ``sha256`` (hash of the file as written) keys; empty if there is
+          no manifest
+        :rtype: dict
+        """
+        if not os.path.exists(MANIFEST_PATH):
+            return {}
+        with open(MANIFEST_PATH, 'r') as fh:
+            return json.load(fh)
+
+    def _stale_outputs(self, keys):
+        """
+        Return the set of generated files that must be regenerated; those that
+        are not in the manifest, have a different input key than in the
+        manifest, or no longer exist as they were written.
+
+        :param keys: return value of :py:meth:`~._manifest_keys`
+        :type keys: dict
+        :return: set of output file names to regenerate
+        :rtype: set
+        """
+        manifest = self._read_manifest()
+        stale = set()
+        for fname, key in keys.items():
+            entry = manifest.get(fname, {})
+            if (
+                entry.get('inputs') != key or
+                self._file_hash(fname) != entry.get('sha256')
+            ):
+                stale.add(fname)
+        return stale
+
+    def _write_manifest(self, keys):
+        """
+        Write the manifest of input keys and output file hashes to
+        :py:const:`~.MANIFEST_PATH`.
+
+        :param keys: return value of :py:meth:`~._manifest_keys`
+        :type keys: dict
+        """
+        manifest = {
+            fname: {'inputs': key, 'sha256': self._file_hash(fname)}
+            for fname, key in keys.items()
+        }
+        with open(MANIFEST_PATH, 'w') as fh:
+            json.dump(manifest, fh, sort_keys=True, indent=2)
+
+    def _file_hash(self, path):
+        """
+        Return the SHA256 hex digest of a file's contents, or None if it does
+        not exist.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as fh:
+            return hashlib.sha256(fh.read()).hexdigest()
 
     def _load_defaults(self):
         """
@@ -106,7 +575,7 @@ class PolicyGen(object):
         """
         defaults = None
         # read the global defaults
-        if os.path.exists(os.path.join('policies', 'defaults.yml')):
+        if 'defaults.yml' in self._policy_files(''):
             defaults = self._read_file_yaml(
                 os.path.join('policies', 'defaults.yml')
             )
@@ -115,9 +584,7 @@ class PolicyGen(object):
         try:
             paths = self._config.policy_source_paths
             for path in paths:
-                if os.path.exists(
-                    os.path.join('policies', path, 'defaults.yml')
-                ):
+                if 'defaults.yml' in self._policy_files(path):
                     defaults = self._read_file_yaml(
                         os.path.join('policies', path, 'defaults.yml')
                     )
@@ -133,6 +600,11 @@ class PolicyGen(object):
         """
         # dict to hold account_name -> config for that account
         acct_configs = {}
+        try:
+            paths = self._config.policy_source_paths
+        except AttributeError:
+            paths = ['']
+        self._preload_policies(paths)
         try:
             logger.info(
                 "Reading from multiple source paths: %s",
@@ -158,7 +630,24 @@ class PolicyGen(object):
         return acct_configs
 
     def _merge_configs(self, target, source):
-        new_config = deepcopy(target)
+        """
+        Merge the policies from one source path (``source``) over those from
+        previous source paths (``target``), returning a new nested dict of
+        account name to region name to dict of policy name to policy.
+
+        Only the account and region dicts are copied; policies themselves are
+        shared with ``target`` and ``source`` (see :py:meth:`~._load_policy`).
+
+        :param target: policies merged from previous source paths
+        :type target: dict
+        :param source: policies from the current source path
+        :type source: dict
+        :return: merged nested dict of policies
+        :rtype: dict
+        """
+        new_config = {
+            a: self._copy_regions(r) for a, r in target.items()
+        }
         for account in source:
             if account in new_config:
                 for region in source[account]:
@@ -173,20 +662,38 @@ class PolicyGen(object):
                                     del new_config[account][region][rule]
                             else:
                                 new_config[account][region][rule] = \
-                                    deepcopy(source[account][region][rule])
+                                    source[account][region][rule]
                     else:
-                        new_config[account][region] = \
-                            deepcopy(source[account][region])
+                        new_config[account][region] = dict(
+                            source[account][region]
+                        )
             else:
-                new_config[account] = deepcopy(source[account])
+                new_config[account] = self._copy_regions(source[account])
         return new_config
 
+    def _copy_regions(self, region_policies):
+        """
+        Copy a dict of region name to dict of policy name to policy, without
+        copying the policies themselves.
+
+        :param region_policies: dict of region name to dict of policies
+        :type region_policies: dict
+        :return: copy of ``region_policies`` that shares its policy dicts
+        :rtype: dict
+        """
+        return {r: dict(p) for r, p in region_policies.items()}
+
     def _load_policy(self, path=''):
         """
         Load all policies in a given path; return a nested dict of account name
         (str) to region name (str) to dict of policy names (str) to policies
         (dict).
 
+        Each policy file is only read once, and the same policy dict is shared
+        by every account and region that it applies to. Policies must not be
+        modified after loading; :py:meth:`~._generate_configs` copies each one
+        before applying defaults.
+
         :param path: path to load policies from
         :type path: str
         :return: nested dict of policies
@@ -201,7 +708,7 @@ class PolicyGen(object):
         # loop over all accounts in the config file
         for acctname in self._config.list_accounts(self._config.config_path):
             # start with the all_accts dict, for common config
-            conf = deepcopy(all_accts)
+            conf = self._copy_regions(all_accts)
             # read the account's config
             acct_conf = self._read_policy_directory(
                 os.path.join(path, acctname)
@@ -209,7 +716,7 @@ class PolicyGen(object):
             # for each region, layer per-account over all_accounts
             for rname in self._config.regions:
                 conf[rname].update(acct_conf[rname])
-            acct_configs[acctname] = deepcopy(conf)
+            acct_configs[acctname] = conf
         return acct_configs
 
     def _read_policy_directory(self, policy_dir):
@@ -226,7 +733,7 @@ class PolicyGen(object):
         common = self._read_policies(os.path.join(policy_dir, 'common'))
         region_policies = {}
         for rname in self._config.regions:
-            policies = deepcopy(common)
+            policies = dict(common)
             policies.update(
                 self._read_policies(os.path.join(policy_dir, rname))
             )
@@ -236,8 +743,9 @@ class PolicyGen(object):
     def _generate_configs(self, policies, defaults, region_name):
         """
         Given policies read from disk, apply defaults, generate cleanup
-        policies, sanity/safety check policies. Then write the custodian configs
-        to disk and return the resulting policies dict.
+        policies, sort policies by :py:func:`~.policy_sort_key` and
+        sanity/safety check them. Then write the custodian configs to disk and
+        return the resulting policies dict.
 
         :param policies: the policies read from disk (return value of
           :py:meth:`~._read_policies`)
@@ -250,11 +758,10 @@ class PolicyGen(object):
         :rtype: dict
         """
         result = {'policies': []}
+        defaults_fp = self._fingerprint(defaults)
         for k in sorted(policies.keys()):
             result['policies'].append(
-                self._handle_notify_only_policy(
-                    self._apply_defaults(defaults, policies[k])
-                )
+                self._process_policy(defaults, defaults_fp, policies[k])
             )
         if self._config.cleanup_notify:
             logger.info('Generating c7n cleanup policies...')
@@ -263,19 +770,124 @@ class PolicyGen(object):
                 deepcopy(result['policies'])
             ):
                 result['policies'].append(
-                    self._handle_notify_only_policy(
-                        self._apply_defaults(defaults, pol)
-                    )
+                    self._process_policy(defaults, defaults_fp, pol)
                 )
+        result['policies'].sort(key=policy_sort_key)
         logger.info('Checking policies for sanity and safety...')
         self._check_policies(result['policies'])
         self._write_custodian_configs(result, region_name)
         return result
 
+    def _generate_region_configs(self, region_policies, defaults, regions):
+        """
+        Call :py:meth:`~._generate_configs` for each of the specified regions;
+        in a pool of up to ``self._workers`` worker processes (each with its
+        own PolicyGen instance) if there is more than one region, otherwise
+        serially. The generated files are identical either way.
+
+        :param region_policies: dict of region name to the policies read from
+          disk for that region
+        :type region_policies: dict
+        :param defaults: the defaults to apply to the policies
+        :type defaults: dict
+        :param regions: names of the regions to generate configs for
+        :type regions: list
+        """
+        if self._workers < 2 or len(regions) < 2:
+            for rname in regions:
+                self._generate_configs(
+                    region_policies[rname], defaults, rname
+                )
+            return
+        workers = min(self._workers, len(regions))
+        logger.info(
+            'Generating configs for %d regions in %d worker processes',
+            len(regions), workers
+        )
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=self._worker_initargs()
+        ) as ex:
+            futures = [
+                ex.submit(
+                    _generate_region, region_policies[rname], defaults, rname
+                ) for rname in regions
+            ]
+            for f in futures:
+                f.result()
+
+    def _worker_initargs(self):
+        """
+        Return the arguments for :py:func:`~._init_worker`, to create a
+        PolicyGen in each worker process with the same config and output
+        format as this one (but without worker processes of its own).
+
+        :rtype: tuple
+        """
+        return (
+            type(self), self._config, {'output_format': self._output_format}
+        )
+
+    def _process_policy(self, defaults, defaults_fp, policy):
+        """
+        Apply defaults to a policy and handle ``notify_only``, returning the
+        resulting policy. Results are cached by the fingerprints of the
+        defaults and policy, so a policy that is identical in multiple regions
+        (i.e. from a ``common`` directory) is only processed once and the same
+        result is returned for every region. Results must not be modified;
+        region-specific macros are substituted in the generated YAML by
+        :py:meth:`~._write_custodian_configs`.
+
+        :param defaults: the defaults to apply to the policy
+        :type defaults: dict
+        :param defaults_fp: :py:meth:`~._fingerprint` of ``defaults``
+        :type defaults_fp: str
+        :param policy: the policy to process; this is not modified
+        :type policy: dict
+        :return: processed policy
+        :rtype: dict
+        """
+        key = None
+        policy_fp = self._fingerprint(policy)
+        if defaults_fp is not None and policy_fp is not None:
+            key = (defaults_fp, policy_fp)
+            if key in self._processed:
+                return self._processed[key]
+        # policies are shared between accounts and regions when loaded;
+        # copy each one here, as applying defaults modifies it in place
+        res = self._handle_notify_only_policy(
+            self._apply_defaults(defaults, deepcopy(policy))
+        )
+        if key is not None:
+            self._processed[key] = res
+        return res
+
+    @staticmethod
+    def _fingerprint(obj):
+        """
+        Return a SHA256 hex digest of the content of a policy or defaults dict,
+        or None if it cannot be serialized to JSON (e.g. if it has non-string
+        keys), in which case it should not be cached.
+
+        :param obj: the object to fingerprint
+        :type obj: dict
+        :return: fingerprint of ``obj``
+        :rtype: str
+        """
+        try:
+            s = json.dumps(obj, sort_keys=True, default=repr)
+        except TypeError:
+            return None
+        return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
     def _write_custodian_configs(self, result, region_name):
         """
-        Write the per-region ``custodian_REGION.yml`` config file to disk. This
-        also handles ``%%`` macro and environment variable substitution.
+        Write the per-region ``custodian_REGION.yml`` (or ``.json``) config
+        file to disk. This also handles ``%%`` macro and environment variable
+        substitution. YAML is written with the libyaml-based ``CSafeDumper``
+        when available, with identical subtrees (i.e. ``mode`` blocks and
+        notify actions added from defaults) written once as an anchor and
+        then as aliases; see :py:func:`~.share_subtrees`.
 
         :param result: final custodian configuration
         :type result: dict
@@ -283,25 +895,36 @@ class PolicyGen(object):
         :type region_name: str
         """
         enabled_policies = list(filter(is_enabled, result['policies']))
-        config_str = yaml.dump({"policies": enabled_policies})
-        fname = 'custodian_%s.yml' % region_name
+        fname = custodian_config_name(region_name, self._output_format)
         logger.info('Writing %s policies to %s...' % (region_name, fname))
-        conf = config_str
-        replacements = [
-            ['%%BUCKET_NAME%%', self._config.output_s3_bucket_name],
-            ['%%LOG_GROUP%%', self._config.custodian_log_group],
-            ['%%DLQ_ARN%%', self._config.dead_letter_queue_arn],
-            ['%%ROLE_ARN%%', self._config.role_arn],
-            ['%%MAILER_QUEUE_URL%%', self._config.mailer_config['queue_url']],
-            ['%%ACCOUNT_NAME%%', self._config.account_name],
-            ['%%ACCOUNT_ID%%', str(self._config.account_id)],
-            ['%%AWS_REGION%%', region_name]
-        ]
-        for k, v in os.environ.items():
-            if k.startswith('POLICYGEN_ENV_'):
-                replacements.append(['%%' + k + '%%', v])
-        for macro, val in replacements:
-            conf = conf.replace(macro, val)
+        macros = env_macros()
+        macros.update({
+            'BUCKET_NAME': self._config.output_s3_bucket_name,
+            'LOG_GROUP': self._config.custodian_log_group,
+            'DLQ_ARN': self._config.dead_letter_queue_arn,
+            'ROLE_ARN': self._config.role_arn,
+            'MAILER_QUEUE_URL': self._config.mailer_config['queue_url'],
+            'ACCOUNT_NAME': self._config.account_name,
+            'ACCOUNT_ID': str(self._config.account_id),
+            'AWS_REGION': region_name
+        })
+        subst = MacroSubstituter(macros)
+        if self._output_format == 'json':
+            # substitute in the strings themselves, so that macro values
+            # don't need to be escaped
+            conf, unresolved = subst.substitute_structure(
+                {'policies': enabled_policies}
+            )
+            conf = json.dumps(conf, sort_keys=True, indent=2) + '\n'
+        else:
+            conf, unresolved = subst.substitute(yaml.dump(
+                share_subtrees({'policies': enabled_policies}),
+                Dumper=SafeDumper
+            ))
+        if unresolved:
+            logger.warning(
+                'Unresolved macros in %s: %s', fname, ', '.join(unresolved)
+            )
         self._write_file(fname, conf)
 
     def _check_policies(self, policies):
@@ -309,24 +932,56 @@ class PolicyGen(object):
         Check all of our policies to ensure that they conform with some rules
         and best practices around safety and sanity.
 
-        Each policy in ``policies`` is passed through each of the
-        ``self._check_policy_*`` functions (which return a boolean pass/fail).
-        At the end, all failures are collected. If there are any, SystemExit(1)
-        is raised.
+        Each policy in ``policies`` is passed through each of the checks
+        registered with :py:func:`~.policy_check` (which return a boolean
+        pass/fail). At the end, all failures are collected. If there are any,
+        SystemExit(1) is raised.
+
+        Each check is only passed the policy keys it declares, and its results
+        are cached by the content of those keys, so a check is only run once
+        for identical policies in multiple regions (or policies that differ
+        only in keys the check doesn't read). If there are at least
+        :py:const:`~.CHECK_POOL_THRESHOLD` uncached checks to run, they are run
+        in a pool of worker processes.
 
         :param policies: list of policy dictionaries
         :type policies: list
         :raises: SystemExit(1) if any policies failed checks
+        :return: dict of check method name to the time in seconds spent running
+          it (for checks that weren't cached) for these policies
+        :rtype: dict
         """
-        policy_checks = []
-        for x in dir(self):
-            if x.startswith('_check_policy_') and callable(getattr(self, x)):
-                policy_checks.append(getattr(self, x))
-        failures = defaultdict(list)
+        pending = {}
+        policy_keys = []
         for pol in policies:
-            for chk in policy_checks:
-                if not chk(pol):
-                    failures[pol['name']].append(strip_doc(chk))
+            keys = []
+            for name, check_keys in self._policy_checks():
+                subset = {k: pol[k] for k in check_keys if k in pol}
+                fp = self._fingerprint(subset)
+                # unfingerprintable policies are checked, but not cached
+                key = (name, fp if fp is not None else id(pol))
+                if key not in self._check_results and key not in pending:
+                    pending[key] = (name, subset, fp is not None)
+                keys.append(key)
+            policy_keys.append(keys)
+        results = self._run_checks(pending)
+        timings = defaultdict(float)
+        for key, (name, _, cacheable) in pending.items():
+            timings[name] += results[key][1]
+            if cacheable:
+                self._check_results[key] = results[key]
+        for name in sorted(timings.keys()):
+            logger.debug(
+                'Policy check %s took %.4fs', name, timings[name]
+            )
+        failures = defaultdict(list)
+        for pol, keys in zip(policies, policy_keys):
+            for key in keys:
+                res = results.get(key) or self._check_results[key]
+                if not res[0]:
+                    failures[pol['name']].append(
+                        strip_doc(getattr(self, key[0]))
+                    )
         if len(failures) > 0:
             logger.error('ERROR: Some policies failed sanity/safety checks:')
             for pol_name in sorted(failures.keys()):
@@ -335,7 +990,74 @@ class PolicyGen(object):
                     logger.error("\t" + chk_str)
             raise SystemExit(1)
         logger.info('OK: All policies passed sanity/safety checks.')
+        return dict(timings)
+
+    @classmethod
+    def _policy_checks(cls):
+        """
+        Return the policy checks registered with :py:func:`~.policy_check` on
+        this class, sorted by name. The registry is built once per class (for
+        this class, when the module is imported).
+
+        :return: list of (method name, tuple of policy keys read) tuples
+        :rtype: list
+        """
+        if cls.__dict__.get('_check_registry') is None:
+            checks = []
+            for x in dir(cls):
+                keys = getattr(getattr(cls, x), '_policy_check_keys', None)
+                if keys is not None:
+                    checks.append((x, keys))
+            cls._check_registry = checks
+        return cls._check_registry
+
+    def _run_checks(self, pending):
+        """
+        Run the pending checks from :py:meth:`~._check_policies`; in a pool of
+        up to ``self._workers`` worker processes if there are at least
+        :py:const:`~.CHECK_POOL_THRESHOLD` of them, otherwise serially.
+
+        :param pending: dict of cache key to (check method name, policy subset,
+          cacheable) tuples
+        :type pending: dict
+        :return: dict of cache key to (passed, seconds) tuples
+        :rtype: dict
+        """
+        keys = list(pending.keys())
+        jobs = [pending[k][:2] for k in keys]
+        if self._workers < 2 or len(jobs) < CHECK_POOL_THRESHOLD:
+            return dict(zip(keys, [self._run_check(*j) for j in jobs]))
+        size = max(1, len(jobs) // (self._workers * 4))
+        chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+        logger.info(
+            'Running %d policy checks in %d worker processes',
+            len(jobs), self._workers
+        )
+        with ProcessPoolExecutor(
+            max_workers=self._workers, initializer=_init_worker,
+            initargs=self._worker_initargs()
+        ) as ex:
+            results = []
+            for res in ex.map(_run_check_chunk, chunks):
+                results.extend(res)
+        return dict(zip(keys, results))
+
+    def _run_check(self, name, policy):
+        """
+        Run one policy check, timing it.
+
+        :param name: name of the check method
+        :type name: str
+        :param policy: the policy (subset) to check
+        :type policy: dict
+        :return: (passed, seconds) tuple
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        passed = bool(getattr(self, name)(policy))
+        return passed, time.perf_counter() - start
 
+    @policy_check('mode')
     def _check_policy_function_prefix(self, policy):
         """
         Fail if function-prefix doesn't match between manheim-c7n-tools config
@@ -346,13 +1068,14 @@ class PolicyGen(object):
             return False
         return True
 
+    @policy_check('filters')
     def _check_policy_marked_for_op_first(self, policy):
         """
         Policy includes a marked-for-op filter, but it is not the first filter.
         """
         if 'filters' not in policy:
             return True
-        if "'type': 'marked-for-op'" not in str(policy['filters']):
+        if not has_type(policy['filters'], 'marked-for-op'):
             return True
         try:
             if policy['filters'][0].get('type', '') == 'marked-for-op':
@@ -363,6 +1086,7 @@ class PolicyGen(object):
         # fail - first filter isn't marked-for-op
         return False
 
+    @policy_check('filters', 'actions')
     def _check_policy_mark_but_no_tag_filter(self, policy):
         """
         Policy performs a mark action, but does not filter out resources already
@@ -386,6 +1110,7 @@ class PolicyGen(object):
                 return False
         return True
 
+    @policy_check('actions')
     def _check_policy_mark_for_op_bad_message(self, policy):
         """
         mark-for-op action has message that does not end with
@@ -417,7 +1142,10 @@ class PolicyGen(object):
 
         This method generates policies that look for cloud-custodian Lambda
         functions and CloudWatch Events that aren't in the current list of
-        policies, and therefore probably need cleanup, and notifies us.
+        policies, and therefore probably need cleanup, and notifies us. Each
+        uses a single ``not-in`` value filter over the sorted, de-duplicated
+        names of the enabled policies (and the cleanup policies themselves),
+        rather than one ``ne`` filter per policy.
 
         :param policies: list of policy dictionaries
         :type policies: list
@@ -440,20 +1168,7 @@ class PolicyGen(object):
             }],
             'filters': [
                 {'tag:Project': 'cloud-custodian'},
-                {'tag:Component': 'present'},
-                # exclude itself...
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-cwe'
-                }
+                {'tag:Component': 'present'}
             ]
         }
         cwecleanup = {
@@ -475,42 +1190,37 @@ class PolicyGen(object):
                     'key': 'Name',
                     'op': 'glob',
                     'value': 'custodian-*'
-                },
-                # exclude itself...
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-cwe'
                 }
             ]
         }
-        # add the filters
-        for p in policies:
-            name = p['name']
-            if is_enabled(p):
-                cwecleanup['filters'].append({
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-%s' % name
-                })
-                lcleanup['filters'].append({
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': name
-                })
+        # exclude all enabled policies, and the cleanup policies themselves
+        names = set([lcleanup['name'], cwecleanup['name']])
+        names.update(p['name'] for p in policies if is_enabled(p))
+        names = sorted(names)
+        lcleanup['filters'].append({
+            'type': 'value',
+            'key': 'tag:Component',
+            'op': 'not-in',
+            'value': names
+        })
+        cwecleanup['filters'].append({
+            'type': 'value',
+            'key': 'Name',
+            'op': 'not-in',
+            'value': ['custodian-%s' % n for n in names]
+        })
         return [lcleanup, cwecleanup]
 
     def _write_file(self, path, content):
-        """write a file - helper to make unit tests simpler"""
+        """
+        write a file - helper to make unit tests simpler. If the file already
+        exists with identical content, it is left untouched.
+        """
+        if os.path.exists(path):
+            with open(path, 'r') as fh:
+                if fh.read() == content:
+                    logger.debug('%s is unchanged; not rewriting', path)
+                    return
         with open(path, 'w') as fh:
             fh.write(content)
 
@@ -529,6 +1239,8 @@ class PolicyGen(object):
         notify_only = policy['notify_only']
         del policy['notify_only']
         if notify_only:
+            # imported here, as notifyonly imports c7n, which is slow
+            from manheim_c7n_tools.notifyonly import NotifyOnlyPolicy
             return NotifyOnlyPolicy(policy).as_notify_only()
         return policy
 
@@ -561,10 +1273,12 @@ class PolicyGen(object):
         :rtype: dict
         """
         try:
-            desired = self._config.always_notify
-            desired['type'] = 'notify'
+            # the config may be shared (see ManheimConfigSet.load), and the
+            # action is added to every policy; never modify or share it
+            desired = deepcopy(self._config.always_notify)
         except AttributeError:
             return conf
+        desired['type'] = 'notify'
         added = False
         for action in conf['actions']:
             if not isinstance(action, type({})):
@@ -781,7 +1495,8 @@ class PolicyGen(object):
     def _read_policies(self, subdir):
         """
         Read policy files from a subdirectory of the policies directory, and
-        return the resulting dict of policy names to policy contents.
+        return the resulting dict of policy names to policy contents. The files
+        are found in :py:meth:`~._policy_file_index`.
 
         :param subdir: directory path under ``policies/`` to read
         :type subdir: str
@@ -789,34 +1504,178 @@ class PolicyGen(object):
         :rtype: dict
         """
         res = {}
-        try:
-            for f in os.listdir(os.path.join('policies', subdir)):
-                if not f.endswith('.yml'):
-                    continue
-                name = f.split('.')[0]
-                y = self._read_file_yaml(os.path.join('policies', subdir, f))
-                res[name] = y
-                if name != 'defaults' and y.get('name', '') != name:
-                    raise RuntimeError(
-                        'ERROR: Policy file %s contains policy with name '
-                        '"%s".' % (f, y.get('name', ''))
-                    )
-        except OSError:
+        files = self._policy_files(subdir)
+        if not files:
             return {}
+        for f in files:
+            name = f.split('.')[0]
+            y = self._read_file_yaml(os.path.join('policies', subdir, f))
+            res[name] = y
+            if name != 'defaults' and y.get('name', '') != name:
+                raise RuntimeError(
+                    'ERROR: Policy file %s contains policy with name '
+                    '"%s".' % (f, y.get('name', ''))
+                )
         logger.info(
             'Loaded %d policies from %s: %s', len(res), subdir, res.keys()
         )
         return res
 
+    def _policy_files(self, subdir):
+        """
+        Return the sorted list of ``.yml`` file names in a subdirectory of the
+        policies directory, from :py:meth:`~._policy_file_index`.
+
+        :param subdir: directory path under ``policies/``
+        :type subdir: str
+        :return: list of YAML file names in the directory; empty if it does
+          not exist
+        :rtype: list
+        """
+        return self._policy_file_index().get(os.path.normpath(subdir), [])
+
+    def _policy_file_index(self):
+        """
+        Return an index of the YAML files under ``policies/``, built by walking
+        the directory tree once (with :py:func:`os.scandir`) the first time
+        this is called, so that looking up the files for each combination of
+        source path, ``all_accounts`` or account name, and ``common`` or region
+        name doesn't need another syscall.
+
+        :return: dict of normalized directory path relative to ``policies/``
+          (``.`` for ``policies/`` itself) to the sorted list of ``.yml`` file
+          names in that directory; directories without any are omitted
+        :rtype: dict
+        """
+        if self._policy_index is None:
+            self._policy_index = {}
+            self._index_directory('policies')
+        return self._policy_index
+
+    def _index_directory(self, path, seen=None):
+        """
+        Add the YAML files in ``path`` and its subdirectories to
+        ``self._policy_index``; see :py:meth:`~._policy_file_index`.
+
+        Symlinked directories are followed, but each directory is only indexed
+        once (by device and inode), so that a symlink loop can't recurse
+        forever.
+
+        :param path: path of the directory to index
+        :type path: str
+        :param seen: set of ``(st_dev, st_ino)`` of the directories already
+          indexed
+        :type seen: set
+        """
+        if seen is None:
+            seen = set()
+        files = []
+        try:
+            st = os.stat(path)
+            key = (st.st_dev, st.st_ino)
+            if key in seen:
+                return
+            seen.add(key)
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir():
+                self._index_directory(entry.path, seen)
+            elif entry.name.endswith('.yml'):
+                files.append(entry.name)
+        if files:
+            self._policy_index[os.path.relpath(path, 'policies')] = sorted(
+                files
+            )
+
     def _read_file_yaml(self, path):
-        """unit test helper - return YAML from file contents"""
+        """
+        unit test helper - return YAML from file contents; from the
+        :py:class:`~.YamlCache`, if enabled
+        """
+        if path in self._parsed:
+            return self._parsed[path]
+        if self._yaml_cache is not None:
+            return self._yaml_cache.get(path, parse_yaml)
         with open(path, 'r') as fh:
             contents = fh.read()
-        try:
-            return yaml.load(contents, Loader=SafeLoader)
-        except Exception:
-            sys.stderr.write("Exception loading YAML: %s\n" % path)
-            raise
+        return parse_yaml(path, contents)
+
+    def _preload_policies(self, paths):
+        """
+        Parse every policy file that :py:meth:`~._load_policy` will read for
+        the given ``policy_source_paths`` (the ``common`` and region
+        directories of ``all_accounts`` and each account), so that
+        :py:meth:`~._read_file_yaml` can return them without parsing.
+
+        Files are parsed by :py:meth:`~._parse_files` (in a pool of worker
+        processes, if there are enough of them), or served from the
+        :py:class:`~.YamlCache` if enabled. The name of each policy is then
+        checked against its file name, and a RuntimeError listing every
+        mismatch is raised if there are any.
+
+        :param paths: policy source paths, or ``['']`` for ``policies/``
+        :type paths: list
+        :raises: RuntimeError if any policy names don't match their files
+        """
+        scopes = ['all_accounts'] + sorted(
+            self._config.list_accounts(self._config.config_path)
+        )
+        dirs = ['common'] + list(self._config.regions)
+        files = []
+        for path in paths:
+            for scope in scopes:
+                for d in dirs:
+                    subdir = os.path.join(path, scope, d)
+                    for f in self._policy_files(subdir):
+                        files.append(os.path.join('policies', subdir, f))
+        if self._yaml_cache is not None:
+            parsed = self._yaml_cache.get_many(files, self._parse_files)
+        else:
+            items = []
+            for f in files:
+                with open(f, 'r') as fh:
+                    items.append((f, fh.read()))
+            parsed = dict(zip(files, self._parse_files(items)))
+        errors = []
+        for f in files:
+            name = os.path.basename(f).split('.')[0]
+            y = parsed[f]
+            if name != 'defaults' and y.get('name', '') != name:
+                errors.append(
+                    'ERROR: Policy file %s contains policy with name '
+                    '"%s".' % (f, y.get('name', ''))
+                )
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        self._parsed.update(parsed)
+
+    def _parse_files(self, items):
+        """
+        Parse the contents of YAML files; in a pool of up to
+        ``self._workers`` worker processes if there are at least
+        :py:const:`~.PARSE_POOL_THRESHOLD` of them, otherwise serially.
+
+        :param items: list of (path, file contents) tuples
+        :type items: list
+        :return: list of parsed file contents, in the same order as ``items``
+        :rtype: list
+        """
+        if self._workers < 2 or len(items) < PARSE_POOL_THRESHOLD:
+            return [parse_yaml(path, contents) for path, contents in items]
+        size = max(1, len(items) // (self._workers * 4))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        logger.info(
+            'Parsing %d policy files in %d worker processes',
+            len(items), self._workers
+        )
+        res = []
+        with ProcessPoolExecutor(max_workers=self._workers) as ex:
+            for parsed in ex.map(_parse_yaml_chunk, chunks):
+                res.extend(parsed)
+        return res
 
     def _setup_mailer_templates(self):
         """
@@ -888,6 +1747,10 @@ class PolicyGen(object):
         return templates
 
 
+# build the check registry once, at import time
+PolicyGen._policy_checks()
+
+
 def main():
     # setup logging for direct command-line use
     global logger
@@ -916,13 +1779,35 @@ def main():
     p.add_argument('-c', '--config', dest='config', action='store',
                    default='manheim-c7n-tools.yml',
                    help='Config file path (default: ./manheim-c7n-tools.yml)')
+    p.add_argument('-i', '--incremental', dest='incremental',
+                   action='store_true', default=False,
+                   help='Only regenerate files whose inputs have changed '
+                        'since the last incremental run (tracked in %s)' %
+                        MANIFEST_PATH)
+    p.add_argument('--no-cache', dest='yaml_cache', action='store_false',
+                   default=True,
+                   help='Do not use or update the cache of parsed policy '
+                        'files in %s/' % CACHE_PATH)
+    p.add_argument('-j', '--jobs', dest='workers', action='store', type=int,
+                   default=1,
+                   help='Number of worker processes to parse policy files '
+                        'and generate region configs with (default: 1)')
+    p.add_argument('-f', '--output-format', dest='output_format',
+                   action='store', choices=sorted(OUTPUT_FORMATS.keys()),
+                   default='yaml',
+                   help='Format to write custodian_REGION configs in; json '
+                        'configs are written to custodian_REGION.json '
+                        '(default: yaml)')
     p.add_argument('ACCT_NAME', action='store', type=str,
                    help='account_name value from config file, for '
                         'current account')
 
     args = p.parse_args(sys.argv[1:])
     conf = ManheimConfig.from_file(args.config, args.ACCT_NAME)
-    PolicyGen(conf).run()
+    PolicyGen(
+        conf, incremental=args.incremental, yaml_cache=args.yaml_cache,
+        workers=args.workers, output_format=args.output_format
+    ).run()
 
 
 if __name__ == "__main__":
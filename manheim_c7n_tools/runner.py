@@ -16,11 +16,14 @@
 Command-line entrypoint to run one/multiple/all steps of a c7n deployment.
 
 The command-line entrypoint function (:py:func:`~.main`) instantiates an
-instance of :py:class:`~.CustodianRunner` and calls its
-:py:meth:`~.CustodianRunner.run` method. This iterates through all of the
-classes listed in :py:attr:`~.CustodianRunner.ordered_step_classes` and calls
-their ``run`` or ``dryrun`` methods depending on which was specified on the
-command line.
+instance of :py:class:`~.CustodianRunner` (or, for more than one account,
+:py:class:`~.MultiAccountRunner`) and calls its
+:py:meth:`~.CustodianRunner.run` method. This builds a dependency graph of
+(step, region) tasks from the classes listed in
+:py:attr:`~.CustodianRunner.ordered_step_classes` and their
+:py:attr:`~.BaseStep.depends_on` declarations, and calls each task's ``run`` or
+``dryrun`` method, depending on which was specified on the command line, once
+all of its dependencies are complete.
 """
 
 import sys
@@ -28,34 +31,40 @@ import logging
 import argparse
 import abc
 import functools
-from shutil import rmtree
+from shutil import rmtree, copytree
 import os
+from fnmatch import fnmatch
 from copy import deepcopy
 import re
+import traceback
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import multiprocessing.connection
 
-from sphinx.cmd.build import main as sphinx_main
-import jsonschema
-import boto3
-
-from c7n.commands import validate, run
-from c7n.config import Config
-from c7n.policy import PolicyCollection
-from c7n_mailer.cli import session_factory
-from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
-from c7n_mailer.utils import setup_defaults as mailer_setup_defaults
-from c7n_mailer import deploy as mailer_deploy
+# sphinx, jsonschema, boto3, c7n, c7n_mailer and the modules that use them
+# (mugc, dryrun_diff, s3_archiver) are slow to import, so they are imported by
+# the steps that use them; commands that don't run any steps (i.e. ``list``
+# and ``accounts``) don't need them.
 
 from manheim_c7n_tools.utils import (
-    set_log_info, set_log_debug, bold, assume_role
+    set_log_info, set_log_debug, bold, assume_role, assume_role_session
 )
 from manheim_c7n_tools.version import VERSION, PROJECT_URL
-from manheim_c7n_tools.policygen import PolicyGen
-from manheim_c7n_tools.vendor.mugc import (
-    load_policies, resources_gc_prefix, AWS
+from manheim_c7n_tools.policygen import (
+    PolicyGen, OUTPUT_FORMATS, custodian_config_name, describe_calls,
+    MANIFEST_PATH as POLICYGEN_MANIFEST_PATH
 )
-from manheim_c7n_tools.dryrun_diff import DryRunDiffer
-from manheim_c7n_tools.s3_archiver import S3Archiver
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.policy_artifacts import PolicyArtifacts
+from manheim_c7n_tools.validationcache import (
+    ValidationCache, validate_custodian_config,
+    DEFAULT_PATH as VALIDATION_CACHE_PATH
+)
+from manheim_c7n_tools.yamlcache import DEFAULT_PATH as POLICYGEN_CACHE_PATH
+from manheim_c7n_tools.checkpoint import (
+    CheckpointJournal, DEFAULT_PATH as DEFAULT_CHECKPOINT_PATH
+)
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=FORMAT)
@@ -67,6 +76,30 @@ for lname in ['boto3', 'botocore', 'urllib', 'urllib3']:
     log.setLevel(logging.WARNING)
     log.propagate = True
 
+#: :py:attr:`~.BaseStep.depends_on` scope - the dependency must be complete in
+#: the same region as the dependent step.
+SAME_REGION = 'region'
+
+#: :py:attr:`~.BaseStep.depends_on` scope - the dependency must be complete in
+#: every region before the dependent step can start in any region.
+ALL_REGIONS = 'all'
+
+#: Directory (relative to the current directory) that
+#: :py:class:`~.MultiAccountRunner` creates per-account working copies in.
+ACCOUNTS_WORKDIR = '.c7n-accounts'
+
+#: Patterns of paths (relative to the current directory) that
+#: :py:func:`~.setup_account_workdir` does not copy into per-account working
+#: copies; version control, tox and virtualenv directories, caches, and the
+#: outputs of previous runs.
+WORKDIR_EXCLUDE = [
+    '.git', '.tox', '.nox', '.venv', 'venv', ACCOUNTS_WORKDIR,
+    DEFAULT_CHECKPOINT_PATH, POLICYGEN_CACHE_PATH, VALIDATION_CACHE_PATH,
+    POLICYGEN_MANIFEST_PATH, 'custodian_*.yml', 'custodian_*.json', 'dryrun',
+    os.path.join('docs', '_build'), 'pr_diff.md', 'pr_report.html',
+    os.path.join('*', '__pycache__'), '__pycache__', '.pytest_cache'
+]
+
 
 class BaseStep(object):
     """
@@ -80,24 +113,89 @@ class BaseStep(object):
     #: The name of the step, as used on the CLI
     name = None
 
-    def __init__(self, region_name, config):
+    #: Whether the work this step does in one region is completely independent
+    #: of the work it does in any other region. Steps that set this to True
+    #: may be run in multiple regions concurrently (each region in its own
+    #: worker process) when the runner's ``parallel_regions`` option is
+    #: greater than one.
+    region_independent = False
+
+    #: Whether this step runs only once per account, rather than once per
+    #: region. Global steps are passed a ``region_name`` of None and the
+    #: account config without any region-specific interpolation, and their
+    #: :py:meth:`~.run_in_region` method is never called.
+    is_global = False
+
+    #: The steps that must be complete before this step can run, as a list of
+    #: 2-tuples of (step name, scope) where scope is :py:const:`~.SAME_REGION`
+    #: or :py:const:`~.ALL_REGIONS`. Dependencies on global steps are always
+    #: on the single global run of that step. A dependency on a step that is
+    #: not selected to run, or that does not run in a given region, is
+    #: replaced with that step's own dependencies.
+    depends_on = []
+
+    #: Whether completed runs of this step are recorded in the
+    #: :py:class:`~.CheckpointJournal`, so that they can be skipped when
+    #: resuming a failed run.
+    checkpoint = True
+
+    def __init__(self, region_name, config, session=None, options=None):
         """
         Base Step class initializer.
 
         Steps should ONLY ever be initialized by
-        :py:meth:`~.CustodianRunner._run_step_in_regions`.
+        :py:meth:`~.CustodianRunner._run_task` or :py:func:`~.run_task`.
 
-        :param region_name: region name to run this step against
+        :param region_name: region name to run this step against, or None for
+          :py:attr:`~.is_global` steps
         :type region_name: str
         :param config: The manheim-c7n-tools config to use for this step,
           already made region-specific
-          (:py:meth:`~.ManheimConfig.config_for_region` is called where this
-          class is intialized in
-          :py:meth:`~.CustodianRunner._run_step_in_regions`).
+          (:py:meth:`~.ManheimConfig.config_for_region` is called in
+          :py:meth:`~.CustodianRunner._build_graph`) unless this step is
+          :py:attr:`~.is_global`.
         :type config: ManheimConfig
+        :param session: boto3 Session for the account, or None to use a new
+          default session
+        :type session: boto3.session.Session
+        :param options: step-specific options from the command line (see
+          :py:attr:`~.CustodianRunner.options`)
+        :type options: dict
         """
         self.region_name = region_name
         self.config = config
+        self._session = session
+        self.options = options or {}
+
+    @property
+    def custodian_config(self):
+        """
+        Return the file name of the custodian config that
+        :py:class:`~.PolicygenStep` generates for this step's region, in the
+        ``policygen_output_format`` option's format.
+
+        :return: config file name, i.e. ``custodian_us-east-1.yml``
+        :rtype: str
+        """
+        return custodian_config_name(
+            self.region_name,
+            self.options.get('policygen_output_format', 'yaml')
+        )
+
+    @property
+    def session(self):
+        """
+        Return the boto3 Session for the account this step runs against. This
+        is the session passed to the constructor if there was one, otherwise a
+        new Session using boto3's default credential chain.
+
+        :return: boto3 Session for the account
+        :rtype: boto3.session.Session
+        """
+        if self._session is None:
+            import boto3
+            self._session = boto3.session.Session()
+        return self._session
 
     @abc.abstractmethod
     def run(self):
@@ -117,9 +215,8 @@ class BaseStep(object):
         :type region_name: str
         :param config: The manheim-c7n-tools config to use for this step,
           already made region-specific
-          (:py:meth:`~.ManheimConfig.config_for_region` is called where this
-          class is intialized in
-          :py:meth:`~.CustodianRunner._run_step_in_regions`).
+          (:py:meth:`~.ManheimConfig.config_for_region` is called in
+          :py:meth:`~.CustodianRunner._build_graph`).
         :type config: ManheimConfig
         :return: whether this step should run in the specified region
         :rtype: bool
@@ -131,9 +228,22 @@ class PolicygenStep(BaseStep):
     """Step to run policygen to generate custodian-ready policies on disk."""
 
     name = 'policygen'
+    is_global = True
+    # always regenerate, so that the checkpoint fingerprints of later steps
+    # reflect the current policies
+    checkpoint = False
 
     def _do_policygen(self):
-        PolicyGen(self.config).run()
+        PolicyGen(
+            self.config,
+            incremental=self.options.get('incremental_policygen', False),
+            yaml_cache=self.options.get('policygen_cache', False),
+            workers=self.options.get('policygen_workers', 1),
+            output_format=self.options.get('policygen_output_format', 'yaml'),
+            cache_path=self.options.get(
+                'policygen_cache_path', POLICYGEN_CACHE_PATH
+            )
+        ).run()
 
     def run(self):
         self._do_policygen()
@@ -141,24 +251,40 @@ class PolicygenStep(BaseStep):
     def dryrun(self):
         self._do_policygen()
 
-    @staticmethod
-    def run_in_region(region_name, conf):
-        # only run in the first-configured region
-        return region_name == conf.regions[0]
-
 
 class ValidateStep(BaseStep):
-    """Step to run custodian validate on generated policies."""
+    """
+    Step to run custodian validate on generated policies. If the
+    ``validation_cache`` option is True, only policies that are not in the
+    :py:class:`~.ValidationCache` are validated. The validated config is
+    cached as :py:class:`~.PolicyArtifacts`, so that later steps in the same
+    process don't parse and validate it again.
+    """
 
     name = 'validate'
+    region_independent = True
+    depends_on = [('policygen', ALL_REGIONS)]
 
     def _do_validate(self):
+        if self.options.get('validation_cache', False):
+            validate_custodian_config(
+                self.custodian_config, ValidationCache(
+                    self.custodian_config, path=self.options.get(
+                        'validation_cache_path', VALIDATION_CACHE_PATH
+                    )
+                )
+            )
+            PolicyArtifacts.validated(self.custodian_config)
+            return
+        from c7n.commands import validate
+        from c7n.config import Config
         conf = Config.empty(
-            configs=['custodian_%s.yml' % self.region_name],
+            configs=[self.custodian_config],
             region=self.region_name,
             check_deprecations="yes"
         )
         validate(conf)
+        PolicyArtifacts.validated(self.custodian_config)
 
     def run(self):
         self._do_validate()
@@ -170,18 +296,26 @@ class ValidateStep(BaseStep):
 class MugcStep(BaseStep):
     """
     Step to run custodian mugc.py (lambda garbage collection), based on main()
-    in that module.
+    in that module. Policies are loaded from the :py:class:`~.PolicyArtifacts`
+    cached by :py:class:`~.ValidateStep`, if it ran in the same process.
     """
 
     name = 'mugc'
+    region_independent = True
+    depends_on = [('validate', SAME_REGION)]
 
     def run(self):
         # This is largely based off of mugc.main()
+        from c7n.config import Config
+        from c7n.policy import PolicyCollection
+        from manheim_c7n_tools.vendor.mugc import (
+            resources_gc_prefix, AWS, GC_WORKERS
+        )
         logging.getLogger('botocore').setLevel(logging.ERROR)
         logging.getLogger('urllib3').setLevel(logging.ERROR)
         logging.getLogger('c7n.cache').setLevel(logging.WARNING)
         conf = Config.empty(
-            config_files=['custodian_%s.yml' % self.region_name],
+            config_files=[self.custodian_config],
             regions=[self.region_name],
             prefix=self.config.function_prefix,
             policy_regex='^' + re.escape(self.config.function_prefix) + '.*',
@@ -191,13 +325,16 @@ class MugcStep(BaseStep):
             external_id=None,
             cache_period=0,
             cache=None,
-            present=False
+            present=False,
+            gc_workers=self.options.get('mugc_workers', GC_WORKERS)
         )
         # use cloud provider to initialize policies to get region expansion
         policies = AWS().initialize_policies(
             PolicyCollection(
                 [
-                    p for p in load_policies(conf, conf)
+                    p for p in PolicyArtifacts.load(
+                        self.custodian_config
+                    ).collection(conf)
                     if p.provider_name == 'aws'
                 ],
                 conf
@@ -208,11 +345,16 @@ class MugcStep(BaseStep):
 
     def dryrun(self):
         # This is largely based off of mugc.main()
+        from c7n.config import Config
+        from c7n.policy import PolicyCollection
+        from manheim_c7n_tools.vendor.mugc import (
+            resources_gc_prefix, AWS, GC_WORKERS
+        )
         logging.getLogger('botocore').setLevel(logging.ERROR)
         logging.getLogger('urllib3').setLevel(logging.ERROR)
         logging.getLogger('c7n.cache').setLevel(logging.WARNING)
         conf = Config.empty(
-            config_files=['custodian_%s.yml' % self.region_name],
+            config_files=[self.custodian_config],
             regions=[self.region_name],
             prefix=self.config.function_prefix,
             policy_regex='^' + re.escape(self.config.function_prefix) + '.*',
@@ -223,13 +365,16 @@ class MugcStep(BaseStep):
             cache_period=0,
             cache=None,
             present=False,
-            dryrun=True
+            dryrun=True,
+            gc_workers=self.options.get('mugc_workers', GC_WORKERS)
         )
         # use cloud provider to initialize policies to get region expansion
         policies = AWS().initialize_policies(
             PolicyCollection(
                 [
-                    p for p in load_policies(conf, conf)
+                    p for p in PolicyArtifacts.load(
+                        self.custodian_config
+                    ).collection(conf)
                     if p.provider_name == 'aws'
                 ],
                 conf
@@ -240,9 +385,61 @@ class MugcStep(BaseStep):
 
 
 class CustodianStep(BaseStep):
-    """Step for actual custodian run"""
+    """
+    Step for actual custodian run. If the ``skip_unchanged_lambdas`` option
+    is True, Lambda-mode policies that are unchanged since they were last
+    deployed (according to the :py:class:`~.DeployManifest`) are not run, so
+    they are not provisioned again.
+    """
 
     name = 'custodian'
+    region_independent = True
+    depends_on = [('mugc', SAME_REGION)]
+
+    def _log_describe_calls(self, pull_only):
+        """
+        Log the estimated number of resource describes that the order of
+        policies in the custodian config avoids, compared to ordering them by
+        name; see :py:func:`manheim_c7n_tools.policygen.describe_calls`.
+
+        :param pull_only: only count pull-mode policies (False for dry runs)
+        :type pull_only: bool
+        """
+        policies = PolicyArtifacts.load(
+            self.custodian_config, validate=False
+        ).policies
+        calls = describe_calls(policies, pull_only=pull_only)
+        by_name = describe_calls(
+            sorted(policies, key=lambda p: p['name']), pull_only=pull_only
+        )
+        logger.info(
+            'Policy ordering in %s avoids an estimated %d of %d resource '
+            'describe calls (compared to ordering by name)',
+            self.custodian_config, by_name - calls, by_name
+        )
+
+    def _unchanged_policies(self, manifest, fingerprints):
+        """
+        Return the names of the Lambda-mode policies whose fingerprints are
+        the same as when they were last deployed, or an empty set unless the
+        ``skip_unchanged_lambdas`` option is True.
+
+        :param manifest: manifest of deployed policies for this region
+        :type manifest: DeployManifest
+        :param fingerprints: dict of policy name to current deployment
+          fingerprint, from
+          :py:func:`~manheim_c7n_tools.deploy_manifest.deploy_fingerprints`
+        :type fingerprints: dict
+        :return: names of unchanged policies
+        :rtype: set
+        """
+        if not self.options.get('skip_unchanged_lambdas', False):
+            return set()
+        deployed = manifest.load()
+        return set(
+            name for name, fp in fingerprints.items()
+            if deployed.get(name) == fp
+        )
 
     def run(self):
         """
@@ -254,9 +451,47 @@ class CustodianStep(BaseStep):
           --log-group=/cloud-custodian/${account_id}/${region} \
           -c custodian_${region}.yml \
           --cache '/tmp/.cache/cloud-custodian.cache'
+
+        but only running the other policies (see :py:meth:`~._run_policies`)
+        if any Lambda-mode policies are skipped because they are unchanged
+        since they were last deployed (only with the ``skip_unchanged_lambdas``
+        option). The deployed policy manifest is updated after every
+        successful run, so that it is accurate whenever skipping is enabled.
         """
+        from c7n.commands import run
+        from c7n.config import Config
+        from manheim_c7n_tools.deploy_manifest import (
+            DeployManifest, deploy_fingerprints
+        )
+        output_dir = '%s/logs' % self.config.output_s3_bucket_name
+        policies = PolicyArtifacts.load(
+            self.custodian_config, validate=False
+        ).policies
+        fingerprints = deploy_fingerprints(policies, {
+            'region': self.region_name,
+            'log_group': self.config.custodian_log_group,
+            'metrics_enabled': True,
+            'output_dir': output_dir
+        })
+        manifest = DeployManifest(
+            self.config.output_s3_bucket_name, self.region_name,
+            session=self.session
+        )
+        unchanged = self._unchanged_policies(manifest, fingerprints)
+        if unchanged:
+            logger.info(
+                'Skipping %d of %d Lambda-mode policies that are unchanged '
+                'since they were last deployed', len(unchanged),
+                len(fingerprints)
+            )
+            names = set(
+                p['name'] for p in policies if p['name'] not in unchanged
+            )
+            if not names:
+                logger.info('No policies to run in %s', self.region_name)
+                return
         conf = Config.empty(
-            configs=['custodian_%s.yml' % self.region_name],
+            configs=[self.custodian_config],
             region=self.region_name,
             regions=[self.region_name],
             log_group=self.config.custodian_log_group,
@@ -265,11 +500,58 @@ class CustodianStep(BaseStep):
             subparser='run',
             cache='/tmp/.cache/cloud-custodian.cache',
             command='c7n.commands.run',
-            output_dir='%s/logs' % self.config.output_s3_bucket_name,
+            output_dir=output_dir,
             vars=None,
             dryrun=False
         )
-        run(conf)
+        self._log_describe_calls(True)
+        if unchanged:
+            self._run_policies(conf, names)
+        else:
+            run(conf)
+        manifest.save(fingerprints)
+
+    def _run_policies(self, conf, names):
+        """
+        Run only the policies in the custodian config with the given names.
+        c7n's own ``policy_filters`` option treats each name as a glob pattern
+        and matches every policy against each pattern in turn, so this builds
+        the collection of policies to run from the
+        :py:class:`~.PolicyArtifacts` instead, and passes it to the
+        undecorated ``c7n.commands.run()``.
+
+        That skips the ``policy_command`` decorator, so this repeats the parts
+        of it that loading the :py:class:`~.PolicyArtifacts` doesn't already
+        do (its schema validation rejects duplicate policy names): provider
+        initialization, then expanding variables (e.g. ``{account_id}`` and
+        ``{region}``) in and validating each policy, which also turns a role
+        name in the policy ``mode`` into a full ARN.
+
+        :param conf: c7n options to run the policies with
+        :type conf: c7n.config.Config
+        :param names: names of the policies to run
+        :type names: set
+        """
+        from c7n.commands import run
+        from c7n.policy import PolicyCollection
+        from c7n.provider import clouds
+        collection = PolicyArtifacts.load(self.custodian_config).collection(
+            conf, names=names
+        )
+        by_provider = {}
+        for p in collection:
+            by_provider.setdefault(p.provider_name, []).append(p)
+        policies = PolicyCollection.from_data({}, conf)
+        for provider_name, provider_policies in by_provider.items():
+            provider = clouds[provider_name]()
+            p_options = provider.initialize(conf)
+            policies += provider.initialize_policies(
+                PolicyCollection(provider_policies, p_options), p_options
+            )
+        for p in policies:
+            p.expand_variables(p.get_variables())
+            p.validate()
+        run.__wrapped__(conf, list(policies))
 
     def dryrun(self):
         """
@@ -281,8 +563,10 @@ class CustodianStep(BaseStep):
           -c custodian_${region}.yml \
           --cache '/tmp/.cache/cloud-custodian.cache'
         """
+        from c7n.commands import run
+        from c7n.config import Config
         conf = Config.empty(
-            configs=['custodian_%s.yml' % self.region_name],
+            configs=[self.custodian_config],
             region=self.region_name,
             regions=[self.region_name],
             verbose=1,
@@ -294,6 +578,7 @@ class CustodianStep(BaseStep):
             vars=None,
             dryrun=True
         )
+        self._log_describe_calls(False)
         run(conf)
 
 
@@ -305,6 +590,7 @@ class MailerStep(BaseStep):
     """
 
     name = 'mailer'
+    depends_on = [('policygen', ALL_REGIONS)]
 
     @property
     def mailer_config(self):
@@ -313,6 +599,9 @@ class MailerStep(BaseStep):
 
         :return: c7n-mailer config
         """
+        import jsonschema
+        from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
+        from c7n_mailer.utils import setup_defaults as mailer_setup_defaults
         conf = deepcopy(self.config.mailer_config)
         jsonschema.validate(conf, MAILER_SCHEMA)
         mailer_setup_defaults(conf)
@@ -333,6 +622,8 @@ class MailerStep(BaseStep):
         return conf
 
     def run(self):
+        from c7n_mailer.cli import session_factory
+        from c7n_mailer import deploy as mailer_deploy
         conf = self.mailer_config
         mailer_deploy.provision(
             conf,
@@ -352,36 +643,52 @@ class DryRunDiffStep(BaseStep):
     """Generates the dryrun diff during dry runs."""
 
     name = 'dryrun-diff'
+    is_global = True
+    depends_on = [('custodian', ALL_REGIONS)]
 
     def run(self):
         logger.info('Nothing to do during normal run.')
 
     def dryrun(self):
-        DryRunDiffer(self.config).run(diff_against='origin/master')
-
-    @staticmethod
-    def run_in_region(region_name, conf):
-        return region_name == conf.regions[-1]
+        from manheim_c7n_tools.dryrun_diff import DryRunDiffer
+        DryRunDiffer(self.config, session=self.session).run(
+            diff_against='origin/master'
+        )
 
 
 class S3ArchiverStep(BaseStep):
     """Runs s3archiver to archive logs of deleted policies."""
 
     name = 's3archiver'
+    region_independent = True
+    depends_on = [('custodian', SAME_REGION)]
+
+    @property
+    def _policy_names(self):
+        """Return the set of policy names in this region's custodian config."""
+        return PolicyArtifacts.load(
+            self.custodian_config, validate=False
+        ).names
 
     def run(self):
+        from manheim_c7n_tools.s3_archiver import S3Archiver
         S3Archiver(
             self.region_name,
             self.config.output_s3_bucket_name,
-            'custodian_%s.yml' % self.region_name
+            self.custodian_config,
+            session=self.session,
+            policy_names=self._policy_names
         ).run()
 
     def dryrun(self):
+        from manheim_c7n_tools.s3_archiver import S3Archiver
         S3Archiver(
             self.region_name,
             self.config.output_s3_bucket_name,
-            'custodian_%s.yml' % self.region_name,
-            dryrun=True
+            self.custodian_config,
+            dryrun=True,
+            session=self.session,
+            policy_names=self._policy_names
         ).run()
 
 
@@ -389,6 +696,8 @@ class DocsBuildStep(BaseStep):
     """Builds generated documentation."""
 
     name = 'docs'
+    is_global = True
+    depends_on = [('policygen', ALL_REGIONS)]
 
     def _run_sphinx_build(self):
         if os.path.exists('docs/_build'):
@@ -397,6 +706,7 @@ class DocsBuildStep(BaseStep):
         # "sphinx-build -W docs/source docs/_build -b dirhtml"
         argv = ['-W', 'docs/source', 'docs/_build', '-b', 'dirhtml']
         logger.info('Running: sphinx-build %s' % ' '.join(argv))
+        from sphinx.cmd.build import main as sphinx_main
         rcode = sphinx_main(argv)
         if rcode != 0:
             raise RuntimeError('Sphinx exited %d' % rcode)
@@ -407,19 +717,16 @@ class DocsBuildStep(BaseStep):
     def dryrun(self):
         self._run_sphinx_build()
 
-    @staticmethod
-    def run_in_region(region_name, conf):
-        # only run in the first-configured region
-        return region_name == conf.regions[0]
-
 
 class CustodianRunner(object):
     """
     Main class to run all steps required for manheim c7n deployment.
     """
 
-    #: List of the :py:class:`~.BaseStep` subclasses to run for deployment,
-    #: in the order they should be run.
+    #: List of the :py:class:`~.BaseStep` subclasses to run for deployment.
+    #: Steps are run as soon as their :py:attr:`~.BaseStep.depends_on` are
+    #: complete; when more than one is ready to run, the one listed first
+    #: here runs first.
     ordered_step_classes = [
         PolicygenStep,
         ValidateStep,
@@ -431,7 +738,9 @@ class CustodianRunner(object):
         DocsBuildStep
     ]
 
-    def __init__(self, account_name, config_path='manheim-c7n-tools.yml'):
+    def __init__(self, account_name, config_path='manheim-c7n-tools.yml',
+                 parallel_regions=1, session=None, resume=False,
+                 checkpoint_path=DEFAULT_CHECKPOINT_PATH, options=None):
         """
         Initialize the Runner.
 
@@ -439,9 +748,47 @@ class CustodianRunner(object):
         :type account_name: str
         :param config_path: path to ``manheim-c7n-tools.yml`` config file
         :type config_path: str
+        :param parallel_regions: maximum number of
+          :py:attr:`~.BaseStep.region_independent` tasks to run concurrently,
+          in worker processes. The default of 1 runs one task at a time,
+          in-process.
+        :type parallel_regions: int
+        :param session: boto3 Session for the account, passed to every step
+          run in this process; if None, use the default session
+        :type session: boto3.session.Session
+        :param resume: whether to skip tasks that the
+          :py:class:`~.CheckpointJournal` from a previous failed run records as
+          complete with unchanged inputs
+        :type resume: bool
+        :param checkpoint_path: path to the checkpoint journal file
+        :type checkpoint_path: str
+        :param options: step-specific options, passed to every step. Currently
+          ``incremental_policygen`` and ``policygen_cache`` (bool),
+          ``policygen_workers`` (int), ``policygen_output_format`` and
+          ``policygen_cache_path`` (str) are used by
+          :py:class:`~.PolicygenStep`; ``policygen_output_format`` is
+          also used by every step that reads the generated configs (see
+          :py:attr:`~.BaseStep.custodian_config`). ``validation_cache``
+          (bool) and ``validation_cache_path`` (str) are used by
+          :py:class:`~.ValidateStep`, ``mugc_workers`` (int) by
+          :py:class:`~.MugcStep`, and ``skip_unchanged_lambdas`` (bool) by
+          :py:class:`~.CustodianStep`.
+        :type options: dict
         """
         self._config_path = config_path
+        self.options = options or {}
+        self.session = session
+        self.resume = resume
+        self._checkpoint_path = checkpoint_path
+        self._journal = None
+        self._fingerprints = {}
         self.config = ManheimConfig.from_file(config_path, account_name)
+        if parallel_regions < 1:
+            raise RuntimeError(
+                'ERROR: parallel_regions must be at least 1, not %d' %
+                parallel_regions
+            )
+        self.parallel_regions = parallel_regions
 
     def _steps_to_run(self, step_names, skip_steps):
         """
@@ -469,10 +816,11 @@ class CustodianRunner(object):
     def run(self, action, regions=[], step_names=[], skip_steps=[]):
         """
         Main method to run all steps. This calls :py:meth:`~._steps_to_run`
-        to determine which step classes to run and the order to run them in,
-        and then loops through that list calling the :py:meth:`~.BaseStep.run`
-        or :py:meth:`~.BaseStep.dryrun` method on each of them, according to the
-        ``action`` specified.
+        to determine which step classes to run, :py:meth:`~._build_graph` to
+        build the graph of (step, region) tasks and their dependencies, and
+        then :py:meth:`~._run_graph` to call the :py:meth:`~.BaseStep.run` or
+        :py:meth:`~.BaseStep.dryrun` method of each task, according to the
+        ``action`` specified, once its dependencies are complete.
 
         :param action: Name of the action to do, "run" or "dryrun"
         :type action: str
@@ -480,8 +828,9 @@ class CustodianRunner(object):
           run in all regions listed in config file
         :type regions: list
         :param step_names: list of string step names to run; if not specified,
-          will run all defined steps. Steps are always run in the order defined
-          in :py:attr:`~.ordered_step_classes`.
+          will run all defined steps. When more than one task is ready to run,
+          steps are run in the order defined in
+          :py:attr:`~.ordered_step_classes`.
         :type step_names: list
         :param skip_steps: list of string step names to skip running
         :type skip_steps: list
@@ -508,11 +857,17 @@ class CustodianRunner(object):
         else:
             # use all regions from config file
             regions = self.config.regions
-        for idx, step in enumerate(to_run):
-            logger.info(bold(
-                'Step %d of %d - %s' % (idx + 1, len(to_run), step.name)
-            ))
-            self._run_step_in_regions(action, step, regions)
+        self._journal = CheckpointJournal(
+            self._checkpoint_path, self.config.account_name, action,
+            resume=self.resume
+        )
+        self._fingerprints = {}
+        # policygen may regenerate the configs; don't use any from a prior run
+        PolicyArtifacts.clear()
+        graph, configs = self._build_graph(to_run, regions)
+        self._run_graph(action, to_run, regions, graph, configs)
+        # everything is done; there's nothing left to resume
+        self._journal.remove()
         logger.info(bold('SUCCESS: All %d steps complete!' % len(to_run)))
 
     def _validate_account(self):
@@ -522,7 +877,11 @@ class CustodianRunner(object):
         :raises: RuntimeError
         """
         logger.debug('Connecting to STS in us-east-1 to verify account')
-        sts = boto3.client('sts', region_name='us-east-1')
+        if self.session is None:
+            import boto3
+            sts = boto3.client('sts', region_name='us-east-1')
+        else:
+            sts = self.session.client('sts', region_name='us-east-1')
         cid = sts.get_caller_identity()
         logger.debug('Caller Identity: %s', cid)
         if cid['Account'] != self.config.account_id:
@@ -534,42 +893,699 @@ class CustodianRunner(object):
                 )
             )
 
-    def _run_step_in_regions(self, action, step, regions):
+    def _build_graph(self, steps, regions):
         """
-        Called from :py:meth:`~.run`; run a given step in all applicable /
-        specified regions.
+        Called from :py:meth:`~.run`; build the graph of tasks to run. Each
+        task (node in the graph) is a 2-tuple of a :py:class:`~.BaseStep`
+        subclass and a region name, or None for
+        :py:attr:`~.BaseStep.is_global` steps. Tasks are only created for
+        regions where the step's :py:meth:`~.BaseStep.run_in_region` returns
+        True.
+
+        :param steps: list of the :py:class:`~.BaseStep` subclasses to run, as
+          returned by :py:meth:`~._steps_to_run`
+        :type steps: list
+        :param regions: list of string region names to run in
+        :type regions: list
+        :return: 2-tuple of (dict of each task to the set of tasks that must be
+          complete before it can run, dict of each task to the config to run
+          it with)
+        :rtype: tuple
+        """
+        configs = {}
+        region_confs = {}
+        for step in steps:
+            if step.is_global:
+                # global steps need a config with %%AWS_REGION%%
+                # un-interpolated
+                configs[(step, None)] = self.config
+                continue
+            for r_idx, region_name in enumerate(regions):
+                if region_name not in region_confs:
+                    region_confs[region_name] = self.config.config_for_region(
+                        region_name
+                    )
+                region_conf = region_confs[region_name]
+                if not step.run_in_region(region_name, region_conf):
+                    logger.info(bold(
+                        'SKIPPING Step %s in REGION %d of %d (%s)' % (
+                            step.name, r_idx + 1, len(regions), region_name
+                        )
+                    ))
+                    continue
+                configs[(step, region_name)] = region_conf
+        graph = {
+            task: self._task_dependencies(task[0], task[1], regions, configs)
+            for task in configs
+        }
+        return graph, configs
+
+    def _task_dependencies(self, step, region_name, regions, tasks):
+        """
+        Return the set of tasks that must be complete before ``step`` can run
+        in ``region_name``, according to its :py:attr:`~.BaseStep.depends_on`.
+        Dependencies on tasks that will not be run (i.e. are not in ``tasks``)
+        are replaced with that task's own dependencies.
+
+        :param step: the step to find dependencies for
+        :type step: object
+        :param region_name: the region name the step runs in, or None if the
+          step is :py:attr:`~.BaseStep.is_global`
+        :type region_name: str
+        :param regions: list of string region names being run in
+        :type regions: list
+        :param tasks: all tasks that will be run
+        :type tasks: dict
+        :return: set of tasks, as (step class, region name) tuples
+        :rtype: set
+        """
+        steps_by_name = {x.name: x for x in self.ordered_step_classes}
+        steps_by_name.update({x[0].name: x[0] for x in tasks})
+        result = set()
+        for dep_name, scope in step.depends_on:
+            dep = steps_by_name[dep_name]
+            if dep.is_global:
+                dep_regions = [None]
+            elif scope == SAME_REGION and region_name is not None:
+                dep_regions = [region_name]
+            else:
+                dep_regions = regions
+            for dep_region in dep_regions:
+                if (dep, dep_region) in tasks:
+                    result.add((dep, dep_region))
+                else:
+                    result.update(self._task_dependencies(
+                        dep, dep_region, regions, tasks
+                    ))
+        return result
+
+    def _run_graph(self, action, steps, regions, graph, configs):
+        """
+        Called from :py:meth:`~.run`; run every task in the graph built by
+        :py:meth:`~._build_graph`, each one as soon as all of its dependencies
+        are complete.
+
+        When more than one task is ready to run, the one whose step comes first
+        in ``steps`` (and then whose region comes first in ``regions``) is run
+        first. When :py:attr:`~.parallel_regions` is 1, tasks are run one at a
+        time in that order (which runs each step in all regions before the next
+        step begins) and any failure is raised immediately.
+
+        When :py:attr:`~.parallel_regions` is greater than one, tasks for
+        :py:attr:`~.BaseStep.region_independent` steps are run concurrently in
+        a pool of that many worker processes via :py:func:`~.run_task`, and all
+        other tasks are run in this process. Log output from each worker task
+        is buffered and written out, tagged with the region name, when that
+        task finishes. A failed task does not stop other tasks; only the tasks
+        that depend on it are not run. Once nothing more can be run, all
+        failures are reported.
 
         :param action: Name of the action to do, "run" or "dryrun"
         :type action: str
-        :param step: A reference to the :py:class:`~.BaseStep` subclass to run
-        :type step: object
+        :param steps: list of the :py:class:`~.BaseStep` subclasses to run, in
+          order
+        :type steps: list
         :param regions: list of string region names to run in
         :type regions: list
+        :param graph: dict of each task to the set of tasks it depends on
+        :type graph: dict
+        :param configs: dict of each task to the config to run it with
+        :type configs: dict
+        :raises: RuntimeError if any tasks failed
         """
-        for r_idx, region_name in enumerate(regions):
-            if step.name in ['policygen', 'dryrun-diff']:
-                # Some steps need a config with %%AWS_REGION%% un-interpolated
-                region_conf = self.config
-            else:
-                region_conf = self.config.config_for_region(region_name)
-            if not step.run_in_region(region_name, region_conf):
-                logger.info(bold(
-                    'SKIPPING Step %s in REGION %d of %d (%s)' % (
-                        step.name, r_idx + 1, len(regions), region_name
+
+        def _order(task):
+            if task[1] is None:
+                return steps.index(task[0]), -1
+            return steps.index(task[0]), regions.index(task[1])
+
+        pending = sorted(graph.keys(), key=_order)
+        done = set()
+        failures = {}
+        if self.parallel_regions == 1:
+            while pending:
+                ready = [t for t in pending if graph[t].issubset(done)]
+                if not ready:
+                    raise RuntimeError(
+                        'ERROR: Circular step dependencies between: %s' %
+                        ', '.join(self._task_name(t) for t in pending)
                     )
-                ))
-                continue
+                task = ready[0]
+                pending.remove(task)
+                if not self._task_checkpointed(task, configs[task], regions):
+                    self._run_task(action, task, configs[task], regions)
+                    self._task_complete(task)
+                done.add(task)
+            return
+        with ProcessPoolExecutor(max_workers=self.parallel_regions) as ex:
+            running = {}
+            while pending or running:
+                ready = [t for t in pending if graph[t].issubset(done)]
+                skipped = [
+                    t for t in ready
+                    if self._task_checkpointed(t, configs[t], regions)
+                ]
+                if skipped:
+                    for task in skipped:
+                        pending.remove(task)
+                        done.add(task)
+                    # their dependents may now be ready
+                    continue
+                for task in ready:
+                    if not task[0].region_independent:
+                        continue
+                    pending.remove(task)
+                    logger.info(bold(
+                        'Starting Step %s in REGION %d of %d (%s)' % (
+                            task[0].name, regions.index(task[1]) + 1,
+                            len(regions), task[1]
+                        )
+                    ))
+                    running[ex.submit(
+                        run_task, action, task[0], task[1], configs[task],
+                        self.options
+                    )] = task
+                inline = [t for t in ready if not t[0].region_independent]
+                if inline:
+                    task = inline[0]
+                    pending.remove(task)
+                    try:
+                        self._run_task(action, task, configs[task], regions)
+                        self._task_complete(task)
+                        done.add(task)
+                    except (Exception, SystemExit):
+                        logger.error(bold(
+                            'FAILED: %s' % self._task_name(task)
+                        ))
+                        failures[task] = traceback.format_exc()
+                elif running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        task = running.pop(future)
+                        self._finish_worker_task(future, task, done, failures)
+                else:
+                    # nothing running and nothing ready; we're stuck
+                    break
+        if pending and not failures:
+            raise RuntimeError(
+                'ERROR: Circular step dependencies between: %s' %
+                ', '.join(self._task_name(t) for t in pending)
+            )
+        if not failures:
+            return
+        for task in sorted(failures.keys(), key=_order):
+            logger.error(
+                'Failure in %s:\n%s', self._task_name(task), failures[task]
+            )
+        for task in pending:
+            logger.error(
+                'Not run because of failed dependencies: %s',
+                self._task_name(task)
+            )
+        raise RuntimeError(
+            'ERROR: %d tasks failed (%s); %d tasks not run' % (
+                len(failures), ', '.join(
+                    self._task_name(t) for t in sorted(
+                        failures.keys(), key=_order
+                    )
+                ), len(pending)
+            )
+        )
+
+    def _finish_worker_task(self, future, task, done, failures):
+        """
+        Handle a finished :py:func:`~.run_task` future from
+        :py:meth:`~._run_graph`; write its buffered output, and add the task
+        to either ``done`` or ``failures``.
+
+        :param future: the finished future
+        :type future: concurrent.futures.Future
+        :param task: the task that the future ran
+        :type task: tuple
+        :param done: set of successfully completed tasks
+        :type done: set
+        :param failures: dict of failed tasks to their formatted tracebacks
+        :type failures: dict
+        """
+        try:
+            output, error = future.result()
+        except Exception:
+            output = ''
+            error = traceback.format_exc()
+        sys.stderr.write(output)
+        sys.stderr.flush()
+        if error is None:
+            logger.info(bold('Finished: %s' % self._task_name(task)))
+            self._task_complete(task)
+            done.add(task)
+            return
+        logger.error(bold('FAILED: %s' % self._task_name(task)))
+        failures[task] = error
+
+    def _task_checkpointed(self, task, config, regions):
+        """
+        Return whether a task can be skipped because the checkpoint journal
+        records it as complete, with the same config and generated
+        ``custodian_REGION.yml`` file(s) as it would run with now. This must
+        only be called once the task's dependencies are complete, as
+        ``policygen`` generates those files.
+
+        :param task: (step class, region name) task tuple
+        :type task: tuple
+        :param config: the config to run the task with
+        :type config: ManheimConfig
+        :param regions: list of string region names being run in
+        :type regions: list
+        :return: whether the task is already complete
+        :rtype: bool
+        """
+        step, region_name = task
+        if self._journal is None or not step.checkpoint:
+            return False
+        if not self._journal.is_complete(
+            self._task_name(task),
+            self._task_fingerprint(task, config, regions)
+        ):
+            return False
+        logger.info(bold(
+            'SKIPPING %s - already complete (checkpoint)' %
+            self._task_name(task)
+        ))
+        return True
+
+    def _task_fingerprint(self, task, config, regions):
+        """
+        Return the :py:meth:`~.CheckpointJournal.fingerprint` of a task's
+        config and generated ``custodian_REGION.yml`` file(s). As tasks are
+        only checked once all of their dependencies are complete, their inputs
+        cannot change after that; the fingerprint is computed the first time a
+        task is checked and reused for every later scheduler pass, instead of
+        re-reading and re-hashing the files each time.
+
+        :param task: (step class, region name) task tuple
+        :type task: tuple
+        :param config: the config to run the task with
+        :type config: ManheimConfig
+        :param regions: list of string region names being run in
+        :type regions: list
+        :return: fingerprint of the task's inputs
+        :rtype: str
+        """
+        if task in self._fingerprints:
+            return self._fingerprints[task]
+        fmt = self.options.get('policygen_output_format', 'yaml')
+        if task[1] is None:
+            paths = [custodian_config_name(r, fmt) for r in regions]
+        else:
+            paths = [custodian_config_name(task[1], fmt)]
+        self._fingerprints[task] = CheckpointJournal.fingerprint(config, paths)
+        return self._fingerprints[task]
+
+    def _task_complete(self, task):
+        """
+        Record a successfully completed task in the checkpoint journal.
+
+        :param task: (step class, region name) task tuple
+        :type task: tuple
+        """
+        if self._journal is None or not task[0].checkpoint:
+            return
+        self._journal.complete(self._task_name(task))
+
+    @staticmethod
+    def _task_name(task):
+        """
+        Return a human-readable name for a task.
+
+        :param task: (step class, region name) task tuple
+        :type task: tuple
+        :return: task name
+        :rtype: str
+        """
+        if task[1] is None:
+            return 'Step %s (global)' % task[0].name
+        return 'Step %s in REGION %s' % (task[0].name, task[1])
+
+    def _run_task(self, action, task, config, regions):
+        """
+        Run one task in this process.
+
+        :param action: Name of the action to do, "run" or "dryrun"
+        :type action: str
+        :param task: (step class, region name) task tuple
+        :type task: tuple
+        :param config: the config to run the task with
+        :type config: ManheimConfig
+        :param regions: list of string region names being run in
+        :type regions: list
+        """
+        step, region_name = task
+        if region_name is None:
+            logger.info(bold('Step %s (global)' % step.name))
+        else:
             logger.info(bold(
                 'Step %s in REGION %d of %d (%s)' % (
-                    step.name, r_idx + 1, len(regions), region_name
+                    step.name, regions.index(region_name) + 1, len(regions),
+                    region_name
                 )
             ))
-            if action == 'run':
-                step(region_name, region_conf).run()
-            else:
-                step(region_name, region_conf).dryrun()
-            sys.stdout.flush()
-            sys.stderr.flush()
+        if action == 'run':
+            step(
+                region_name, config, session=self.session, options=self.options
+            ).run()
+        else:
+            step(
+                region_name, config, session=self.session, options=self.options
+            ).dryrun()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+def run_task(action, step, region_name, region_conf, options):
+    """
+    Run one step in one region, capturing its log output. This is the function
+    executed in worker processes by :py:meth:`~.CustodianRunner._run_graph`,
+    and must remain a module-level function so that it can be pickled.
+
+    While the step runs, all handlers on the root logger are replaced with one
+    that writes to an in-memory buffer, prefixing every message with the region
+    name. The original handlers are restored afterwards, as worker processes
+    are reused for multiple tasks.
+
+    boto3 Sessions cannot be pickled, so the step is not passed the runner's
+    session; it uses a new default session, which picks up the account's
+    credentials from the environment inherited from the parent process.
+
+    :param action: Name of the action to do, "run" or "dryrun"
+    :type action: str
+    :param step: A reference to the :py:class:`~.BaseStep` subclass to run
+    :type step: object
+    :param region_name: region name to run the step in
+    :type region_name: str
+    :param region_conf: the region-specific config to run the step with
+    :type region_conf: ManheimConfig
+    :param options: the runner's :py:attr:`~.CustodianRunner.options`
+    :type options: dict
+    :return: 2-tuple of the buffered log output (str) and either None if the
+      step succeeded or the formatted traceback (str) if it failed
+    :rtype: tuple
+    """
+    buf = StringIO()
+    handler = logging.StreamHandler(buf)
+    handler.setFormatter(logging.Formatter(
+        '[%(asctime)s %(levelname)s] [' + region_name + '] %(message)s'
+    ))
+    root = logging.getLogger()
+    orig_handlers = root.handlers[:]
+    root.handlers = [handler]
+    error = None
+    try:
+        if action == 'run':
+            step(region_name, region_conf, options=options).run()
+        else:
+            step(region_name, region_conf, options=options).dryrun()
+    except (Exception, SystemExit):
+        # c7n commands call sys.exit() on failure; that must not kill the
+        # worker process without reporting back to the parent
+        error = traceback.format_exc()
+    finally:
+        sys.stdout.flush()
+        root.handlers = orig_handlers
+    return buf.getvalue(), error
+
+
+class MultiAccountRunner(object):
+    """
+    Run the same action against multiple accounts concurrently. Each account
+    is run by a :py:class:`~.CustodianRunner` in its own process (see
+    :py:func:`~.run_account`), with its own boto3 Session and environment
+    credentials, in its own working copy of the current directory (see
+    :py:func:`~.setup_account_workdir`) so that generated files from
+    different accounts do not collide.
+    """
+
+    def __init__(self, account_names, config_path='manheim-c7n-tools.yml',
+                 parallel_regions=1, parallel_accounts=1, assume_role=True,
+                 resume=False, options=None):
+        """
+        Initialize the MultiAccountRunner.
+
+        :param account_names: names of the accounts to run against
+        :type account_names: list
+        :param config_path: path to ``manheim-c7n-tools.yml`` config file
+        :type config_path: str
+        :param parallel_regions: ``parallel_regions`` value to pass to each
+          account's :py:class:`~.CustodianRunner`
+        :type parallel_regions: int
+        :param parallel_accounts: maximum number of accounts to run
+          concurrently
+        :type parallel_accounts: int
+        :param assume_role: whether to assume the role specified in each
+          account's ``assume_role`` configuration, if present
+        :type assume_role: bool
+        :param resume: ``resume`` value to pass to each account's
+          :py:class:`~.CustodianRunner`. Each account's checkpoint journal is
+          kept at ``.c7n-accounts/ACCOUNT_NAME.checkpoint.json``, outside of
+          its (re-created) working copy.
+        :type resume: bool
+        :param options: ``options`` value to pass to each account's
+          :py:class:`~.CustodianRunner`, with ``policygen_cache_path`` and
+          ``validation_cache_path`` set to
+          ``.c7n-accounts/ACCOUNT_NAME.policygen-cache`` and
+          ``.c7n-accounts/ACCOUNT_NAME.validation-cache``, so that the caches
+          are kept between runs.
+        :type options: dict
+        """
+        accts = ManheimConfig.list_accounts(config_path)
+        unknown = [x for x in account_names if x not in accts]
+        if unknown:
+            raise RuntimeError(
+                'ERROR: No account with name(s) %s in %s' % (
+                    ', '.join('"%s"' % x for x in unknown), config_path
+                )
+            )
+        if parallel_accounts < 1:
+            raise RuntimeError(
+                'ERROR: parallel_accounts must be at least 1, not %d' %
+                parallel_accounts
+            )
+        if parallel_regions < 1:
+            raise RuntimeError(
+                'ERROR: parallel_regions must be at least 1, not %d' %
+                parallel_regions
+            )
+        self.account_names = account_names
+        self._config_path = os.path.abspath(config_path)
+        self.parallel_regions = parallel_regions
+        self.parallel_accounts = parallel_accounts
+        self.assume_role = assume_role
+        self.resume = resume
+        self.options = options or {}
+
+    def run(self, action, regions=[], step_names=[], skip_steps=[]):
+        """
+        Run the specified action against all accounts, up to
+        ``parallel_accounts`` at a time. Arguments are passed through to each
+        account's :py:meth:`~.CustodianRunner.run`. Accounts are independent;
+        a failure in one account does not stop the others.
+
+        :param action: Name of the action to do, "run" or "dryrun"
+        :type action: str
+        :param regions: list of string region names to run in; if left empty,
+          run in all regions listed in config file for each account
+        :type regions: list
+        :param step_names: list of string step names to run; if not specified,
+          will run all defined steps
+        :type step_names: list
+        :param skip_steps: list of string step names to skip running
+        :type skip_steps: list
+        :raises: RuntimeError if any accounts failed
+        """
+        logger.info(bold('Beginning %s - %d accounts' % (
+            action, len(self.account_names)
+        )))
+        pending = list(self.account_names)
+        running = {}
+        failed = []
+        while pending or running:
+            while pending and len(running) < self.parallel_accounts:
+                acct = pending.pop(0)
+                workdir = setup_account_workdir(acct)
+                logger.info(bold('Starting ACCOUNT %s (%d of %d) in %s' % (
+                    acct, self.account_names.index(acct) + 1,
+                    len(self.account_names), workdir
+                )))
+                proc = multiprocessing.Process(
+                    target=run_account, name='account-%s' % acct,
+                    args=(
+                        action, acct, self._config_path, workdir, regions,
+                        step_names, skip_steps, self.parallel_regions,
+                        self.assume_role, self.resume, os.path.abspath(
+                            os.path.join(
+                                ACCOUNTS_WORKDIR, '%s.checkpoint.json' % acct
+                            )
+                        ), self._account_options(acct)
+                    )
+                )
+                proc.start()
+                running[proc.sentinel] = (acct, proc)
+            for sentinel in multiprocessing.connection.wait(list(running)):
+                acct, proc = running.pop(sentinel)
+                proc.join()
+                if proc.exitcode == 0:
+                    logger.info(bold('Finished: ACCOUNT %s' % acct))
+                else:
+                    logger.error(bold('FAILED: ACCOUNT %s (exit code %s)' % (
+                        acct, proc.exitcode
+                    )))
+                    failed.append(acct)
+        if failed:
+            raise RuntimeError('ERROR: %d of %d accounts failed (%s)' % (
+                len(failed), len(self.account_names), ', '.join(
+                    x for x in self.account_names if x in failed
+                )
+            ))
+        logger.info(bold(
+            'SUCCESS: All %d accounts complete!' % len(self.account_names)
+        ))
+
+    def _account_options(self, account_name):
+        """
+        Return the ``options`` to pass to one account's
+        :py:class:`~.CustodianRunner`; :py:attr:`~.options` with the paths of
+        that account's caches, which are kept outside of its (re-created)
+        working copy.
+
+        :param account_name: name of the account
+        :type account_name: str
+        :return: options for the account
+        :rtype: dict
+        """
+        options = dict(self.options)
+        options['policygen_cache_path'] = os.path.abspath(os.path.join(
+            ACCOUNTS_WORKDIR, '%s.policygen-cache' % account_name
+        ))
+        options['validation_cache_path'] = os.path.abspath(os.path.join(
+            ACCOUNTS_WORKDIR, '%s.validation-cache' % account_name
+        ))
+        return options
+
+
+def _workdir_ignore(directory, names):
+    """
+    ``ignore`` callable for the ``copytree`` in
+    :py:func:`~.setup_account_workdir`; return the names in ``directory`` that
+    match :py:const:`~.WORKDIR_EXCLUDE`, or are virtualenvs (directories
+    containing a ``pyvenv.cfg``).
+
+    :param directory: directory being copied
+    :type directory: str
+    :param names: names of the files and directories in ``directory``
+    :type names: list
+    :return: names not to copy
+    :rtype: set
+    """
+    ignored = set()
+    for name in names:
+        path = os.path.normpath(os.path.join(directory, name))
+        if any(fnmatch(path, pattern) for pattern in WORKDIR_EXCLUDE):
+            ignored.add(name)
+        elif os.path.isfile(os.path.join(path, 'pyvenv.cfg')):
+            ignored.add(name)
+    return ignored
+
+
+def setup_account_workdir(account_name):
+    """
+    Create (or re-create) a working copy of the current directory for one
+    account, at ``.c7n-accounts/<account_name>``. Everything except the paths
+    in :py:const:`~.WORKDIR_EXCLUDE` and any virtualenvs is copied; ``.git`` is
+    symlinked so that git commands still work in the copy.
+
+    :param account_name: name of the account
+    :type account_name: str
+    :return: path to the working copy
+    :rtype: str
+    """
+    path = os.path.join(ACCOUNTS_WORKDIR, account_name)
+    if os.path.exists(path):
+        rmtree(path)
+    copytree('.', path, symlinks=True, ignore=_workdir_ignore)
+    if os.path.exists('.git'):
+        os.symlink(os.path.abspath('.git'), os.path.join(path, '.git'))
+    return path
+
+
+def run_account(action, account_name, config_path, workdir, regions,
+                step_names, skip_steps, parallel_regions, do_assume_role,
+                resume, checkpoint_path, options):
+    """
+    Run a :py:class:`~.CustodianRunner` for one account. This is the target of
+    the per-account processes started by :py:meth:`~.MultiAccountRunner.run`,
+    and exits non-zero on failure.
+
+    The process changes into the account's working copy, tags all log output
+    with the account name, and (if ``do_assume_role`` is True) builds the
+    account's boto3 Session with :py:func:`~.assume_role_session`. That
+    session is passed to the runner, and its credentials are also exported to
+    this process' environment for c7n and c7n-mailer, which build their own
+    sessions.
+
+    :param action: Name of the action to do, "run" or "dryrun"
+    :type action: str
+    :param account_name: name of the account to run against
+    :type account_name: str
+    :param config_path: absolute path to ``manheim-c7n-tools.yml`` config file
+    :type config_path: str
+    :param workdir: path to the account's working copy
+    :type workdir: str
+    :param regions: passed through to :py:meth:`~.CustodianRunner.run`
+    :type regions: list
+    :param step_names: passed through to :py:meth:`~.CustodianRunner.run`
+    :type step_names: list
+    :param skip_steps: passed through to :py:meth:`~.CustodianRunner.run`
+    :type skip_steps: list
+    :param parallel_regions: passed through to :py:class:`~.CustodianRunner`
+    :type parallel_regions: int
+    :param do_assume_role: whether to assume the configured role
+    :type do_assume_role: bool
+    :param resume: passed through to :py:class:`~.CustodianRunner`
+    :type resume: bool
+    :param checkpoint_path: absolute path to the account's checkpoint journal
+    :type checkpoint_path: str
+    :param options: passed through to :py:class:`~.CustodianRunner`
+    :type options: dict
+    """
+    os.chdir(workdir)
+    for handler in logger.handlers:
+        handler.setFormatter(logging.Formatter(
+            '[%(asctime)s %(levelname)s] [' + account_name + '] %(message)s'
+        ))
+    try:
+        cr = CustodianRunner(
+            account_name, config_path, parallel_regions=parallel_regions,
+            resume=resume, checkpoint_path=checkpoint_path, options=options
+        )
+        if do_assume_role:
+            cr.session = assume_role_session(cr.config)
+            creds = cr.session.get_credentials()
+            if creds is not None:
+                creds = creds.get_frozen_credentials()
+                os.environ['AWS_ACCESS_KEY_ID'] = creds.access_key
+                os.environ['AWS_SECRET_ACCESS_KEY'] = creds.secret_key
+                if creds.token:
+                    os.environ['AWS_SESSION_TOKEN'] = creds.token
+                else:
+                    os.environ.pop('AWS_SESSION_TOKEN', None)
+        cr.run(
+            action, regions, step_names=step_names, skip_steps=skip_steps
+        )
+    except (Exception, SystemExit):
+        logger.error(
+            'Run failed for ACCOUNT %s:\n%s', account_name,
+            traceback.format_exc()
+        )
+        raise SystemExit(1)
 
 
 def parse_args(argv):
@@ -596,6 +1612,57 @@ def parse_args(argv):
                         'run all steps.')
     p.add_argument('-S', '--skip-step', dest='skip', action='append',
                    default=[], help='Specify one or more step names to skip.')
+    p.add_argument('-p', '--parallel-regions', dest='parallel_regions',
+                   action='store', type=int, default=1,
+                   help='Run up to this many region-independent tasks '
+                        '(validate, mugc, custodian, s3archiver in one '
+                        'region) concurrently, in worker processes; regions '
+                        'move through these steps independently of each '
+                        'other. (default: 1)')
+    p.add_argument('-P', '--parallel-accounts', dest='parallel_accounts',
+                   action='store', type=int, default=1,
+                   help='When running against more than one account, run up '
+                        'to this many accounts concurrently, each in its own '
+                        'process and working copy. (default: 1)')
+    p.add_argument('--resume', dest='resume', action='store_true',
+                   default=False,
+                   help='Resume a failed run; skip tasks that the checkpoint '
+                        'journal records as complete, if the config and '
+                        'generated policies they used are unchanged.')
+    p.add_argument('--incremental-policygen', dest='incremental_policygen',
+                   action='store_true', default=False,
+                   help='Only regenerate policygen output files whose inputs '
+                        'have changed since the last incremental run.')
+    p.add_argument('--no-policygen-cache', dest='policygen_cache',
+                   action='store_false', default=True,
+                   help='Do not use or update the policygen cache of parsed '
+                        'policy files.')
+    p.add_argument('--policygen-jobs', dest='policygen_workers',
+                   action='store', type=int, default=1,
+                   help='Number of worker processes for policygen to parse '
+                        'policy files and generate region configs with. '
+                        '(default: 1)')
+    p.add_argument('--no-validation-cache', dest='validation_cache',
+                   action='store_false', default=True,
+                   help='Validate every policy, instead of only those that '
+                        'are not in the cache of validated policies.')
+    p.add_argument('--skip-unchanged-lambdas', dest='skip_unchanged_lambdas',
+                   action='store_true', default=False,
+                   help='Do not run (and so re-provision) Lambda-mode '
+                        'policies that are unchanged since they were last '
+                        'deployed by manheim-c7n-runner. Functions that were '
+                        'changed or deleted outside of manheim-c7n-runner '
+                        'are not re-provisioned.')
+    p.add_argument('--mugc-jobs', dest='mugc_workers', action='store',
+                   type=int, default=8,
+                   help='Maximum number of threads per region for mugc to '
+                        'look up and remove orphaned Lambda functions with. '
+                        '(default: 8)')
+    p.add_argument('--output-format', dest='output_format', action='store',
+                   choices=sorted(OUTPUT_FORMATS.keys()), default='yaml',
+                   help='Format for policygen to generate custodian_REGION '
+                        'configs in, and for other steps to read them from. '
+                        '(default: yaml)')
     p.add_argument('-A', '--no-assume-role', dest='assume_role',
                    action='store_false', default=True,
                    help='Do not assume a role, even if  specified in the '
@@ -603,11 +1670,13 @@ def parse_args(argv):
     subp = p.add_subparsers(help='command', title='subcommands')
 
     run_parser = subp.add_parser(
-        'run', help='Perform a full run (must specify ACCT_NAME)'
+        'run', help='Perform a full run (must specify ACCT_NAME or '
+                    '--all-accounts)'
     )
     run_parser.set_defaults(ACTION='run')
     dryrun_parser = subp.add_parser(
-        'dryrun', help='Perform a dry run (must specify ACCT_NAME)'
+        'dryrun', help='Perform a dry run (must specify ACCT_NAME or '
+                       '--all-accounts)'
     )
     dryrun_parser.set_defaults(ACTION='dryrun')
     list_parser = subp.add_parser('list', help='List available steps')
@@ -617,18 +1686,28 @@ def parse_args(argv):
 
     for parser in [run_parser, dryrun_parser]:
         parser.add_argument(
-            'ACCT_NAME', action='store', type=str, default=None,
-            help='account_name value from config file, for account to run '
-                 'against'
+            '--all-accounts', dest='all_accounts', action='store_true',
+            default=False, help='Run against all accounts in the config file'
+        )
+        parser.add_argument(
+            'ACCT_NAME', action='store', type=str, nargs='*',
+            help='account_name value(s) from config file, for account(s) to '
+                 'run against'
         )
 
     args = p.parse_args(argv)
+    if getattr(args, 'ACTION', None) in ['run', 'dryrun']:
+        if args.all_accounts and args.ACCT_NAME:
+            p.error('ACCT_NAME cannot be specified with --all-accounts')
+        if not args.all_accounts and not args.ACCT_NAME:
+            p.error('ACCT_NAME or --all-accounts must be specified')
     return args
 
 
 def main():
     """main command-line entrypoint; calls parse_args, sets up logging, and
-    either lists steps or instantiates a CustodianRunner and calls run()."""
+    either lists steps or instantiates a CustodianRunner (or, for more than one
+    account, a MultiAccountRunner) and calls run()."""
     args = parse_args(sys.argv[1:])
 
     # set logging level
@@ -646,7 +1725,33 @@ def main():
         for acctname in sorted(accts.keys()):
             print("%s (%s)" % (acctname, accts[acctname]))
         raise SystemExit(0)
-    cr = CustodianRunner(args.ACCT_NAME, args.config)
+    options = {
+        'incremental_policygen': args.incremental_policygen,
+        'policygen_cache': args.policygen_cache,
+        'policygen_workers': args.policygen_workers,
+        'policygen_output_format': args.output_format,
+        'validation_cache': args.validation_cache,
+        'mugc_workers': args.mugc_workers,
+        'skip_unchanged_lambdas': args.skip_unchanged_lambdas
+    }
+    if args.all_accounts:
+        accts = sorted(ManheimConfig.list_accounts(args.config).keys())
+    else:
+        accts = args.ACCT_NAME
+    if len(accts) > 1:
+        MultiAccountRunner(
+            accts, args.config, parallel_regions=args.parallel_regions,
+            parallel_accounts=args.parallel_accounts,
+            assume_role=args.assume_role, resume=args.resume, options=options
+        ).run(
+            args.ACTION, args.regions, step_names=args.steps,
+            skip_steps=args.skip
+        )
+        return
+    cr = CustodianRunner(
+        accts[0], args.config, parallel_regions=args.parallel_regions,
+        resume=args.resume, options=options
+    )
     if args.assume_role:
         assume_role(cr.config)
     cr.run(
@@ -37,15 +37,20 @@ logger = logging.getLogger(__name__)
 
 class S3Archiver(object):
 
-    def __init__(self, region_name, bucket_name, conf_file, dryrun=False):
+    def __init__(self, region_name, bucket_name, conf_file, dryrun=False,
+                 session=None, policy_names=None):
         logger.info('Connecting to S3 in %s for bucket %s (config file: %s)',
                     region_name, bucket_name, conf_file)
-        self._s3 = boto3.resource('s3', region_name=region_name)
+        if session is None:
+            self._s3 = boto3.resource('s3', region_name=region_name)
+        else:
+            self._s3 = session.resource('s3', region_name=region_name)
         self._region_name = region_name
         self._bucket_name = bucket_name
         self._bucket = self._s3.Bucket(bucket_name)
         self._conf_file = conf_file
         self._dryrun = dryrun
+        self._policy_names = policy_names
 
     def run(self):
         policy_names = self._get_policy_names()
@@ -142,11 +147,15 @@ class S3Archiver(object):
 
     def _get_policy_names(self):
         """
-        Read the custodian config file; return a list of policy names.
+        Read the custodian config file; return a list of policy names. If
+        the ``policy_names`` passed to the constructor were not None, return
+        them instead.
 
         :return: list of policy names
         :rtype: list
         """
+        if self._policy_names is not None:
+            return self._policy_names
         with open(self._conf_file, 'r') as fh:
             contents = fh.read()
         data = yaml.load(contents, Loader=SafeLoader)
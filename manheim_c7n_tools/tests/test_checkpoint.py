@@ -0,0 +1,113 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from unittest.mock import patch, call, Mock
+
+from manheim_c7n_tools.checkpoint import CheckpointJournal
+
+pbm = 'manheim_c7n_tools.checkpoint'
+
+
+class TestCheckpointJournal(object):
+
+    def test_new_removes_existing(self, tmp_path):
+        path = tmp_path / 'cp.json'
+        path.write_text('{}')
+        with patch('%s.logger' % pbm, autospec=True):
+            cls = CheckpointJournal(str(path), 'aName', 'run')
+        assert not path.exists()
+        assert cls.is_complete('foo', 'fp') is False
+
+    def test_complete_and_resume(self, tmp_path):
+        path = str(tmp_path / 'cp.json')
+        with patch('%s.logger' % pbm, autospec=True):
+            cls = CheckpointJournal(path, 'aName', 'run')
+            assert cls.is_complete('t1', 'fp1') is False
+            assert cls.is_complete('t2', 'fp2') is False
+            cls.complete('t1')
+            with open(path, 'r') as fh:
+                assert json.load(fh) == {
+                    'account_name': 'aName',
+                    'action': 'run',
+                    'completed': {'t1': 'fp1'}
+                }
+            cls2 = CheckpointJournal(path, 'aName', 'run', resume=True)
+        assert cls2.is_complete('t1', 'fp1') is True
+        assert cls2.is_complete('t1', 'changed') is False
+        assert cls2.is_complete('t2', 'fp2') is False
+
+    def test_resume_no_journal(self, tmp_path):
+        path = str(tmp_path / 'cp.json')
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = CheckpointJournal(path, 'aName', 'run', resume=True)
+        assert cls.is_complete('t1', 'fp1') is False
+        assert mock_logger.mock_calls == [
+            call.info('No checkpoint journal at %s; nothing to resume', path)
+        ]
+
+    def test_resume_other_account_or_action(self, tmp_path):
+        path = tmp_path / 'cp.json'
+        path.write_text(json.dumps({
+            'account_name': 'aName',
+            'action': 'dryrun',
+            'completed': {'t1': 'fp1'}
+        }))
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = CheckpointJournal(str(path), 'aName', 'run', resume=True)
+            cls2 = CheckpointJournal(str(path), 'bName', 'dryrun', resume=True)
+        assert cls.is_complete('t1', 'fp1') is False
+        assert cls2.is_complete('t1', 'fp1') is False
+        assert len(mock_logger.warning.mock_calls) == 2
+        # resuming leaves the existing journal in place
+        assert path.exists()
+
+    def test_remove(self, tmp_path):
+        path = str(tmp_path / 'cp.json')
+        with patch('%s.logger' % pbm, autospec=True):
+            cls = CheckpointJournal(path, 'aName', 'run')
+            cls.is_complete('t1', 'fp1')
+            cls.complete('t1')
+            cls.remove()
+            cls.remove()
+        assert not (tmp_path / 'cp.json').exists()
+
+    def test_fingerprint(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        m_conf = Mock()
+        m_conf.as_dict.return_value = {'foo': 'bar', 'regions': ['r1']}
+        (tmp_path / 'custodian_r1.yml').write_text('policies: []')
+        fp = CheckpointJournal.fingerprint(
+            m_conf, ['custodian_r1.yml', 'custodian_r2.yml']
+        )
+        assert len(fp) == 64
+        # stable, and independent of path order
+        assert fp == CheckpointJournal.fingerprint(
+            m_conf, ['custodian_r2.yml', 'custodian_r1.yml']
+        )
+        (tmp_path / 'custodian_r2.yml').write_text('policies: []')
+        fp2 = CheckpointJournal.fingerprint(
+            m_conf, ['custodian_r1.yml', 'custodian_r2.yml']
+        )
+        assert fp2 != fp
+        (tmp_path / 'custodian_r1.yml').write_text('policies: [{}]')
+        assert CheckpointJournal.fingerprint(
+            m_conf, ['custodian_r1.yml', 'custodian_r2.yml']
+        ) not in [fp, fp2]
+        m_conf.as_dict.return_value = {'foo': 'baz', 'regions': ['r1']}
+        assert CheckpointJournal.fingerprint(
+            m_conf, ['custodian_r1.yml']
+        ) != CheckpointJournal.fingerprint(Mock(**{
+            'as_dict.return_value': {'foo': 'bar', 'regions': ['r1']}
+        }), ['custodian_r1.yml'])
@@ -12,11 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from unittest.mock import patch, call, Mock, mock_open
+from unittest.mock import patch, call
+import pickle
 import pytest
 import yaml
 
-from manheim_c7n_tools.config import ManheimConfig, MANHEIM_CONFIG_SCHEMA
+import jsonschema
+from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
+from manheim_c7n_tools.config import (
+    ManheimConfig, ManheimConfigSet, MANHEIM_CONFIG_SCHEMA, validate_config
+)
+import manheim_c7n_tools.config as config_module
 
 pbm = 'manheim_c7n_tools.config'
 
@@ -26,7 +32,7 @@ class TestManheimConfig(object):
     def test_init(self):
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch(
-                '%s.jsonschema.validate' % pbm, autospec=True
+                '%s.validate_config' % pbm, autospec=True
             ) as mock_validate:
                 cls = ManheimConfig(
                     foo='bar', baz=2, regions=['us-east-1'],
@@ -47,15 +53,14 @@ class TestManheimConfig(object):
                 {
                     'foo': 'bar', 'baz': 2, 'regions': ['us-east-1'],
                     'account_id': '1234', 'cleanup_notify': ['foo@bar.com']
-                },
-                MANHEIM_CONFIG_SCHEMA
+                }
             )
         ]
 
     def test_init_not_us_east_1(self):
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch(
-                '%s.jsonschema.validate' % pbm, autospec=True
+                '%s.validate_config' % pbm, autospec=True
             ) as mock_validate:
                 cls = ManheimConfig(
                     foo='bar', baz=2, regions=['us-east-2'],
@@ -77,14 +82,13 @@ class TestManheimConfig(object):
                     'foo': 'bar', 'baz': 2, 'regions': ['us-east-2'],
                     'account_id': '1234', 'cleanup_notify': ['foo@bar.com'],
                     'function_prefix': 'foo-'
-                },
-                MANHEIM_CONFIG_SCHEMA
+                }
             )
         ]
 
     def test_getattr(self):
         with patch('%s.logger' % pbm, autospec=True):
-            with patch('%s.jsonschema.validate' % pbm, autospec=True):
+            with patch('%s.validate_config' % pbm, autospec=True):
                 cls = ManheimConfig(
                     foo='bar', baz=2, regions=['us-east-1'], config_path='foo',
                     account_id='012345'
@@ -96,135 +100,179 @@ class TestManheimConfig(object):
         with pytest.raises(AttributeError):
             cls.missingAttr
 
-    def test_from_file(self):
-        m_conf = Mock()
+    def test_pickle(self):
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.validate_config' % pbm, autospec=True):
+                cls = ManheimConfig(
+                    foo='bar', regions=['us-east-1'], config_path='foo',
+                    account_id='012345'
+                )
+                result = pickle.loads(pickle.dumps(cls))
+        assert result._config == cls._config
+        assert result.config_path == 'foo'
+        assert result.foo == 'bar'
+
+    def test_as_dict(self):
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch('%s.validate_config' % pbm, autospec=True):
+                cls = ManheimConfig(
+                    foo='bar', regions=['us-east-1'], config_path='foo',
+                    account_id=12345
+                )
+        assert cls.as_dict() == {
+            'config_path': 'foo',
+            'foo': 'bar',
+            'regions': ['us-east-1'],
+            'account_id': '12345',
+            'function_prefix': 'custodian-',
+            'cleanup_notify': []
+        }
+
+    def _write_config(self, tmp_path, content=None):
+        if content is None:
+            content = "- account_name: a1\n  account_id: '1111'\n" \
+                "  foo: bar\n  regions: [us-east-1]\n" \
+                "- account_name: a2\n  account_id: 2222\n" \
+                "  foo: bar1\n  regions: [us-east-2]\n"
+        path = str(tmp_path / 'conf.yml')
+        with open(path, 'w') as fh:
+            fh.write(content)
+        return path
+
+    def test_from_file(self, tmp_path):
+        path = self._write_config(tmp_path)
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch(
-                '%s.open' % pbm, mock_open(read_data='foo'), create=True
-            ) as m_open:
-                with patch('%s.yaml.load' % pbm, autospec=True) as mock_load:
-                    with patch(
-                        '%s.ManheimConfig' % pbm, autospec=True
-                    ) as mock_conf:
-                        mock_conf.return_value = m_conf
-                        mock_load.return_value = [
-                            {
-                                'account_name': 'a1',
-                                'foo': 'bar',
-                                'baz': 2,
-                                'regions': ['us-east-1']
-                            },
-                            {
-                                'account_name': 'a2',
-                                'foo': 'bar1',
-                                'baz': 4,
-                                'regions': ['us-east-2']
-                            }
-                        ]
-                        res = ManheimConfig.from_file('/tmp/conf.yml', 'a2')
-        assert res == m_conf
+                '%s.validate_config' % pbm, autospec=True
+            ) as mock_validate:
+                res = ManheimConfig.from_file(path, 'a2')
+                assert ManheimConfig.from_file(path, 'a2') is res
+        assert res.config_path == path
+        assert res.foo == 'bar1'
+        assert res.account_id == '2222'
         assert mock_logger.mock_calls == [
-            call.info('Loading config from: %s', '/tmp/conf.yml')
-        ]
-        assert m_open.mock_calls == [
-            call('/tmp/conf.yml', 'r'),
-            call().__enter__(),
-            call().read(),
-            call().__exit__(None, None, None)
-        ]
-        assert mock_load.mock_calls == [
-            call('foo', Loader=yaml.SafeLoader)
+            call.info('Loading config from: %s', path),
+            call.debug('Validating configuration...')
         ]
-        assert mock_conf.mock_calls == [
-            call(
-                account_name='a2', foo='bar1', baz=4, regions=['us-east-2'],
-                config_path='/tmp/conf.yml'
-            )
+        assert mock_validate.mock_calls == [
+            call({
+                'account_name': 'a2', 'account_id': 2222, 'foo': 'bar1',
+                'regions': ['us-east-2']
+            })
         ]
 
-    def test_from_file_name_missing(self):
-        m_conf = Mock()
-        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-            with patch(
-                '%s.open' % pbm, mock_open(read_data='foo'), create=True
-            ) as m_open:
-                with patch('%s.yaml.load' % pbm, autospec=True) as mock_load:
-                    with patch(
-                        '%s.ManheimConfig' % pbm, autospec=True
-                    ) as mock_conf:
-                        mock_conf.return_value = m_conf
-                        mock_load.return_value = [
-                            {
-                                'account_name': 'a1',
-                                'foo': 'bar',
-                                'baz': 2,
-                                'regions': ['us-east-1']
-                            },
-                            {
-                                'account_name': 'a2',
-                                'foo': 'bar1',
-                                'baz': 4,
-                                'regions': ['us-east-2']
-                            }
-                        ]
-                        with pytest.raises(RuntimeError) as exc:
-                            ManheimConfig.from_file('/tmp/conf.yml', 'BAD')
+    def test_from_file_name_missing(self, tmp_path):
+        path = self._write_config(tmp_path)
+        with patch('%s.validate_config' % pbm, autospec=True) as mock_validate:
+            with pytest.raises(RuntimeError) as exc:
+                ManheimConfig.from_file(path, 'BAD')
         assert str(exc.value) == 'ERROR: No account with name "BAD"' \
-                                 ' in /tmp/conf.yml'
-        assert mock_logger.mock_calls == [
-            call.info('Loading config from: %s', '/tmp/conf.yml')
-        ]
-        assert m_open.mock_calls == [
-            call('/tmp/conf.yml', 'r'),
-            call().__enter__(),
-            call().read(),
-            call().__exit__(None, None, None)
-        ]
-        assert mock_load.mock_calls == [
-            call('foo', Loader=yaml.SafeLoader)
-        ]
-        assert mock_conf.mock_calls == []
+                                 ' in %s' % path
+        assert mock_validate.mock_calls == []
 
-    def test_list_accounts(self):
-        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-            with patch(
-                '%s.open' % pbm, mock_open(read_data='foo'), create=True
-            ) as m_open:
-                with patch('%s.yaml.load' % pbm, autospec=True) as mock_load:
-                    with patch(
-                        '%s.ManheimConfig' % pbm, autospec=True
-                    ) as mock_conf:
-                        mock_load.return_value = [
-                            {
-                                'account_name': 'a1',
-                                'account_id': '1111',
-                                'foo': 'bar',
-                                'baz': 2,
-                                'regions': ['us-east-1']
-                            },
-                            {
-                                'account_name': 'a2',
-                                'account_id': 2222,
-                                'foo': 'bar1',
-                                'baz': 4,
-                                'regions': ['us-east-2']
-                            }
-                        ]
-                        res = ManheimConfig.list_accounts('/tmp/conf.yml')
+    def test_list_accounts(self, tmp_path):
+        path = self._write_config(tmp_path)
+        with patch('%s.yaml.load' % pbm, wraps=yaml.load) as mock_load:
+            with patch('%s.validate_config' % pbm, autospec=True):
+                res = ManheimConfig.list_accounts(path)
+                ManheimConfig.from_file(path, 'a1')
+                ManheimConfig.from_file(path, 'a2')
         assert res == {'a1': '1111', 'a2': '2222'}
-        assert mock_logger.mock_calls == [
-            call.info('Loading config from: %s', '/tmp/conf.yml')
-        ]
-        assert m_open.mock_calls == [
-            call('/tmp/conf.yml', 'r'),
-            call().__enter__(),
-            call().read(),
-            call().__exit__(None, None, None)
-        ]
-        assert mock_load.mock_calls == [
-            call('foo', Loader=yaml.SafeLoader)
-        ]
-        assert mock_conf.mock_calls == []
+        # parsed only once, with the C loader if available
+        assert len(mock_load.mock_calls) == 1
+        assert mock_load.mock_calls[0][2]['Loader'] == getattr(
+            yaml, 'CSafeLoader', yaml.SafeLoader
+        )
+
+
+class TestManheimConfigSet(object):
+
+    def test_load_cached(self, tmp_path):
+        path = TestManheimConfig()._write_config(tmp_path)
+        cset = ManheimConfigSet.load(path)
+        assert ManheimConfigSet.load(path) is cset
+        assert cset.account_names == ['a1', 'a2']
+        assert cset.path == path
+        with open(path, 'a') as fh:
+            fh.write("- account_name: a3\n  account_id: 3333\n"
+                     "  regions: [us-east-1]\n")
+        res = ManheimConfigSet.load(path)
+        assert res is not cset
+        assert res.account_names == ['a1', 'a2', 'a3']
+        assert res.list_accounts() == {
+            'a1': '1111', 'a2': '2222', 'a3': '3333'
+        }
+
+    def test_config(self, tmp_path):
+        path = TestManheimConfig()._write_config(tmp_path)
+        cset = ManheimConfigSet(path)
+        with patch('%s.validate_config' % pbm, autospec=True) as mock_validate:
+            a1 = cset.config('a1')
+            assert cset.config('a1') is a1
+            a2 = cset.config('a2')
+        assert a1.foo == 'bar'
+        assert a2.foo == 'bar1'
+        assert a1.config_path == path
+        assert len(mock_validate.mock_calls) == 2
+        # the raw config is not modified
+        assert 'config_path' not in cset._accounts['a1']
+
+
+class TestValidateConfig(object):
+
+    def _config(self, **kwargs):
+        conf = {
+            'account_name': 'a', 'account_id': 1, 'regions': ['us-east-1'],
+            'mailer_config': {
+                'queue_url': 'https://sqs.us-east-1.amazonaws.com/1/q',
+                'role': 'arn:aws:iam::1:role/r', 'from_address': 'a@b.c'
+            },
+            'mailer_regions': ['us-east-1'],
+            'output_s3_bucket_name': 'bkt',
+            'custodian_log_group': 'lg',
+            'dead_letter_queue_arn': 'arn',
+            'role_arn': 'role'
+        }
+        conf.update(kwargs)
+        return conf
+
+    def test_valid(self):
+        with patch(
+            'jsonschema.validators.validator_for',
+            wraps=jsonschema.validators.validator_for
+        ) as mock_vf:
+            with patch('%s._validator' % pbm, None):
+                validate_config(self._config())
+                validate_config(self._config(account_name='b'))
+        assert mock_vf.mock_calls == [call(MANHEIM_CONFIG_SCHEMA)]
+
+    def test_invalid(self):
+        with pytest.raises(jsonschema.exceptions.ValidationError) as exc:
+            validate_config(self._config(regions='us-east-1'))
+        assert exc.value.message == "'us-east-1' is not of type 'array'"
+
+    def test_invalid_mailer_config(self):
+        conf = self._config()
+        conf['mailer_config']['queue_url'] = 1
+        with pytest.raises(jsonschema.exceptions.ValidationError) as exc:
+            validate_config(conf)
+        assert exc.value.message == "1 is not of type 'string'"
+
+    def test_config_schema(self):
+        assert MANHEIM_CONFIG_SCHEMA['properties']['mailer_config'] == \
+            MAILER_SCHEMA
+        assert config_module.MANHEIM_CONFIG_SCHEMA is MANHEIM_CONFIG_SCHEMA
+        assert MANHEIM_CONFIG_SCHEMA['properties']['regions'] == {
+            'type': 'array',
+            'items': {'type': 'string'}
+        }
+
+    def test_no_attribute(self):
+        with pytest.raises(AttributeError):
+            config_module.foo
+
+
+class TestManheimConfigRegion(object):
 
     def test_config_for_region(self):
         original = {
@@ -266,7 +314,7 @@ class TestManheimConfig(object):
             'cleanup_notify': [],
             'function_prefix': 'custodian-'
         }
-        with patch('%s.jsonschema.validate' % pbm, autospec=True):
+        with patch('%s.validate_config' % pbm, autospec=True):
             with patch.dict(
                 'os.environ',
                 {'foo': 'bar', 'POLICYGEN_ENV_foo': 'barVAR'},
@@ -276,3 +324,53 @@ class TestManheimConfig(object):
                 result = conf.config_for_region('us-east-2')
         assert result._config == expected
         assert result.config_path == '/tmp/baz.yml'
+
+    def test_config_for_region_memoized(self):
+        original = {
+            'foo': ['%%AWS_REGION%%', '%%POLICYGEN_ENV_foo%%', 3, None],
+            'regions': ['us-east-1', 'us-east-2'],
+            'account_id': '012345',
+            'config_path': '/tmp/baz.yml'
+        }
+        with patch(
+            '%s.validate_config' % pbm, autospec=True
+        ) as mock_validate:
+            with patch.dict('os.environ', {'POLICYGEN_ENV_foo': 'a'}):
+                conf = ManheimConfig(**original)
+                r1 = conf.config_for_region('us-east-1')
+                r2 = conf.config_for_region('us-east-2')
+                assert conf.config_for_region('us-east-1') is r1
+            with patch.dict('os.environ', {'POLICYGEN_ENV_foo': 'b'}):
+                r3 = conf.config_for_region('us-east-1')
+        assert len(mock_validate.mock_calls) == 1
+        assert r1.foo == ['us-east-1', 'a', 3, None]
+        assert r2.foo == ['us-east-2', 'a', 3, None]
+        assert r3.foo == ['us-east-1', 'b', 3, None]
+        assert r3 is not r1
+        assert conf.foo == [
+            '%%AWS_REGION%%', '%%POLICYGEN_ENV_foo%%', 3, None
+        ]
+        assert r1.config_path == '/tmp/baz.yml'
+        assert r1.function_prefix == 'custodian-'
+        # region configs can be pickled for worker processes
+        result = pickle.loads(pickle.dumps(r1))
+        assert result._config == r1._config
+        assert result._region_configs == {}
+
+    def test_config_for_region_unresolved(self):
+        original = {
+            'foo': 'bar%%AWS_REGION%%baz%%POLICYGEN_ENV_bar%%',
+            'regions': ['us-east-1', 'us-east-2'],
+            'account_id': '012345',
+            'config_path': '/tmp/baz.yml'
+        }
+        with patch('%s.validate_config' % pbm, autospec=True):
+            with patch.dict('os.environ', {}, clear=True):
+                with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                    conf = ManheimConfig(**original)
+                    result = conf.config_for_region('us-east-2')
+        assert result.foo == 'barus-east-2baz%%POLICYGEN_ENV_bar%%'
+        assert call.warning(
+            'Unresolved macros in configuration for region %s: %s',
+            'us-east-2', 'POLICYGEN_ENV_bar'
+        ) in mock_logger.mock_calls
@@ -0,0 +1,127 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from io import BytesIO
+from unittest.mock import patch, call, Mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.deploy_manifest import (
+    DeployManifest, deploy_fingerprints, is_lambda_policy, MANIFEST_VERSION
+)
+
+pbm = 'manheim_c7n_tools.deploy_manifest'
+
+P1 = {'name': 'p1', 'resource': 'ec2'}
+P2 = {'name': 'p2', 'resource': 'ec2', 'mode': {'type': 'periodic'}}
+P3 = {'name': 'p3', 'resource': 'ebs', 'mode': {'type': 'pull'}}
+P4 = {'name': 'p4', 'resource': 'ebs', 'mode': None}
+
+
+class TestIsLambdaPolicy(object):
+
+    def test_is_lambda_policy(self):
+        assert is_lambda_policy(P1) is False
+        assert is_lambda_policy(P2) is True
+        assert is_lambda_policy(P3) is False
+        assert is_lambda_policy(P4) is False
+
+
+class TestDeployFingerprints(object):
+
+    def test_fingerprints(self):
+        opts = {'region': 'r1', 'log_group': 'lg'}
+        res = deploy_fingerprints([P1, P2, P3, P4], opts)
+        assert list(res.keys()) == ['p2']
+        # stable, and independent of key order
+        assert deploy_fingerprints(
+            [{'mode': {'type': 'periodic'}, 'resource': 'ec2', 'name': 'p2'}],
+            {'log_group': 'lg', 'region': 'r1'}
+        ) == res
+        # changes with the policy
+        assert deploy_fingerprints(
+            [dict(P2, comment='foo')], opts
+        )['p2'] != res['p2']
+        # changes with the options
+        assert deploy_fingerprints(
+            [P2], {'region': 'r1', 'log_group': 'other'}
+        )['p2'] != res['p2']
+        # changes with the c7n version
+        with patch('c7n.version.version', '0.0.1'):
+            assert deploy_fingerprints([P2], opts)['p2'] != res['p2']
+
+
+class TestDeployManifest(object):
+
+    def _manifest(self):
+        m_sess = Mock()
+        cls = DeployManifest('bkt', 'r1', session=m_sess)
+        assert m_sess.mock_calls == [call.client('s3', region_name='r1')]
+        return cls, m_sess.client.return_value
+
+    def test_init_default_session(self):
+        with patch('boto3.client') as mock_client:
+            cls = DeployManifest('bkt', 'r1')
+        assert mock_client.mock_calls == [call('s3', region_name='r1')]
+        assert cls.key == 'manheim-c7n-tools/deployed-policies/r1.json'
+
+    def test_load(self):
+        cls, m_s3 = self._manifest()
+        m_s3.get_object.return_value = {'Body': BytesIO(json.dumps({
+            'version': MANIFEST_VERSION, 'policies': {'p2': 'fp2'}
+        }).encode('utf-8'))}
+        assert cls.load() == {'p2': 'fp2'}
+        assert m_s3.mock_calls == [
+            call.get_object(
+                Bucket='bkt', Key='manheim-c7n-tools/deployed-policies/r1.json'
+            )
+        ]
+
+    def test_load_other_version(self):
+        cls, m_s3 = self._manifest()
+        m_s3.get_object.return_value = {'Body': BytesIO(json.dumps({
+            'version': MANIFEST_VERSION + 1, 'policies': {'p2': 'fp2'}
+        }).encode('utf-8'))}
+        assert cls.load() == {}
+
+    def test_load_missing(self):
+        cls, m_s3 = self._manifest()
+        m_s3.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchKey', 'Message': 'msg'}}, 'GetObject'
+        )
+        assert cls.load() == {}
+
+    def test_load_error(self):
+        cls, m_s3 = self._manifest()
+        m_s3.get_object.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied', 'Message': 'msg'}}, 'GetObject'
+        )
+        with pytest.raises(ClientError):
+            cls.load()
+
+    def test_save(self):
+        cls, m_s3 = self._manifest()
+        cls.save({'p2': 'fp2'})
+        assert m_s3.mock_calls == [
+            call.put_object(
+                Bucket='bkt',
+                Key='manheim-c7n-tools/deployed-policies/r1.json',
+                Body=json.dumps(
+                    {'policies': {'p2': 'fp2'}, 'version': MANIFEST_VERSION}
+                ).encode('utf-8'),
+                ContentType='application/json'
+            )
+        ]
@@ -0,0 +1,227 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from unittest.mock import patch, call, Mock, DEFAULT
+
+import pytest
+from botocore.exceptions import ClientError
+
+from manheim_c7n_tools.vendor import mugc
+from manheim_c7n_tools.vendor.mugc import PolicyNameMatcher
+
+pbm = 'manheim_c7n_tools.vendor.mugc'
+
+
+class TestPolicyNameMatcher(object):
+
+    def test_match(self):
+        policies = ['foo', 'bar-baz', 'oo']
+        m = PolicyNameMatcher(policies, 'custodian-')
+        funcs = [
+            'custodian-foo',
+            'custodian-bar-baz',
+            'custodian-baz',
+            'other-foo',
+            'other-bar-baz',
+            'custodian-foobar',
+            'custodian-xoo',
+            'foo',
+            'custodian-',
+            ''
+        ]
+        for fname in funcs:
+            assert m.match(fname) is any(
+                fname.endswith(pn) for pn in policies
+            ), fname
+
+    def test_no_prefix(self):
+        m = PolicyNameMatcher(['foo'], None)
+        assert m.match('foo') is True
+        assert m.match('custodian-foo') is True
+        assert m.match('custodian-bar') is False
+
+    def test_no_policies(self):
+        m = PolicyNameMatcher([], 'custodian-')
+        assert m.match('custodian-foo') is False
+
+    def test_empty_policy_name(self):
+        m = PolicyNameMatcher([''], 'custodian-')
+        assert m.match('anything') is True
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': 'msg'}}, 'Op')
+
+
+class TestCallWithBackoff(object):
+
+    def test_success(self):
+        func = Mock(return_value='res')
+        with patch('%s.time.sleep' % pbm) as mock_sleep:
+            assert mugc.call_with_backoff(func, 'a', b='c') == 'res'
+        assert func.mock_calls == [call('a', b='c')]
+        assert mock_sleep.mock_calls == []
+
+    def test_throttled(self):
+        func = Mock(side_effect=[
+            client_error('ThrottlingException'),
+            client_error('TooManyRequestsException'),
+            'res'
+        ])
+        with patch('%s.time.sleep' % pbm) as mock_sleep:
+            with patch('%s.random.uniform' % pbm) as mock_uniform:
+                mock_uniform.side_effect = lambda a, b: b
+                assert mugc.call_with_backoff(func, 'a') == 'res'
+        assert func.mock_calls == [call('a'), call('a'), call('a')]
+        assert mock_sleep.mock_calls == [call(1.0), call(2.0)]
+
+    def test_gives_up(self):
+        func = Mock(side_effect=client_error('Throttling'))
+        with patch('%s.time.sleep' % pbm) as mock_sleep:
+            with pytest.raises(ClientError):
+                mugc.call_with_backoff(func)
+        assert len(func.mock_calls) == mugc.BACKOFF_ATTEMPTS
+        assert len(mock_sleep.mock_calls) == mugc.BACKOFF_ATTEMPTS - 1
+
+    def test_other_error(self):
+        func = Mock(side_effect=client_error('AccessDenied'))
+        with patch('%s.time.sleep' % pbm) as mock_sleep:
+            with pytest.raises(ClientError):
+                mugc.call_with_backoff(func)
+        assert len(func.mock_calls) == 1
+        assert mock_sleep.mock_calls == []
+
+
+class TestRegionGc(object):
+
+    def setup_method(self):
+        self.funcs = [
+            {
+                'FunctionName': 'custodian-%s' % name, 'Role': 'role',
+                'Handler': 'h', 'Timeout': 60, 'MemorySize': 128,
+                'Description': 'd', 'Runtime': 'python3.8'
+            } for name in ['a', 'b', 'c', 'd', 'e']
+        ]
+        events_policy = json.dumps({'Statement': [
+            {'Principal': {'Service': 'events.amazonaws.com'}}
+        ]})
+        self.policies = {
+            'custodian-b': {'Policy': events_policy},
+            'custodian-c': client_error('ResourceNotFoundException'),
+            'custodian-d': {},
+            'custodian-e': {'Policy': events_policy}
+        }
+        self.remove_error = None
+        self.removed = []
+
+    def _run(self, dryrun, workers=4):
+        options = Mock(
+            prefix='custodian-', policy_regex='^custodian-.*', present=False,
+            dryrun=dryrun, gc_workers=workers
+        )
+        policy_config = Mock(
+            assume_role=None, profile=None, external_id=None
+        )
+        policy = Mock()
+        policy.name = 'a'
+
+        def se_get_policy(FunctionName=None):
+            res = self.policies[FunctionName]
+            if isinstance(res, Exception):
+                raise res
+            return res
+
+        def se_remove(func):
+            self.removed.append(func.name)
+            if self.remove_error is not None:
+                raise self.remove_error
+
+        with patch.multiple(
+            pbm, SessionFactory=DEFAULT, log=DEFAULT
+        ) as mocks:
+            with patch('%s.mu.LambdaManager' % pbm) as mock_mgr:
+                mock_mgr.return_value.list_functions.return_value = self.funcs
+                client = mocks['SessionFactory'].return_value.return_value.\
+                    client.return_value
+                client.get_policy.side_effect = se_get_policy
+                mock_mgr.return_value.remove.side_effect = se_remove
+                mugc.region_gc(options, 'r1', policy_config, [policy])
+        return mocks['log'], mock_mgr.return_value
+
+    def test_dryrun(self):
+        mock_log, mock_mgr = self._run(True)
+        assert mock_mgr.remove.mock_calls == []
+        assert mock_log.mock_calls == [
+            call.info('Region:%s Removing %s', 'r1', 'custodian-b'),
+            call.info('Dryrun skipping removal'),
+            call.warning(
+                'Region:%s Lambda Function or Access Policy Statement '
+                'missing: %s', 'r1', 'custodian-c'
+            ),
+            call.info('Region:%s Removing %s', 'r1', 'custodian-d'),
+            call.info('Dryrun skipping removal'),
+            call.info('Region:%s Removing %s', 'r1', 'custodian-e'),
+            call.info('Dryrun skipping removal')
+        ]
+
+    def test_remove(self):
+        mock_log, mock_mgr = self._run(False)
+        assert sorted(
+            c[1][0].name for c in mock_mgr.remove.mock_calls
+        ) == ['custodian-b', 'custodian-d', 'custodian-e']
+        assert mock_log.mock_calls[0] == call.warning(
+            'Region:%s Lambda Function or Access Policy Statement '
+            'missing: %s', 'r1', 'custodian-c'
+        )
+        # lines for different functions may be interleaved, but each
+        # function's "Removing" is logged before its "Removed"
+        lines = mock_log.mock_calls[1:]
+        assert len(lines) == 6
+        for name in ['custodian-b', 'custodian-d', 'custodian-e']:
+            assert lines.index(
+                call.info('Region:%s Removing %s', 'r1', name)
+            ) < lines.index(
+                call.info('Region:%s Removed %s', 'r1', name)
+            )
+
+    def test_remove_serial(self):
+        mock_log, mock_mgr = self._run(False, workers=1)
+        assert mock_log.mock_calls == [
+            call.warning(
+                'Region:%s Lambda Function or Access Policy Statement '
+                'missing: %s', 'r1', 'custodian-c'
+            ),
+            call.info('Region:%s Removing %s', 'r1', 'custodian-b'),
+            call.info('Region:%s Removed %s', 'r1', 'custodian-b'),
+            call.info('Region:%s Removing %s', 'r1', 'custodian-d'),
+            call.info('Region:%s Removed %s', 'r1', 'custodian-d'),
+            call.info('Region:%s Removing %s', 'r1', 'custodian-e'),
+            call.info('Region:%s Removed %s', 'r1', 'custodian-e')
+        ]
+
+    def test_remove_failure(self):
+        self.remove_error = client_error('AccessDenied')
+        with pytest.raises(ClientError):
+            self._run(False)
+        # removals already queued still run
+        assert sorted(self.removed) == [
+            'custodian-b', 'custodian-d', 'custodian-e'
+        ]
+
+    def test_nothing_to_remove(self):
+        self.funcs = self.funcs[:1]
+        mock_log, mock_mgr = self._run(False)
+        assert mock_mgr.remove.mock_calls == []
+        assert mock_log.mock_calls == []
@@ -0,0 +1,140 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+from unittest.mock import patch
+
+import pytest
+from c7n.config import Config
+from c7n.exceptions import PolicyValidationError
+
+from manheim_c7n_tools.policy_artifacts import PolicyArtifacts
+
+pbm = 'manheim_c7n_tools.policy_artifacts'
+
+POLICIES = {
+    'policies': [
+        {
+            'name': 'p1',
+            'resource': 'ec2',
+            'filters': [{'State.Name': 'running'}]
+        },
+        {
+            'name': 'p2',
+            'resource': 'aws.s3'
+        }
+    ]
+}
+
+
+class TestPolicyArtifacts(object):
+
+    def setup_method(self):
+        PolicyArtifacts.clear()
+
+    def teardown_method(self):
+        PolicyArtifacts.clear()
+
+    def _write(self, path, data, mtime_ns=None):
+        path.write_text(json.dumps(data))
+        if mtime_ns is not None:
+            os.utime(str(path), ns=(mtime_ns, mtime_ns))
+        return str(path)
+
+    def test_load(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES)
+        res = PolicyArtifacts.load(path)
+        assert res.path == path
+        assert res.data == POLICIES
+        assert res.validated is True
+        assert res.policies == POLICIES['policies']
+        assert res.names == frozenset(['p1', 'p2'])
+        options = Config.empty(region='r1')
+        coll = res.collection(options)
+        assert [p.name for p in coll] == ['p1', 'p2']
+        assert coll.options is options
+        # exact names, not glob patterns
+        assert [
+            p.name for p in res.collection(options, names={'p2', 'p*'})
+        ] == ['p2']
+        # cached
+        with patch('%s.PolicyArtifacts._load_file' % pbm) as mock_load:
+            assert PolicyArtifacts.load(path) is res
+            assert PolicyArtifacts.load(path, validate=False) is res
+        assert mock_load.mock_calls == []
+
+    def test_load_no_validate(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES)
+        with patch(
+            '%s.PolicyArtifacts._validate' % pbm, autospec=True
+        ) as mock_validate:
+            res = PolicyArtifacts.load(path, validate=False)
+            assert res.validated is False
+            assert PolicyArtifacts.load(path, validate=False) is res
+            assert mock_validate.mock_calls == []
+            # not validated yet, so it's loaded and validated again
+            res2 = PolicyArtifacts.load(path)
+        assert res2 is not res
+        assert len(mock_validate.mock_calls) == 1
+
+    def test_load_changed(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES, 1000)
+        res = PolicyArtifacts.load(path, validate=False)
+        data = {'policies': POLICIES['policies'][:1]}
+        self._write(tmp_path / 'custodian_r1.json', data, 2000)
+        res2 = PolicyArtifacts.load(path, validate=False)
+        assert res2 is not res
+        assert res2.names == frozenset(['p1'])
+
+    def test_load_invalid(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', {
+            'policies': [{'name': 'p1', 'resource': 'ec2', 'foo': 'bar'}]
+        })
+        with pytest.raises(PolicyValidationError):
+            PolicyArtifacts.load(path)
+        # not cached
+        res = PolicyArtifacts.load(path, validate=False)
+        assert res.validated is False
+
+    def test_validated(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES)
+        res = PolicyArtifacts.load(path, validate=False)
+        assert PolicyArtifacts.validated(path) is res
+        assert res.validated is True
+        with patch(
+            '%s.PolicyArtifacts._validate' % pbm, autospec=True
+        ) as mock_validate:
+            assert PolicyArtifacts.load(path) is res
+        assert mock_validate.mock_calls == []
+
+    def test_validated_not_loaded(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES)
+        res = PolicyArtifacts.validated(path)
+        assert res.validated is True
+        assert res.names == frozenset(['p1', 'p2'])
+        assert PolicyArtifacts.load(path) is res
+
+    def test_clear(self, tmp_path):
+        path = self._write(tmp_path / 'custodian_r1.json', POLICIES)
+        res = PolicyArtifacts.load(path, validate=False)
+        PolicyArtifacts.clear()
+        assert PolicyArtifacts.load(path, validate=False) is not res
+
+    def test_empty(self, tmp_path):
+        path = tmp_path / 'custodian_r1.yml'
+        path.write_text('')
+        res = PolicyArtifacts.load(str(path), validate=False)
+        assert res.policies == []
+        assert res.names == frozenset()
@@ -12,19 +12,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from unittest.mock import patch, call, mock_open, DEFAULT, Mock, PropertyMock
+from unittest.mock import (
+    patch, call, mock_open, DEFAULT, Mock, PropertyMock, ANY
+)
 import pytest
 import os
+import json
+import yaml
+from copy import deepcopy
 from freezegun import freeze_time
 from collections import defaultdict
 
 import manheim_c7n_tools.policygen as policygen
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.yamlcache import YamlCache
 
 pbm = 'manheim_c7n_tools.policygen'
 pb = f'{pbm}.PolicyGen'
 
 
+def real_config(**kwargs):
+    """
+    Return a real (picklable, for use in worker processes) ManheimConfig.
+    """
+    conf = dict(
+        config_path='m.yml', account_name='a', account_id='1234',
+        regions=['us-east-1'], mailer_regions=['us-east-1'],
+        output_s3_bucket_name='b', custodian_log_group='l',
+        dead_letter_queue_arn='d', role_arn='r',
+        mailer_config={'queue_url': 'q', 'role': 'r', 'from_address': 'f'}
+    )
+    conf.update(kwargs)
+    return ManheimConfig(**conf)
+
+
 class TestStripDoc(object):
 
     def test_strip_doc(self):
@@ -559,6 +580,22 @@ class TestAddAlwaysNotify(PolicyGenTester):
         }
         assert self.cls._add_always_notify(original) == expected
 
+    def test_does_not_modify_config(self):
+        desired = {
+            'to': ['toAddr1'],
+            'transport': {'queue': 'q', 'type': 'sqs'}
+        }
+        type(self.m_conf).always_notify = PropertyMock(return_value=desired)
+        p1 = self.cls._add_always_notify({'actions': []})
+        p2 = self.cls._add_always_notify({'actions': []})
+        assert desired == {
+            'to': ['toAddr1'],
+            'transport': {'queue': 'q', 'type': 'sqs'}
+        }
+        assert p1 == p2
+        assert p1['actions'][0] is not p2['actions'][0]
+        assert p1['actions'][0]['to'] is not desired['to']
+
     def test_notify_different_transport(self):
         type(self.m_conf).always_notify = PropertyMock(
             return_value={
@@ -875,6 +912,30 @@ class TestWriteFile(PolicyGenTester):
             call().__exit__(None, None, None)
         ]
 
+    def test_write_unchanged(self, tmp_path):
+        fpath = str(tmp_path / 'fpath')
+        self.cls._write_file(fpath, 'fcontent')
+        mtime = os.stat(fpath).st_mtime_ns
+        with patch(
+            'manheim_c7n_tools.policygen.open', mock_open(read_data='fcontent'),
+            create=True
+        ) as m_open:
+            self.cls._write_file(fpath, 'fcontent')
+        assert m_open.mock_calls == [
+            call(fpath, 'r'),
+            call().__enter__(),
+            call().read(),
+            call().__exit__(None, None, None)
+        ]
+        assert os.stat(fpath).st_mtime_ns == mtime
+
+    def test_write_changed(self, tmp_path):
+        fpath = str(tmp_path / 'fpath')
+        self.cls._write_file(fpath, 'fcontent')
+        self.cls._write_file(fpath, 'other')
+        with open(fpath, 'r') as fh:
+            assert fh.read() == 'other'
+
 
 class TestRun(PolicyGenTester):
 
@@ -1140,21 +1201,219 @@ class TestRun(PolicyGenTester):
         assert mocks['_load_defaults'].mock_calls == [call(self.cls)]
         assert mocks['_setup_mailer_templates'].mock_calls == []
 
+    def test_incremental_stale(self):
+        self.cls._incremental = True
+        self.cls._yaml_cache = Mock(spec_set=YamlCache)
+        keys = {
+            'regions.rst': 'k1',
+            'policies.rst': 'k2',
+            'custodian_region1.yml': 'k3',
+            'custodian_region2.yml': 'k4',
+            'custodian_region3.yml': 'k5'
+        }
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _load_all_policies=DEFAULT,
+            _generate_configs=DEFAULT,
+            _policy_rst=DEFAULT,
+            _write_file=DEFAULT,
+            _regions_rst=DEFAULT,
+            _load_defaults=DEFAULT,
+            _setup_mailer_templates=DEFAULT,
+            _manifest_keys=DEFAULT,
+            _stale_outputs=DEFAULT,
+            _write_manifest=DEFAULT
+        ) as mocks:
+            mocks['_load_all_policies'].return_value = {
+                'myAccount': {
+                    'region1': {'r1': 'p1'},
+                    'region2': {'r2': 'p2'},
+                    'region3': {'r3': 'p3'}
+                }
+            }
+            mocks['_policy_rst'].return_value = 'polMD'
+            mocks['_load_defaults'].return_value = {'defaults': 'here'}
+            mocks['_manifest_keys'].return_value = keys
+            mocks['_stale_outputs'].return_value = set([
+                'custodian_region2.yml', 'policies.rst'
+            ])
+            self.cls.run()
+        assert mocks['_stale_outputs'].mock_calls == [call(self.cls, keys)]
+        assert mocks['_generate_configs'].mock_calls == [
+            call(self.cls, {'r2': 'p2'}, {'defaults': 'here'}, 'region2')
+        ]
+        assert mocks['_write_file'].mock_calls == [
+            call(self.cls, 'policies.rst', 'polMD')
+        ]
+        assert mocks['_regions_rst'].mock_calls == []
+        assert mocks['_setup_mailer_templates'].mock_calls == [call(self.cls)]
+        assert mocks['_write_manifest'].mock_calls == [call(self.cls, keys)]
+        assert self.cls._yaml_cache.mock_calls == [call.save()]
+
+    def test_incremental_up_to_date(self):
+        self.cls._incremental = True
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _load_all_policies=DEFAULT,
+            _generate_configs=DEFAULT,
+            _write_file=DEFAULT,
+            _load_defaults=DEFAULT,
+            _setup_mailer_templates=DEFAULT,
+            _manifest_keys=DEFAULT,
+            _stale_outputs=DEFAULT,
+            _write_manifest=DEFAULT
+        ) as mocks:
+            mocks['_manifest_keys'].return_value = {'regions.rst': 'k1'}
+            mocks['_stale_outputs'].return_value = set()
+            self.cls.run()
+        assert mocks['_load_defaults'].mock_calls == []
+        assert mocks['_load_all_policies'].mock_calls == []
+        assert mocks['_generate_configs'].mock_calls == []
+        assert mocks['_write_file'].mock_calls == []
+        assert mocks['_setup_mailer_templates'].mock_calls == [call(self.cls)]
+        assert mocks['_write_manifest'].mock_calls == []
+
+
+class TestManifest(PolicyGenTester):
+
+    def _write(self, path, content):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as fh:
+            fh.write(content)
+
+    def _setup_tree(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for k in list(os.environ.keys()):
+            if k.startswith('POLICYGEN_ENV_'):
+                monkeypatch.delenv(k)
+        type(self.m_conf).config_path = PropertyMock(
+            return_value=str(tmp_path / 'conf.yml')
+        )
+        self._write('conf.yml', 'foo: bar')
+        self._write('policies/defaults.yml', 'd')
+        self._write('policies/all_accounts/common/a.yml', 'a')
+        self._write('policies/all_accounts/region1/b.yml', 'b')
+        self._write('policies/myAccount/region2/c.yml', 'c')
+        self._write('policies/otherAccount/region1/d.yml', 'd')
+        self._write('policies/otherAccount/region1/README', 'x')
+
+    def test_input_hashes(self, tmp_path, monkeypatch):
+        self._setup_tree(tmp_path, monkeypatch)
+        res = self.cls._input_hashes()
+        assert sorted(res.keys()) == [
+            'all_accounts/common/a.yml',
+            'all_accounts/region1/b.yml',
+            'defaults.yml',
+            'myAccount/region2/c.yml',
+            'otherAccount/region1/d.yml'
+        ]
+        assert res['defaults.yml'] == res['otherAccount/region1/d.yml']
+
+    @pytest.mark.parametrize('path, region, expected', [
+        ('defaults.yml', 'region1', True),
+        (os.path.join('src', 'defaults.yml'), 'region1', False),
+        (os.path.join('all_accounts', 'common', 'a.yml'), 'region1', True),
+        (os.path.join('all_accounts', 'region1', 'a.yml'), 'region1', True),
+        (os.path.join('all_accounts', 'region1', 'a.yml'), 'region2', False),
+        (os.path.join('myAccount', 'common', 'a.yml'), 'region2', True),
+        (os.path.join('src', 'myAccount', 'region2', 'a.yml'), 'region2',
+         False),
+        (os.path.join('otherAccount', 'common', 'a.yml'), 'region1', False),
+        (os.path.join('all_accounts', 'region1', 'defaults.yml'), 'region2',
+         False)
+    ])
+    def test_file_affects_region(self, path, region, expected):
+        assert self.cls._file_affects_region(path, region) is expected
+
+    @pytest.mark.parametrize('path, region, expected', [
+        ('defaults.yml', 'region1', True),
+        (os.path.join('src', 'defaults.yml'), 'region1', True),
+        (os.path.join('team', 'src', 'defaults.yml'), 'region1', True),
+        (os.path.join('team', 'defaults.yml'), 'region1', False),
+        (os.path.join('other', 'defaults.yml'), 'region1', False),
+        (os.path.join('src', 'myAccount', 'region2', 'a.yml'), 'region2',
+         True),
+        (os.path.join('team', 'src', 'all_accounts', 'common', 'a.yml'),
+         'region1', True),
+        (os.path.join('team', 'src', 'myAccount', 'region1', 'a.yml'),
+         'region2', False),
+        (os.path.join('team', 'all_accounts', 'common', 'a.yml'), 'region1',
+         False),
+        (os.path.join('all_accounts', 'common', 'a.yml'), 'region1', False)
+    ])
+    def test_file_affects_region_source_paths(self, path, region, expected):
+        type(self.m_conf).policy_source_paths = PropertyMock(
+            return_value=['src', 'team/src/']
+        )
+        assert self.cls._file_affects_region(path, region) is expected
+
+    def test_keys(self, tmp_path, monkeypatch):
+        self._setup_tree(tmp_path, monkeypatch)
+        orig = self.cls._manifest_keys()
+        assert sorted(orig.keys()) == [
+            'custodian_region1.yml', 'custodian_region2.yml',
+            'custodian_region3.yml', 'policies.rst', 'regions.rst'
+        ]
+        # change to a region-specific policy for the current account
+        self._write('policies/myAccount/region2/c.yml', 'changed')
+        res = self.cls._manifest_keys()
+        assert sorted(k for k in res if res[k] != orig[k]) == [
+            'custodian_region2.yml', 'policies.rst'
+        ]
+        # change to a policy for another account
+        orig = res
+        self._write('policies/otherAccount/region1/d.yml', 'changed')
+        res = self.cls._manifest_keys()
+        assert sorted(k for k in res if res[k] != orig[k]) == [
+            'policies.rst'
+        ]
+        # environment variable used for interpolation
+        orig = res
+        monkeypatch.setenv('POLICYGEN_ENV_foo', 'bar')
+        res = self.cls._manifest_keys()
+        assert sorted(k for k in res if res[k] != orig[k]) == [
+            'custodian_region1.yml', 'custodian_region2.yml',
+            'custodian_region3.yml'
+        ]
+        # config file
+        orig = res
+        self._write('conf.yml', 'foo: baz')
+        res = self.cls._manifest_keys()
+        assert sorted(k for k in res if res[k] != orig[k]) == sorted(res)
+
+    def test_stale_outputs(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        keys = {'a.yml': 'ka', 'b.yml': 'kb', 'c.yml': 'kc'}
+        assert self.cls._stale_outputs(keys) == set(keys.keys())
+        for k in keys:
+            self._write(k, k)
+        self.cls._write_manifest(keys)
+        assert self.cls._stale_outputs(keys) == set()
+        # input change, output modified on disk, output removed
+        self._write('b.yml', 'modified')
+        os.unlink('c.yml')
+        keys['a.yml'] = 'changed'
+        assert self.cls._stale_outputs(keys) == set(keys.keys())
+        assert self.cls._stale_outputs({'x.yml': 'kx'}) == set(['x.yml'])
+
 
 class TestLoadDefaults(PolicyGenTester):
 
-    @patch('os.path.exists', return_value=True)
-    def test_top_level(self, mock_exists):
+    def test_top_level(self):
         m = mock_open(read_data="defaults")
         with patch(
             'manheim_c7n_tools.policygen.open', m, create=True
         ) as m_open:
-            self.cls._load_defaults()
-            mock_exists.assert_called_once_with('policies/defaults.yml')
+            with patch(
+                '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+            ) as mock_index:
+                mock_index.return_value = {'.': ['defaults.yml']}
+                self.cls._load_defaults()
             m_open.assert_called_once_with('policies/defaults.yml', 'r')
 
-    @patch('os.path.exists', side_effect=(True, True, False, True))
-    def test_with_source_paths(self, mock_exists):
+    def test_with_source_paths(self):
         type(self.m_conf).policy_source_paths = PropertyMock(
             return_value=['path1', 'path2', 'path3']
         )
@@ -1171,13 +1430,16 @@ class TestLoadDefaults(PolicyGenTester):
         with patch(
             'manheim_c7n_tools.policygen.open', m, create=True
         ) as m_open:
-            d = self.cls._load_defaults()
-            assert mock_exists.mock_calls == [
-                call('policies/defaults.yml'),
-                call('policies/path1/defaults.yml'),
-                call('policies/path2/defaults.yml'),
-                call('policies/path3/defaults.yml')
-            ]
+            with patch(
+                '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+            ) as mock_index:
+                mock_index.return_value = {
+                    '.': ['defaults.yml'],
+                    'path1': ['defaults.yml'],
+                    'path2': ['foo.yml'],
+                    'path3': ['defaults.yml']
+                }
+                d = self.cls._load_defaults()
             assert m_open.mock_calls == [
                 call('policies/defaults.yml', 'r'),
                 call('policies/path1/defaults.yml', 'r'),
@@ -1185,14 +1447,16 @@ class TestLoadDefaults(PolicyGenTester):
             ]
             assert d == 'default2'
 
-    @patch('os.path.exists', return_value=False)
-    def test_does_not_exist(self, mock_exists):
+    def test_does_not_exist(self):
         m = mock_open(read_data="defaults")
         with patch(
             'manheim_c7n_tools.policygen.open', m, create=True
         ) as m_open:
-            res = self.cls._load_defaults()
-            mock_exists.assert_called_once_with('policies/defaults.yml')
+            with patch(
+                '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+            ) as mock_index:
+                mock_index.return_value = {'foo': ['defaults.yml']}
+                res = self.cls._load_defaults()
         assert res is None
         assert m_open.mock_calls == []
 
@@ -1360,6 +1624,34 @@ class TestMergeConfigs(PolicyGenTester):
         assert res['myAccount']['region1']['rule1']['bar'] == \
             'baz-myAccount/region1'
 
+    def test_shares_policies(self):
+        rule1 = {'name': 'rule1'}
+        rule2 = {'name': 'rule2'}
+        rule3 = {'name': 'rule3'}
+        target = {
+            'myAccount': {'region1': {'rule1': rule1, 'rule2': rule2}}
+        }
+        source = {
+            'myAccount': {
+                'region1': {'rule2': {'disable': True}, 'rule3': rule3}
+            },
+            'otherAccount': {'region1': {'rule3': rule3}}
+        }
+        res = self.cls._merge_configs(target, source)
+        assert res == {
+            'myAccount': {'region1': {'rule1': rule1, 'rule3': rule3}},
+            'otherAccount': {'region1': {'rule3': rule3}}
+        }
+        assert res['myAccount']['region1']['rule1'] is rule1
+        assert res['myAccount']['region1']['rule3'] is rule3
+        assert res['otherAccount']['region1']['rule3'] is rule3
+        # containers are copied, so target and source are unchanged
+        assert target == {
+            'myAccount': {'region1': {'rule1': rule1, 'rule2': rule2}}
+        }
+        res['otherAccount']['region1']['foo'] = 'bar'
+        assert source['otherAccount'] == {'region1': {'rule3': rule3}}
+
 
 class TestLoadAllPolicies(PolicyGenTester):
 
@@ -1384,8 +1676,12 @@ class TestLoadAllPolicies(PolicyGenTester):
                     }
                 }
             }
-            self.cls._load_all_policies()
+            with patch(
+                '%s.PolicyGen._preload_policies' % pbm, autospec=True
+            ) as m_preload:
+                self.cls._load_all_policies()
             m_load.assert_called_once_with(self.cls)
+            assert m_preload.mock_calls == [call(self.cls, [''])]
             assert self.cls._policy_sources == {}
 
     def test_source_paths(self):
@@ -1448,7 +1744,13 @@ class TestLoadAllPolicies(PolicyGenTester):
         ) as m_load:
             m_load.side_effect = se_m_load
             assert self.cls._policy_sources == {}
-            self.cls._load_all_policies()
+            with patch(
+                '%s.PolicyGen._preload_policies' % pbm, autospec=True
+            ) as m_preload:
+                self.cls._load_all_policies()
+            assert m_preload.mock_calls == [
+                call(self.cls, ['path1', 'path2', 'path3'])
+            ]
             m_load.assert_has_calls([
                 call(self.cls, path='path1'),
                 call(self.cls, path='path2'),
@@ -1557,6 +1859,42 @@ class TestLoadPolicy(PolicyGenTester):
             call(self.cls, 'foo/otherAccount')
         ]
 
+    def test_shares_policies(self):
+        common = {'name': 'common'}
+        policies = {
+            'all_accounts': {
+                'region1': {'common': common},
+                'region2': {'common': common},
+                'region3': {'common': common}
+            },
+            'myAccount': {
+                'region1': {'foo': {'name': 'foo'}},
+                'region2': {},
+                'region3': {}
+            },
+            'otherAccount': {'region1': {}, 'region2': {}, 'region3': {}}
+        }
+
+        def se_read_pol_dir(_, dirname):
+            return policies[dirname]
+
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _read_policy_directory=DEFAULT,
+        ) as mocks:
+            mocks['_read_policy_directory'].side_effect = se_read_pol_dir
+            res = self.cls._load_policy()
+        assert res['myAccount']['region1'] == {
+            'common': common, 'foo': {'name': 'foo'}
+        }
+        assert res['otherAccount']['region1'] == {'common': common}
+        for acct in ['myAccount', 'otherAccount']:
+            for rname in ['region1', 'region2', 'region3']:
+                assert res[acct][rname]['common'] is common
+        # the all_accounts region dicts are not modified
+        assert policies['all_accounts']['region1'] == {'common': common}
+
 
 class TestReadPolicyDirectory(PolicyGenTester):
 
@@ -1625,7 +1963,9 @@ class TestGenerateConfigs(PolicyGenTester):
             _check_policies=DEFAULT,
             _write_custodian_configs=DEFAULT,
             _handle_notify_only_policy=DEFAULT
-        ) as mocks:
+        ) as mocks, patch('%s.policy_sort_key' % pbm) as m_key:
+            # keep the order policies were generated in
+            m_key.return_value = 0
             mocks['_apply_defaults'].side_effect = se_apply_defaults
             mocks['_generate_cleanup_policies'].return_value = [
                 'cleanup1', 'cleanup2'
@@ -1704,7 +2044,9 @@ class TestGenerateConfigs(PolicyGenTester):
             _check_policies=DEFAULT,
             _write_custodian_configs=DEFAULT,
             _handle_notify_only_policy=DEFAULT
-        ) as mocks:
+        ) as mocks, patch('%s.policy_sort_key' % pbm) as m_key:
+            # keep the order policies were generated in
+            m_key.return_value = 0
             mocks['_apply_defaults'].side_effect = se_apply_defaults
             mocks['_generate_cleanup_policies'].return_value = []
             mocks['_handle_notify_only_policy'].side_effect = se_notify_only
@@ -1743,6 +2085,188 @@ class TestGenerateConfigs(PolicyGenTester):
             )
         ]
 
+    def test_does_not_modify_policies(self):
+        type(self.m_conf).cleanup_notify = PropertyMock(return_value=[])
+        policy = {
+            'name': 'foo',
+            'resource': 'ec2',
+            'actions': [{'type': 'notify', 'subject': 'foo'}]
+        }
+        defaults = {
+            'mode': {'type': 'periodic', 'schedule': 'rate(1 day)'},
+            'actions': [{'type': 'notify', 'to': ['me@example.com']}]
+        }
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _check_policies=DEFAULT,
+            _write_custodian_configs=DEFAULT
+        ):
+            res1 = self.cls._generate_configs({'foo': policy}, defaults, 'r1')
+            res2 = self.cls._generate_configs({'foo': policy}, defaults, 'r2')
+        assert policy == {
+            'name': 'foo',
+            'resource': 'ec2',
+            'actions': [{'type': 'notify', 'subject': 'foo'}]
+        }
+        assert res1['policies'][0]['actions'] == [
+            {'type': 'notify', 'subject': 'foo', 'to': ['me@example.com']}
+        ]
+        # the processed policy is cached and reused for the second region
+        assert res1['policies'][0] is res2['policies'][0]
+
+    def test_sorted(self):
+        type(self.m_conf).cleanup_notify = PropertyMock(return_value=[])
+        policies = {
+            'a': {'name': 'a', 'resource': 'ec2', 'filters': [{'z': 1}]},
+            'b': {'name': 'b', 'resource': 'ebs'},
+            'c': {'name': 'c', 'resource': 'aws.ec2', 'filters': [{'y': 1}]},
+            'd': {'name': 'd', 'resource': 'ec2', 'filters': [{'z': 1}]},
+            'e': {'name': 'e', 'resource': 'ami'}
+        }
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _check_policies=DEFAULT,
+            _write_custodian_configs=DEFAULT
+        ):
+            res = self.cls._generate_configs(
+                policies, {'mode': {'type': 'pull'}}, 'r1'
+            )
+        assert [p['name'] for p in res['policies']] == [
+            'e', 'b', 'c', 'a', 'd'
+        ]
+
+
+class TestGenerateRegionConfigs(PolicyGenTester):
+
+    def test_serial(self):
+        region_policies = {'r1': {'p1': {}}, 'r2': {'p2': {}}, 'r3': {}}
+        self.cls._workers = 4
+        with patch(
+            '%s.PolicyGen._generate_configs' % pbm, autospec=True
+        ) as m_gen:
+            with patch('%s.ProcessPoolExecutor' % pbm) as m_pool:
+                self.cls._generate_region_configs(
+                    region_policies, {'d': 1}, ['r2']
+                )
+        assert m_gen.mock_calls == [call(self.cls, {'p2': {}}, {'d': 1}, 'r2')]
+        assert m_pool.mock_calls == []
+
+    def test_pool_identical(self, tmp_path, monkeypatch):
+        regions = ['us-east-1', 'us-east-2', 'us-west-2']
+        conf = real_config(
+            regions=regions, cleanup_notify=['me@example.com']
+        )
+        defaults = {
+            'mode': {'type': 'periodic', 'role': '%%ROLE_ARN%%'},
+            'actions': [{'type': 'notify', 'to': ['foo']}]
+        }
+        region_policies = {
+            r: {
+                'p1': {'name': 'p1', 'resource': 'ec2', 'comment': r},
+                'p2': {
+                    'name': 'p2', 'resource': 'asg',
+                    'filters': [{'tag:foo': 'absent'}]
+                }
+            } for r in regions
+        }
+        for d, workers in [('serial', 1), ('pool', 2)]:
+            (tmp_path / d).mkdir()
+            monkeypatch.chdir(tmp_path / d)
+            with patch('%s.logger' % pbm, autospec=True):
+                policygen.PolicyGen(
+                    conf, workers=workers
+                )._generate_region_configs(region_policies, defaults, regions)
+        for r in regions:
+            fname = 'custodian_%s.yml' % r
+            serial = (tmp_path / 'serial' / fname).read_bytes()
+            assert (tmp_path / 'pool' / fname).read_bytes() == serial
+            assert ('comment: %s' % r).encode() in serial
+
+    def test_pool_failure(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        regions = ['us-east-1', 'us-east-2']
+        region_policies = {
+            r: {
+                'p1': {
+                    'name': 'p1', 'resource': 'ec2',
+                    'mode': {'type': 'periodic', 'function-prefix': 'foo-'}
+                }
+            } for r in regions
+        }
+        cls = policygen.PolicyGen(real_config(regions=regions), workers=2)
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with pytest.raises(SystemExit):
+                cls._generate_region_configs(region_policies, {}, regions)
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Generating configs for %d regions in %d worker processes',
+                2, 2
+            )
+        ]
+
+
+class TestProcessPolicy(PolicyGenTester):
+
+    def test_cached(self):
+        def se_apply_defaults(klass, defaults, policy):
+            policy['defaults'] = defaults
+            return policy
+
+        def se_notify_only(klass, policy):
+            policy['notify_only'] = False
+            return policy
+
+        pol1 = {'name': 'foo'}
+        pol2 = {'name': 'bar'}
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _apply_defaults=DEFAULT,
+            _handle_notify_only_policy=DEFAULT
+        ) as mocks:
+            mocks['_apply_defaults'].side_effect = se_apply_defaults
+            mocks['_handle_notify_only_policy'].side_effect = se_notify_only
+            res1 = self.cls._process_policy('d', 'dfp', pol1)
+            res2 = self.cls._process_policy('d', 'dfp', pol2)
+            res3 = self.cls._process_policy('d', 'dfp', {'name': 'foo'})
+            res4 = self.cls._process_policy('d2', 'd2fp', pol1)
+        assert pol1 == {'name': 'foo'}
+        assert res1 == {'name': 'foo', 'defaults': 'd', 'notify_only': False}
+        assert res2 == {'name': 'bar', 'defaults': 'd', 'notify_only': False}
+        assert res3 is res1
+        assert res4 == {'name': 'foo', 'defaults': 'd2', 'notify_only': False}
+        assert mocks['_apply_defaults'].mock_calls == [
+            call(self.cls, 'd', res1),
+            call(self.cls, 'd', res2),
+            call(self.cls, 'd2', res4)
+        ]
+        assert len(mocks['_handle_notify_only_policy'].mock_calls) == 3
+
+    def test_not_serializable(self):
+        pol = {'name': 'foo', 1: 'bar', 'baz': 'blam'}
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _apply_defaults=DEFAULT,
+            _handle_notify_only_policy=DEFAULT
+        ) as mocks:
+            mocks['_apply_defaults'].side_effect = lambda _, d, p: p
+            mocks['_handle_notify_only_policy'].side_effect = lambda _, p: p
+            res1 = self.cls._process_policy('d', 'dfp', pol)
+            res2 = self.cls._process_policy('d', 'dfp', pol)
+        assert res1 == pol
+        assert res2 == pol
+        assert res1 is not res2
+        assert self.cls._processed == {}
+
+    def test_fingerprint(self):
+        fp = self.cls._fingerprint({'b': [1, 2], 'a': {'c': 'd'}})
+        assert fp == self.cls._fingerprint({'a': {'c': 'd'}, 'b': [1, 2]})
+        assert fp != self.cls._fingerprint({'a': {'c': 'd'}, 'b': [2, 1]})
+        assert self.cls._fingerprint({1: 'a', 'b': 'c'}) is None
+
 
 class TestWriteCustodianConfigs(PolicyGenTester):
 
@@ -1780,7 +2304,9 @@ class TestWriteCustodianConfigs(PolicyGenTester):
                     '%%ACCOUNT_NAME%%x%%ACCOUNT_ID%%xx' \
                     '%%POLICYGEN_ENV_foo%%x'
                 self.cls._write_custodian_configs(original, 'region1')
-        assert mock_dump.mock_calls == [call(original)]
+        assert mock_dump.mock_calls == [
+            call(original, Dumper=policygen.SafeDumper)
+        ]
         assert mock_wf.mock_calls == [
             call(
                 self.cls,
@@ -1856,7 +2382,9 @@ class TestWriteCustodianConfigs(PolicyGenTester):
                     '%%ACCOUNT_NAME%%x%%ACCOUNT_ID%%xx' \
                     '%%POLICYGEN_ENV_foo%%x'
                 self.cls._write_custodian_configs(original, 'region1')
-        assert mock_dump.mock_calls == [call(expected)]
+        assert mock_dump.mock_calls == [
+            call(expected, Dumper=policygen.SafeDumper)
+        ]
         assert mock_wf.mock_calls == [
             call(
                 self.cls,
@@ -1866,13 +2394,88 @@ class TestWriteCustodianConfigs(PolicyGenTester):
             )
         ]
 
+    @patch.dict('os.environ', {'POLICYGEN_ENV_foo': 'EVAR'}, clear=True)
+    def test_write_unresolved(self):
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen._write_file', autospec=True
+        ) as mock_wf:
+            with patch(
+                'manheim_c7n_tools.policygen.yaml.dump', autospec=True
+            ) as mock_dump:
+                with patch(
+                    'manheim_c7n_tools.policygen.logger', autospec=True
+                ) as mock_logger:
+                    mock_dump.return_value = \
+                        'a%%POLICYGEN_ENV_bar%%b%%POLICYGEN_ENV_foo%%c' \
+                        '%%AWS_REGION%%d%%FOO%%'
+                    self.cls._write_custodian_configs(
+                        {'policies': []}, 'region1'
+                    )
+        assert mock_wf.mock_calls == [
+            call(
+                self.cls,
+                'custodian_region1.yml',
+                'a%%POLICYGEN_ENV_bar%%bEVARcregion1d%%FOO%%'
+            )
+        ]
+        assert call.warning(
+            'Unresolved macros in %s: %s', 'custodian_region1.yml',
+            'FOO, POLICYGEN_ENV_bar'
+        ) in mock_logger.mock_calls
+
+    @patch.dict(
+        'os.environ', {'POLICYGEN_ENV_foo': 'E"VAR'}, clear=True
+    )
+    def test_write_json(self):
+        self.cls._output_format = 'json'
+        original = {"policies": [
+            {
+                'name': 'p1',
+                'foo': 'bar%%AWS_REGION%%baz',
+                'bar': ['%%BUCKET_NAME%%', 'x%%POLICYGEN_ENV_foo%%x', 1],
+                '%%AWS_REGION%%': {'baz': '%%UNKNOWN%%'}
+            },
+            {'name': 'p2', 'disable': True}
+        ]}
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen._write_file', autospec=True
+        ) as mock_wf:
+            with patch(
+                'manheim_c7n_tools.policygen.logger', autospec=True
+            ) as mock_logger:
+                self.cls._write_custodian_configs(original, 'region1')
+        assert mock_wf.mock_calls[0][1][1] == 'custodian_region1.json'
+        assert json.loads(mock_wf.mock_calls[0][1][2]) == {'policies': [{
+            'name': 'p1',
+            'foo': 'barregion1baz',
+            'bar': ['BktName', 'xE"VARx', 1],
+            'region1': {'baz': '%%UNKNOWN%%'}
+        }]}
+        # policies are not modified
+        assert original['policies'][0]['foo'] == 'bar%%AWS_REGION%%baz'
+        assert call.warning(
+            'Unresolved macros in %s: %s', 'custodian_region1.json', 'UNKNOWN'
+        ) in mock_logger.mock_calls
+
+
+class TestCustodianConfigName(object):
+
+    def test_name(self):
+        assert policygen.custodian_config_name('r1') == 'custodian_r1.yml'
+        assert policygen.custodian_config_name(
+            'r1', 'yaml'
+        ) == 'custodian_r1.yml'
+        assert policygen.custodian_config_name(
+            'r1', 'json'
+        ) == 'custodian_r1.json'
+
 
 class TestCheckPolicies(PolicyGenTester):
 
     def test_success(self):
         policies = [
-            {'name': 'foo', 'foo': 'bar'},
-            {'name': 'baz', 'baz': 'blam'}
+            {'name': 'foo', 'filters': ['foo']},
+            {'name': 'baz', 'filters': ['baz']}
         ]
         with patch.multiple(
             'manheim_c7n_tools.policygen.PolicyGen',
@@ -1883,22 +2486,28 @@ class TestCheckPolicies(PolicyGenTester):
             with patch(
                 'manheim_c7n_tools.policygen.logger', autospec=True
             ) as mock_logger:
-                self.cls._check_policies(policies)
+                res = self.cls._check_policies(policies)
         assert mocks['_check_policy_marked_for_op_first'].mock_calls == [
-            call(self.cls, policies[0]),
-            call(self.cls, policies[1])
+            call(self.cls, {'filters': ['foo']}),
+            call(self.cls, {'filters': ['baz']})
         ]
-        assert mock_logger.mock_calls == [
-            call.info('OK: All policies passed sanity/safety checks.')
+        assert sorted(res.keys()) == [
+            '_check_policy_function_prefix',
+            '_check_policy_mark_but_no_tag_filter',
+            '_check_policy_mark_for_op_bad_message',
+            '_check_policy_marked_for_op_first'
         ]
+        assert mock_logger.mock_calls[-1] == call.info(
+            'OK: All policies passed sanity/safety checks.'
+        )
 
     def test_failure(self):
         def se_strip_doc(func):
             return func.name
 
         policies = [
-            {'name': 'foo', 'foo': 'bar'},
-            {'name': 'baz', 'baz': 'blam'}
+            {'name': 'foo', 'filters': ['foo']},
+            {'name': 'baz', 'filters': ['baz']}
         ]
         with patch.multiple(
             'manheim_c7n_tools.policygen.PolicyGen',
@@ -1919,10 +2528,12 @@ class TestCheckPolicies(PolicyGenTester):
                         self.cls._check_policies(policies)
                 assert ex.value.args[0] == 1
         assert mocks['_check_policy_marked_for_op_first'].mock_calls == [
-            call(self.cls, policies[0]),
-            call(self.cls, policies[1])
+            call(self.cls, {'filters': ['foo']}),
+            call(self.cls, {'filters': ['baz']})
         ]
-        assert mock_logger.mock_calls == [
+        assert [
+            c for c in mock_logger.mock_calls if c[0] == 'error'
+        ] == [
             call.error('ERROR: Some policies failed sanity/safety checks:'),
             call.error('baz'),
             call.error('\t_check_policy_marked_for_op_first'),
@@ -1930,6 +2541,240 @@ class TestCheckPolicies(PolicyGenTester):
             call.error('\t_check_policy_marked_for_op_first')
         ]
 
+    def test_cached(self):
+        policies = [
+            {'name': 'foo', 'filters': ['foo']},
+            {'name': 'baz', 'filters': ['baz']}
+        ]
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _check_policy_marked_for_op_first=DEFAULT
+        ) as mocks:
+            mocks['_check_policy_marked_for_op_first'].return_value = True
+            self.cls._check_policies(policies)
+            # same first object, equal second object, and a third object with
+            # the same filters as the first
+            res = self.cls._check_policies([
+                policies[0],
+                {'name': 'baz', 'filters': ['baz']},
+                {'name': 'blam', 'filters': ['foo'], 'actions': ['stop']}
+            ])
+        assert mocks['_check_policy_marked_for_op_first'].mock_calls == [
+            call(self.cls, {'filters': ['foo']}),
+            call(self.cls, {'filters': ['baz']})
+        ]
+        assert sorted(res.keys()) == [
+            '_check_policy_mark_but_no_tag_filter',
+            '_check_policy_mark_for_op_bad_message'
+        ]
+
+    def test_cached_failure(self):
+        policies = [
+            {'name': 'foo', 'filters': ['foo']},
+            {'name': 'baz', 'filters': ['foo']}
+        ]
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _check_policy_marked_for_op_first=DEFAULT
+        ) as mocks:
+            mocks['_check_policy_marked_for_op_first'].return_value = False
+            with patch('%s.strip_doc' % pbm, autospec=True):
+                with pytest.raises(SystemExit):
+                    self.cls._check_policies(policies[:1])
+                with patch(
+                    'manheim_c7n_tools.policygen.logger', autospec=True
+                ) as mock_logger:
+                    with pytest.raises(SystemExit):
+                        self.cls._check_policies(policies)
+        assert len(
+            mocks['_check_policy_marked_for_op_first'].mock_calls
+        ) == 1
+        assert call.error('baz') in mock_logger.mock_calls
+        assert call.error('foo') in mock_logger.mock_calls
+
+    def test_not_fingerprintable(self):
+        policies = [
+            {'name': 'foo', 'filters': [{('foo',): 'bar'}]},
+        ]
+        with patch.multiple(
+            'manheim_c7n_tools.policygen.PolicyGen',
+            autospec=True,
+            _check_policy_marked_for_op_first=DEFAULT
+        ) as mocks:
+            mocks['_check_policy_marked_for_op_first'].return_value = True
+            self.cls._check_policies(policies)
+            self.cls._check_policies(policies)
+        assert mocks['_check_policy_marked_for_op_first'].mock_calls == [
+            call(self.cls, {'filters': [{('foo',): 'bar'}]}),
+            call(self.cls, {'filters': [{('foo',): 'bar'}]})
+        ]
+
+    def test_pool(self):
+        cls = policygen.PolicyGen(real_config(), workers=2)
+        policies = [
+            {'name': 'p%d' % i, 'filters': [{'tag:p%d' % i: 'absent'}]}
+            for i in range(10)
+        ]
+        policies[3]['filters'].append({'type': 'marked-for-op'})
+        with patch('%s.CHECK_POOL_THRESHOLD' % pbm, 5):
+            with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                with pytest.raises(SystemExit):
+                    cls._check_policies(policies)
+        # one each for mode and actions, as those are the same for all policies
+        assert call.info(
+            'Running %d policy checks in %d worker processes', 22, ANY
+        ) in mock_logger.mock_calls
+        assert call.error('p3') in mock_logger.mock_calls
+        assert call.error('p4') not in mock_logger.mock_calls
+        assert len(cls._check_results) == 22
+
+
+class TestPolicyChecks(object):
+
+    def test_registry(self):
+        assert policygen.PolicyGen._policy_checks() == [
+            ('_check_policy_function_prefix', ('mode',)),
+            ('_check_policy_mark_but_no_tag_filter', ('filters', 'actions')),
+            ('_check_policy_mark_for_op_bad_message', ('actions',)),
+            ('_check_policy_marked_for_op_first', ('filters',))
+        ]
+
+    def test_subclass(self):
+
+        class MyPolicyGen(policygen.PolicyGen):
+
+            @policygen.policy_check('resource')
+            def _check_policy_foo(self, policy):
+                """foo"""
+                return True
+
+        assert (
+            '_check_policy_foo', ('resource',)
+        ) in MyPolicyGen._policy_checks()
+        assert len(MyPolicyGen._policy_checks()) == 5
+        assert len(policygen.PolicyGen._policy_checks()) == 4
+
+
+class TestHasType(object):
+
+    def test_has_type(self):
+        assert policygen.has_type(
+            [{'or': [{'not': [{'type': 'marked-for-op'}]}]}], 'marked-for-op'
+        ) is True
+        assert policygen.has_type(
+            [{'type': 'value', 'value': 'marked-for-op'}, 'marked-for-op'],
+            'marked-for-op'
+        ) is False
+
+
+class TestDescribeCalls(object):
+
+    def test_resource_cache_key(self):
+        assert policygen.resource_cache_key(
+            {'resource': 'aws.ec2', 'query': [{'filters': [{'Name': 'x'}]}]}
+        ) == ('ec2', '[{"filters": [{"Name": "x"}]}]')
+        assert policygen.resource_cache_key({'resource': 'ec2'}) == (
+            'ec2', '[]'
+        )
+
+    def test_describe_calls(self):
+        policies = [
+            {'name': 'a', 'resource': 'ec2'},
+            {'name': 'b', 'resource': 'ebs', 'mode': {'type': 'periodic'}},
+            {'name': 'c', 'resource': 'aws.ec2', 'mode': {'type': 'pull'}},
+            {'name': 'd', 'resource': 'ec2', 'query': [{'a': 'b'}]},
+            {'name': 'e', 'resource': 'ec2', 'mode': None}
+        ]
+        assert policygen.describe_calls(policies) == 3
+        assert policygen.describe_calls(policies, pull_only=False) == 5
+        assert policygen.describe_calls(
+            sorted(policies, key=policygen.policy_sort_key)
+        ) == 2
+
+
+class TestPolicyFingerprint(object):
+
+    def test_fingerprint(self):
+        assert policygen.policy_fingerprint({'a': 1, 'b': [1, 2]}) == \
+            policygen.policy_fingerprint({'b': [1, 2], 'a': 1})
+        assert policygen.policy_fingerprint({'a': 1}) != \
+            policygen.policy_fingerprint({'a': 2})
+        assert len(policygen.policy_fingerprint({'name': 'p1'})) == 64
+
+
+class TestShareSubtrees(object):
+
+    def test_share(self):
+        notify = {
+            'type': 'notify',
+            'to': ['someone@example.com'],
+            'transport': {'type': 'sqs', 'queue': 'https://sqs/q'}
+        }
+        small = {'type': 'mark'}
+        data = {'policies': [
+            {'name': 'p1', 'actions': [deepcopy(notify), small]},
+            {'name': 'p2', 'actions': [deepcopy(notify), small]},
+            {'name': 'p3', 'actions': [{'type': 'notify'}]}
+        ]}
+        orig = deepcopy(data)
+        res = policygen.share_subtrees(data, min_size=20)
+        assert res == orig
+        assert data == orig
+        p1, p2, p3 = res['policies']
+        assert p1['actions'] is p2['actions']
+        assert p1['actions'][0] is not data['policies'][0]['actions'][0]
+        assert p3['actions'] == [{'type': 'notify'}]
+        out = yaml.dump(res, Dumper=policygen.SafeDumper)
+        assert out.count('&id') == 1
+        assert out.count('*id') == 1
+        assert yaml.safe_load(out) == orig
+
+    def test_small_not_shared(self):
+        small = {'type': 'mark'}
+        res = policygen.share_subtrees([small, small], min_size=20)
+        assert res == [small, small]
+        # shared in the input, but too small to share in the output
+        assert res[0] is not res[1]
+
+    def test_mode_not_shared(self):
+        mode = {
+            'type': 'periodic',
+            'execution-options': {'output_dir': 's3://bucket/logs/path'},
+            'role': 'arn:aws:iam::123456789012:role/custodian'
+        }
+        data = {'policies': [
+            {'name': 'p1', 'mode': deepcopy(mode)},
+            {'name': 'p2', 'mode': deepcopy(mode)},
+            {'name': 'p3', 'execution-options': deepcopy(
+                mode['execution-options']
+            )},
+            {'name': 'p4', 'execution-options': deepcopy(
+                mode['execution-options']
+            )}
+        ]}
+        res = policygen.share_subtrees(data, min_size=20)
+        assert res == data
+        p1, p2, p3, p4 = res['policies']
+        assert p1['mode'] is not p2['mode']
+        assert p1['mode']['execution-options'] is not \
+            p2['mode']['execution-options']
+        assert p1['mode']['execution-options'] is not p3['execution-options']
+        # identical content outside of mode is still shared
+        assert p3['execution-options'] is p4['execution-options']
+        out = yaml.dump(res, Dumper=policygen.SafeDumper)
+        assert out.count('&id') == 1
+        assert yaml.safe_load(out) == data
+
+    def test_scalar_types(self):
+        res = policygen.share_subtrees(
+            [[True], [1], [1.0], ['1'], [1]], min_size=0
+        )
+        assert res == [[True], [1], [1.0], ['1'], [1]]
+        assert len(set(id(x) for x in res)) == 4
+        assert res[1] is res[4]
+
 
 class TestCheckPolicyFunctionPrefix(PolicyGenTester):
 
@@ -2392,32 +3237,11 @@ class TestGenerateCleanupPolicies(PolicyGenTester):
                 {
                     'type': 'value',
                     'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-cwe'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'foo'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'bar'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'baz'
+                    'op': 'not-in',
+                    'value': [
+                        'bar', 'baz', 'c7n-cleanup-cwe', 'c7n-cleanup-lambda',
+                        'foo'
+                    ]
                 }
             ]
         }
@@ -2444,39 +3268,20 @@ class TestGenerateCleanupPolicies(PolicyGenTester):
                 {
                     'type': 'value',
                     'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-cwe'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-foo'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-bar'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-baz'
+                    'op': 'not-in',
+                    'value': [
+                        'custodian-bar', 'custodian-baz',
+                        'custodian-c7n-cleanup-cwe',
+                        'custodian-c7n-cleanup-lambda', 'custodian-foo'
+                    ]
                 }
             ]
         }
         policies = [
             {'mode': {'type': 'periodic'}, 'name': 'foo'},
             {'name': 'bar'},
-            {'mode': {'type': 'periodic'}, 'name': 'baz'}
+            {'mode': {'type': 'periodic'}, 'name': 'baz'},
+            {'name': 'foo'}
         ]
         assert self.cls._generate_cleanup_policies(policies) == [
             lcleanup, cwecleanup
@@ -2502,32 +3307,11 @@ class TestGenerateCleanupPolicies(PolicyGenTester):
                 {
                     'type': 'value',
                     'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'c7n-cleanup-cwe'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'foo'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'bar'
-                },
-                {
-                    'type': 'value',
-                    'key': 'tag:Component',
-                    'op': 'ne',
-                    'value': 'baz'
+                    'op': 'not-in',
+                    'value': [
+                        'bar', 'baz', 'c7n-cleanup-cwe', 'c7n-cleanup-lambda',
+                        'foo'
+                    ]
                 }
             ]
         }
@@ -2554,32 +3338,12 @@ class TestGenerateCleanupPolicies(PolicyGenTester):
                 {
                     'type': 'value',
                     'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-lambda'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-c7n-cleanup-cwe'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-foo'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-bar'
-                },
-                {
-                    'type': 'value',
-                    'key': 'Name',
-                    'op': 'ne',
-                    'value': 'custodian-baz'
+                    'op': 'not-in',
+                    'value': [
+                        'custodian-bar', 'custodian-baz',
+                        'custodian-c7n-cleanup-cwe',
+                        'custodian-c7n-cleanup-lambda', 'custodian-foo'
+                    ]
                 }
             ]
         }
@@ -2598,7 +3362,7 @@ class TestGenerateCleanupPolicies(PolicyGenTester):
 class TestHandleNotifyOnlyPolicy(PolicyGenTester):
 
     def test_not_set(self):
-        with patch(f'{pbm}.NotifyOnlyPolicy') as mock_nop:
+        with patch('manheim_c7n_tools.notifyonly.NotifyOnlyPolicy') as mock_nop:
             mock_nop.return_value.as_notify_only.return_value = {
                 'notify': 'only'
             }
@@ -2607,7 +3371,7 @@ class TestHandleNotifyOnlyPolicy(PolicyGenTester):
         assert mock_nop.mock_calls == []
 
     def test_false(self):
-        with patch(f'{pbm}.NotifyOnlyPolicy') as mock_nop:
+        with patch('manheim_c7n_tools.notifyonly.NotifyOnlyPolicy') as mock_nop:
             mock_nop.return_value.as_notify_only.return_value = {
                 'notify': 'only'
             }
@@ -2623,7 +3387,7 @@ class TestHandleNotifyOnlyPolicy(PolicyGenTester):
             'my': 'policy',
             'notify_only': True
         }
-        with patch(f'{pbm}.NotifyOnlyPolicy') as mock_nop:
+        with patch('manheim_c7n_tools.notifyonly.NotifyOnlyPolicy') as mock_nop:
             mock_nop.return_value.as_notify_only.return_value = {
                 'notify': 'only'
             }
@@ -3080,17 +3844,16 @@ class TestReadPolicies(PolicyGenTester):
             return {'file': fpath, 'name': name}
 
         with patch(
-            'manheim_c7n_tools.policygen.os.listdir', autospec=True
-        ) as mock_list:
+            '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+        ) as mock_index:
             with patch(
                 'manheim_c7n_tools.policygen.PolicyGen._read_file_yaml',
                 autospec=True
             ) as mock_read:
-                mock_list.return_value = [
-                    'foo.yml',
-                    'bar.yml',
-                    'README.md'
-                ]
+                mock_index.return_value = {
+                    'rname': ['bar.yml', 'foo.yml'],
+                    'other': ['baz.yml']
+                }
                 mock_read.side_effect = se_read
                 res = self.cls._read_policies('rname')
         assert res == {
@@ -3107,17 +3870,13 @@ class TestReadPolicies(PolicyGenTester):
             return {'file': fpath, 'name': name}
 
         with patch(
-            'manheim_c7n_tools.policygen.os.listdir', autospec=True
-        ) as mock_list:
+            '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+        ) as mock_index:
             with patch(
                 'manheim_c7n_tools.policygen.PolicyGen._read_file_yaml',
                 autospec=True
             ) as mock_read:
-                mock_list.return_value = [
-                    'foo.yml',
-                    'bar.yml',
-                    'README.md'
-                ]
+                mock_index.return_value = {'rname': ['bar.yml', 'foo.yml']}
                 mock_read.side_effect = se_read
                 with pytest.raises(RuntimeError) as ex:
                     self.cls._read_policies('rname')
@@ -3125,26 +3884,174 @@ class TestReadPolicies(PolicyGenTester):
             'policy with name "wrongName".'
 
     def test_no_such_directory(self):
-
-        def se_listdir(dirname):
-            raise OSError(
-                "[Errno 2] No such file or directory: '%s'" % dirname
-            )
-
         with patch(
-            'manheim_c7n_tools.policygen.os.listdir', autospec=True
-        ) as mock_list:
+            '%s.PolicyGen._policy_file_index' % pbm, autospec=True
+        ) as mock_index:
             with patch(
                     'manheim_c7n_tools.policygen.PolicyGen._read_file_yaml',
                     autospec=True
             ) as mock_read:
-                mock_list.side_effect = se_listdir
+                mock_index.return_value = {'rname': ['bar.yml', 'foo.yml']}
                 res = self.cls._read_policies('foo')
         assert res == {}
-        assert mock_list.mock_calls == [call('policies/foo')]
         assert mock_read.mock_calls == []
 
 
+class TestPreloadPolicies(PolicyGenTester):
+
+    def _write_policies(self, tmp_path, names):
+        for path, name in names.items():
+            fpath = tmp_path / 'policies' / path
+            fpath.parent.mkdir(parents=True, exist_ok=True)
+            fpath.write_text('name: %s\nresource: ec2\n' % name)
+
+    def test_preload(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        self._write_policies(tmp_path, {
+            'all_accounts/common/foo.yml': 'foo',
+            'myAccount/region2/bar.yml': 'bar',
+            'otherAccount/region4/baz.yml': 'baz',
+            'src/myAccount/common/blam.yml': 'blam'
+        })
+        self.cls._preload_policies([''])
+        assert self.cls._parsed == {
+            'policies/all_accounts/common/foo.yml': {
+                'name': 'foo', 'resource': 'ec2'
+            },
+            'policies/myAccount/region2/bar.yml': {
+                'name': 'bar', 'resource': 'ec2'
+            }
+        }
+        with patch('%s.open' % pbm, create=True) as m_open:
+            assert self.cls._read_policies('myAccount/region2') == {
+                'bar': {'name': 'bar', 'resource': 'ec2'}
+            }
+        assert m_open.mock_calls == []
+
+    def test_preload_cached(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        self._write_policies(tmp_path, {
+            'src/all_accounts/common/foo.yml': 'foo',
+            'src/otherAccount/region3/bar.yml': 'bar'
+        })
+        self.cls._yaml_cache = Mock(spec_set=YamlCache)
+        self.cls._yaml_cache.get_many.return_value = {
+            'policies/src/all_accounts/common/foo.yml': {'name': 'foo'},
+            'policies/src/otherAccount/region3/bar.yml': {'name': 'bar'}
+        }
+        self.cls._preload_policies(['src'])
+        assert self.cls._yaml_cache.mock_calls == [
+            call.get_many([
+                'policies/src/all_accounts/common/foo.yml',
+                'policies/src/otherAccount/region3/bar.yml'
+            ], self.cls._parse_files)
+        ]
+        assert self.cls._parsed == {
+            'policies/src/all_accounts/common/foo.yml': {'name': 'foo'},
+            'policies/src/otherAccount/region3/bar.yml': {'name': 'bar'}
+        }
+
+    def test_bad_names(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        self._write_policies(tmp_path, {
+            'all_accounts/common/foo.yml': 'foo',
+            'all_accounts/common/defaults.yml': 'whatever',
+            'myAccount/region1/bar.yml': 'wrongName',
+            'otherAccount/common/baz.yml': 'alsoWrong'
+        })
+        with pytest.raises(RuntimeError) as ex:
+            self.cls._preload_policies([''])
+        assert str(ex.value) == 'ERROR: Policy file ' \
+            'policies/myAccount/region1/bar.yml contains policy with name ' \
+            '"wrongName".\nERROR: Policy file ' \
+            'policies/otherAccount/common/baz.yml contains policy with name ' \
+            '"alsoWrong".'
+        assert self.cls._parsed == {}
+
+
+class TestParseFiles(PolicyGenTester):
+
+    def test_serial(self):
+        self.cls._workers = 4
+        with patch('%s.ProcessPoolExecutor' % pbm) as m_pool:
+            res = self.cls._parse_files([('a.yml', 'a: 1'), ('b.yml', '- b')])
+        assert res == [{'a': 1}, ['b']]
+        assert m_pool.mock_calls == []
+
+    def test_pool(self):
+        self.cls._workers = 2
+        items = [('p%d.yml' % i, 'name: p%d' % i) for i in range(10)]
+        with patch('%s.PARSE_POOL_THRESHOLD' % pbm, 5):
+            with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                res = self.cls._parse_files(items)
+        assert res == [{'name': 'p%d' % i} for i in range(10)]
+        assert mock_logger.mock_calls == [
+            call.info('Parsing %d policy files in %d worker processes', 10, 2)
+        ]
+
+
+class TestPolicyFileIndex(PolicyGenTester):
+
+    def test_index(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for d in [
+            'policies/all_accounts/common',
+            'policies/src/acct1/us-east-1',
+            'policies/src/acct2'
+        ]:
+            (tmp_path / d).mkdir(parents=True)
+        for f in [
+            'policies/defaults.yml',
+            'policies/README.md',
+            'policies/all_accounts/common/foo.yml',
+            'policies/all_accounts/common/bar.yml',
+            'policies/src/defaults.yml',
+            'policies/src/acct1/us-east-1/baz.yml',
+            'policies/src/acct2/notes.txt'
+        ]:
+            (tmp_path / f).write_text('foo')
+        with patch(
+            '%s.os.scandir' % pbm, wraps=os.scandir
+        ) as mock_scandir:
+            res = self.cls._policy_file_index()
+            assert self.cls._policy_file_index() is res
+            assert self.cls._policy_files('src/acct1/us-east-1') == [
+                'baz.yml'
+            ]
+            assert self.cls._policy_files('all_accounts/us-east-1') == []
+        assert res == {
+            '.': ['defaults.yml'],
+            'all_accounts/common': ['bar.yml', 'foo.yml'],
+            'src': ['defaults.yml'],
+            'src/acct1/us-east-1': ['baz.yml']
+        }
+        # one call per directory
+        assert len(mock_scandir.mock_calls) == 7
+
+    def test_symlinks(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'shared' / 'common').mkdir(parents=True)
+        (tmp_path / 'shared' / 'common' / 'foo.yml').write_text('foo')
+        (tmp_path / 'policies' / 'src').mkdir(parents=True)
+        (tmp_path / 'policies' / 'src' / 'defaults.yml').write_text('foo')
+        (tmp_path / 'policies' / 'src' / 'acct1').symlink_to(
+            tmp_path / 'shared', target_is_directory=True
+        )
+        # symlink loop
+        (tmp_path / 'policies' / 'src' / 'loop').symlink_to(
+            tmp_path / 'policies', target_is_directory=True
+        )
+        assert self.cls._policy_file_index() == {
+            'src': ['defaults.yml'],
+            'src/acct1/common': ['foo.yml']
+        }
+
+    def test_no_policies(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        assert self.cls._policy_file_index() == {}
+        assert self.cls._policy_files('') == []
+
+
 class TestReadFileYaml(PolicyGenTester):
 
     def test_read(self):
@@ -3175,6 +4082,26 @@ class TestReadFileYaml(PolicyGenTester):
             call().__exit__(None, None, None)
         ]
 
+    def test_read_cached(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'bar.yml').write_text('- foo\n- bar\n')
+        cls = policygen.PolicyGen(self.m_conf, yaml_cache=True)
+        assert cls._read_file_yaml('bar.yml') == ['foo', 'bar']
+        cls._yaml_cache.save()
+        cls = policygen.PolicyGen(self.m_conf, yaml_cache=True)
+        with patch(
+            '%s.yaml.load' % pbm, autospec=True
+        ) as mock_load:
+            assert cls._read_file_yaml('bar.yml') == ['foo', 'bar']
+        assert mock_load.mock_calls == []
+        assert cls._yaml_cache.hits == 1
+
+    def test_cache_path(self, tmp_path):
+        cls = policygen.PolicyGen(
+            self.m_conf, yaml_cache=True, cache_path=str(tmp_path / 'c')
+        )
+        assert cls._yaml_cache.path == str(tmp_path / 'c')
+
 
 class TestSetupMailerTemplates(PolicyGenTester):
 
@@ -3381,7 +4308,10 @@ class TestMain(object):
             call.from_file('manheim-c7n-tools.yml', 'acctName')
         ]
         assert mock_pg.mock_calls == [
-            call(m_conf),
+            call(
+                m_conf, incremental=False, yaml_cache=True, workers=1,
+                output_format='yaml'
+            ),
             call().run()
         ]
 
@@ -3400,6 +4330,47 @@ class TestMain(object):
             call.from_file('foo.yml', 'acctName')
         ]
         assert mock_pg.mock_calls == [
-            call(m_conf),
+            call(
+                m_conf, incremental=False, yaml_cache=True, workers=1,
+                output_format='yaml'
+            ),
+            call().run()
+        ]
+
+    def test_main_incremental(self):
+        m_conf = Mock()
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen', autospec=True
+        ) as mock_pg:
+            with patch('sys.argv', ['policygen', '-i', 'acctName']):
+                with patch(
+                    'manheim_c7n_tools.policygen.ManheimConfig', autospec=True
+                ) as mock_cc:
+                    mock_cc.from_file.return_value = m_conf
+                    policygen.main()
+        assert mock_pg.mock_calls == [
+            call(
+                m_conf, incremental=True, yaml_cache=True, workers=1,
+                output_format='yaml'
+            ),
+            call().run()
+        ]
+
+    def test_main_no_cache(self):
+        m_conf = Mock()
+        with patch(
+            'manheim_c7n_tools.policygen.PolicyGen', autospec=True
+        ) as mock_pg:
+            with patch('sys.argv', ['policygen', '--no-cache', 'acctName']):
+                with patch(
+                    'manheim_c7n_tools.policygen.ManheimConfig', autospec=True
+                ) as mock_cc:
+                    mock_cc.from_file.return_value = m_conf
+                    policygen.main()
+        assert mock_pg.mock_calls == [
+            call(
+                m_conf, incremental=False, yaml_cache=False, workers=1,
+                output_format='yaml'
+            ),
             call().run()
         ]
@@ -13,9 +13,13 @@
 # limitations under the License.
 
 import sys
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, call, DEFAULT, Mock, PropertyMock
 import pytest
 from functools import partial
+import yaml
 
 from c7n.config import Config
 from c7n_mailer.cli import CONFIG_SCHEMA as MAILER_SCHEMA
@@ -25,6 +29,8 @@ import manheim_c7n_tools.runner as runner
 from manheim_c7n_tools.runner import BaseStep
 from manheim_c7n_tools.utils import bold
 from manheim_c7n_tools.config import ManheimConfig
+from manheim_c7n_tools.checkpoint import CheckpointJournal
+from manheim_c7n_tools.policy_artifacts import PolicyArtifacts
 from c7n_mailer.deploy import get_archive
 from c7n.mu import PythonPackageArchive
 
@@ -50,18 +56,13 @@ ALL_REGIONS = [
 ]
 
 
-class FakeConfig:
-
-    def __init__(self, regions):
-        self.regions = regions
-
-
 class StepTester(object):
 
     def setup(self):
         # in order to supplant __getattr__ calls
         self.m_conf = Mock(spec=ManheimConfig)
         self.m_conf.account_id = '01234567890'
+        self.m_sess = Mock()
 
 
 class TestPolicygenStep(StepTester):
@@ -70,7 +71,44 @@ class TestPolicygenStep(StepTester):
         with patch('%s.PolicyGen' % pbm, autospec=True) as mock_pg:
             runner.PolicygenStep(None, self.m_conf).run()
         assert mock_pg.mock_calls == [
-            call(self.m_conf),
+            call(self.m_conf, incremental=False, yaml_cache=False, workers=1,
+                 output_format='yaml', cache_path='.policygen-cache'),
+            call().run()
+        ]
+
+    def test_run_incremental(self):
+        with patch('%s.PolicyGen' % pbm, autospec=True) as mock_pg:
+            runner.PolicygenStep(
+                None, self.m_conf, options={'incremental_policygen': True}
+            ).run()
+        assert mock_pg.mock_calls == [
+            call(self.m_conf, incremental=True, yaml_cache=False, workers=1,
+                 output_format='yaml', cache_path='.policygen-cache'),
+            call().run()
+        ]
+
+    def test_run_cache(self):
+        with patch('%s.PolicyGen' % pbm, autospec=True) as mock_pg:
+            runner.PolicygenStep(
+                None, self.m_conf, options={'policygen_cache': True}
+            ).run()
+        assert mock_pg.mock_calls == [
+            call(self.m_conf, incremental=False, yaml_cache=True, workers=1,
+                 output_format='yaml', cache_path='.policygen-cache'),
+            call().run()
+        ]
+
+    def test_run_cache_path(self):
+        with patch('%s.PolicyGen' % pbm, autospec=True) as mock_pg:
+            runner.PolicygenStep(
+                None, self.m_conf, options={
+                    'policygen_cache': True,
+                    'policygen_cache_path': '/a/a1.policygen-cache'
+                }
+            ).run()
+        assert mock_pg.mock_calls == [
+            call(self.m_conf, incremental=False, yaml_cache=True, workers=1,
+                 output_format='yaml', cache_path='/a/a1.policygen-cache'),
             call().run()
         ]
 
@@ -78,28 +116,28 @@ class TestPolicygenStep(StepTester):
         with patch('%s.PolicyGen' % pbm, autospec=True) as mock_pg:
             runner.PolicygenStep(None, self.m_conf).dryrun()
         assert mock_pg.mock_calls == [
-            call(self.m_conf),
+            call(self.m_conf, incremental=False, yaml_cache=False, workers=1,
+                 output_format='yaml', cache_path='.policygen-cache'),
             call().run()
         ]
 
-    def test_run_in_region(self):
-        conf = FakeConfig(ALL_REGIONS)
-        for rname in ALL_REGIONS:
-            if rname == ALL_REGIONS[0]:
-                assert runner.PolicygenStep.run_in_region(rname, conf) is True
-            else:
-                assert runner.PolicygenStep.run_in_region(rname, conf) is False
+    def test_is_global(self):
+        assert runner.PolicygenStep.is_global is True
+        assert runner.PolicygenStep.checkpoint is False
+        assert runner.PolicygenStep.depends_on == []
 
 
 class TestValidateStep(StepTester):
 
     def test_run(self):
         mock_conf = Mock(spec_set=ManheimConfig)
-        with patch('%s.validate' % pbm, autospec=True) as mock_validate:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.ValidateStep('rName', self.m_conf).run()
+        with patch('c7n.commands.validate', autospec=True) as mock_validate:
+            with patch('c7n.config.Config.empty') as mock_empty:
+                with patch('%s.PolicyArtifacts' % pbm) as mock_pa:
+                    mock_empty.return_value = mock_conf
+                    runner.ValidateStep('rName', self.m_conf).run()
         assert mock_validate.mock_calls == [call(mock_conf)]
+        assert mock_pa.mock_calls == [call.validated('custodian_rName.yml')]
         assert mock_empty.mock_calls == [
             call(configs=['custodian_rName.yml'], region='rName',
                  check_deprecations="yes")
@@ -107,16 +145,76 @@ class TestValidateStep(StepTester):
 
     def test_dryrun(self):
         mock_conf = Mock(spec_set=ManheimConfig)
-        with patch('%s.validate' % pbm, autospec=True) as mock_validate:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.ValidateStep('rName', self.m_conf).dryrun()
+        with patch('c7n.commands.validate', autospec=True) as mock_validate:
+            with patch('c7n.config.Config.empty') as mock_empty:
+                with patch('%s.PolicyArtifacts' % pbm) as mock_pa:
+                    mock_empty.return_value = mock_conf
+                    runner.ValidateStep('rName', self.m_conf).dryrun()
         assert mock_validate.mock_calls == [call(mock_conf)]
+        assert mock_pa.mock_calls == [call.validated('custodian_rName.yml')]
         assert mock_empty.mock_calls == [
             call(configs=['custodian_rName.yml'], region='rName',
                  check_deprecations="yes")
         ]
 
+    def test_run_json(self):
+        mock_conf = Mock(spec_set=ManheimConfig)
+        with patch('c7n.commands.validate', autospec=True) as mock_validate:
+            with patch('c7n.config.Config.empty') as mock_empty:
+                with patch('%s.PolicyArtifacts' % pbm) as mock_pa:
+                    mock_empty.return_value = mock_conf
+                    runner.ValidateStep(
+                        'rName', self.m_conf,
+                        options={'policygen_output_format': 'json'}
+                    ).run()
+        assert mock_validate.mock_calls == [call(mock_conf)]
+        assert mock_pa.mock_calls == [call.validated('custodian_rName.json')]
+        assert mock_empty.mock_calls == [
+            call(configs=['custodian_rName.json'], region='rName',
+                 check_deprecations="yes")
+        ]
+
+    def test_run_validation_cache(self):
+        with patch('c7n.commands.validate', autospec=True) as mock_validate:
+            with patch.multiple(
+                pbm,
+                PolicyArtifacts=DEFAULT,
+                ValidationCache=DEFAULT,
+                validate_custodian_config=DEFAULT
+            ) as mocks:
+                runner.ValidateStep(
+                    'rName', self.m_conf, options={'validation_cache': True}
+                ).run()
+        assert mock_validate.mock_calls == []
+        assert mocks['ValidationCache'].mock_calls == [
+            call('custodian_rName.yml', path='.c7n-validation-cache')
+        ]
+        assert mocks['validate_custodian_config'].mock_calls == [
+            call(
+                'custodian_rName.yml', mocks['ValidationCache'].return_value
+            )
+        ]
+        assert mocks['PolicyArtifacts'].mock_calls == [
+            call.validated('custodian_rName.yml')
+        ]
+
+    def test_run_validation_cache_path(self):
+        with patch.multiple(
+            pbm,
+            PolicyArtifacts=DEFAULT,
+            ValidationCache=DEFAULT,
+            validate_custodian_config=DEFAULT
+        ) as mocks:
+            runner.ValidateStep(
+                'rName', self.m_conf, options={
+                    'validation_cache': True,
+                    'validation_cache_path': '/a/a1.validation-cache'
+                }
+            ).run()
+        assert mocks['ValidationCache'].mock_calls == [
+            call('custodian_rName.yml', path='/a/a1.validation-cache')
+        ]
+
     def test_run_in_region(self):
         for rname in ALL_REGIONS:
             assert runner.ValidateStep.run_in_region(rname, None) is True
@@ -135,21 +233,21 @@ class TestMugcStep(StepTester):
         mock_aws = Mock(spec_set=AWS)
         mock_aws.initialize_policies.return_value = {'aws': 'policies'}
         mock_pc = Mock()
-        with patch('%s.Config.empty' % pbm) as mock_empty:
+        with patch('c7n.config.Config.empty') as mock_empty:
             mock_empty.return_value = mock_conf
             with patch.multiple(
-                pbm,
+                'manheim_c7n_tools.vendor.mugc',
                 AWS=DEFAULT,
-                load_policies=DEFAULT,
-                resources_gc_prefix=DEFAULT,
-                PolicyCollection=DEFAULT
-            ) as mocks:
+                resources_gc_prefix=DEFAULT
+            ) as mocks, patch('c7n.policy.PolicyCollection') as mock_pc_cls:
+                mocks['PolicyCollection'] = mock_pc_cls
                 mocks['AWS'].return_value = mock_aws
                 mocks['PolicyCollection'].return_value = mock_pc
-                mocks['load_policies'].return_value = [
-                    mock_pol1, mock_pol2, mock_pol3
-                ]
-                runner.MugcStep('rName', self.m_conf).run()
+                with patch('%s.PolicyArtifacts' % pbm) as mock_pa:
+                    mock_pa.load.return_value.collection.return_value = [
+                        mock_pol1, mock_pol2, mock_pol3
+                    ]
+                    runner.MugcStep('rName', self.m_conf).run()
         assert mock_empty.mock_calls == [
             call(
                 config_files=['custodian_rName.yml'],
@@ -162,11 +260,13 @@ class TestMugcStep(StepTester):
                 external_id=None,
                 cache_period=0,
                 cache=None,
-                present=False
+                present=False,
+                gc_workers=8
             )
         ]
-        assert mocks['load_policies'].mock_calls == [
-            call(mock_conf, mock_conf)
+        assert mock_pa.mock_calls == [
+            call.load('custodian_rName.yml'),
+            call.load().collection(mock_conf)
         ]
         assert mocks['PolicyCollection'].mock_calls == [
             call([mock_pol2], mock_conf)
@@ -190,21 +290,23 @@ class TestMugcStep(StepTester):
         mock_aws = Mock(spec_set=AWS)
         mock_aws.initialize_policies.return_value = {'aws': 'policies'}
         mock_pc = Mock()
-        with patch('%s.Config.empty' % pbm) as mock_empty:
+        with patch('c7n.config.Config.empty') as mock_empty:
             mock_empty.return_value = mock_conf
             with patch.multiple(
-                pbm,
+                'manheim_c7n_tools.vendor.mugc',
                 AWS=DEFAULT,
-                load_policies=DEFAULT,
-                resources_gc_prefix=DEFAULT,
-                PolicyCollection=DEFAULT
-            ) as mocks:
+                resources_gc_prefix=DEFAULT
+            ) as mocks, patch('c7n.policy.PolicyCollection') as mock_pc_cls:
+                mocks['PolicyCollection'] = mock_pc_cls
                 mocks['AWS'].return_value = mock_aws
                 mocks['PolicyCollection'].return_value = mock_pc
-                mocks['load_policies'].return_value = [
-                    mock_pol1, mock_pol2, mock_pol3
-                ]
-                runner.MugcStep('rName', self.m_conf).dryrun()
+                with patch('%s.PolicyArtifacts' % pbm) as mock_pa:
+                    mock_pa.load.return_value.collection.return_value = [
+                        mock_pol1, mock_pol2, mock_pol3
+                    ]
+                    runner.MugcStep(
+                        'rName', self.m_conf, options={'mugc_workers': 3}
+                    ).dryrun()
         assert mock_empty.mock_calls == [
             call(
                 config_files=['custodian_rName.yml'],
@@ -218,11 +320,13 @@ class TestMugcStep(StepTester):
                 cache_period=0,
                 cache=None,
                 present=False,
-                dryrun=True
+                dryrun=True,
+                gc_workers=3
             )
         ]
-        assert mocks['load_policies'].mock_calls == [
-            call(mock_conf, mock_conf)
+        assert mock_pa.mock_calls == [
+            call.load('custodian_rName.yml'),
+            call.load().collection(mock_conf)
         ]
         assert mocks['PolicyCollection'].mock_calls == [
             call([mock_pol2], mock_conf)
@@ -242,34 +346,234 @@ class TestMugcStep(StepTester):
 
 class TestCustodianStep(StepTester):
 
-    def test_run(self):
+    def _run(self, deployed, options=None):
         type(self.m_conf).output_s3_bucket_name = PropertyMock(
             return_value='cloud-custodian-ACCT-REGION'
         )
         type(self.m_conf).custodian_log_group = PropertyMock(
             return_value='/cloud-custodian/ACCT/REGION'
         )
+        policies = [
+            {'name': 'p1', 'resource': 'ec2'},
+            {'name': 'p2', 'resource': 'ec2', 'mode': {'type': 'periodic'}},
+            {'name': 'p3', 'resource': 'ebs', 'mode': {'type': 'periodic'}}
+        ]
         mock_conf = Mock(spec_set=Config)
-        with patch('%s.run' % pbm) as mock_run:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.CustodianStep('rName', self.m_conf).run()
+        with patch('c7n.commands.run') as mock_run:
+            with patch('c7n.config.Config.empty') as mock_empty:
+                with patch(
+                    '%s.CustodianStep._log_describe_calls' % pbm,
+                    autospec=True
+                ) as mock_ldc, patch(
+                    '%s.CustodianStep._run_policies' % pbm,
+                    autospec=True
+                ) as self.mock_rp, patch(
+                    '%s.PolicyArtifacts.load' % pbm
+                ) as mock_load, patch.multiple(
+                    'manheim_c7n_tools.deploy_manifest',
+                    DeployManifest=DEFAULT,
+                    deploy_fingerprints=DEFAULT
+                ) as mocks:
+                    mock_load.return_value.policies = policies
+                    mocks['deploy_fingerprints'].return_value = {
+                        'p2': 'fp2', 'p3': 'fp3'
+                    }
+                    mocks['DeployManifest'].return_value.load.return_value = \
+                        deployed
+                    mock_empty.return_value = mock_conf
+                    cls = runner.CustodianStep(
+                        'rName', self.m_conf, session=self.m_sess,
+                        options=options
+                    )
+                    cls.run()
+        assert mock_load.mock_calls == [
+            call('custodian_rName.yml', validate=False)
+        ]
+        assert mocks['deploy_fingerprints'].mock_calls == [
+            call(policies, {
+                'region': 'rName',
+                'log_group': '/cloud-custodian/ACCT/REGION',
+                'metrics_enabled': True,
+                'output_dir': 'cloud-custodian-ACCT-REGION/logs'
+            })
+        ]
+        assert mocks['DeployManifest'].mock_calls[0] == call(
+            'cloud-custodian-ACCT-REGION', 'rName', session=self.m_sess
+        )
+        return (
+            mock_run, mock_empty, mock_ldc, mocks['DeployManifest'],
+            mock_conf, cls
+        )
+
+    def _conf_call(self, **kwargs):
+        return call(
+            configs=['custodian_rName.yml'],
+            region='rName',
+            regions=['rName'],
+            log_group='/cloud-custodian/ACCT/REGION',
+            verbose=1,
+            metrics_enabled=True,
+            subparser='run',
+            cache='/tmp/.cache/cloud-custodian.cache',
+            command='c7n.commands.run',
+            output_dir='cloud-custodian-ACCT-REGION/logs',
+            vars=None,
+            dryrun=False,
+            **kwargs
+        )
+
+    def test_run(self):
+        mock_run, mock_empty, mock_ldc, mock_dm, mock_conf, cls = self._run(
+            {'p2': 'old', 'p4': 'fp4'},
+            options={'skip_unchanged_lambdas': True}
+        )
         assert mock_run.mock_calls == [call(mock_conf)]
-        assert mock_empty.mock_calls == [
-            call(
-                configs=['custodian_rName.yml'],
-                region='rName',
-                regions=['rName'],
-                log_group='/cloud-custodian/ACCT/REGION',
-                verbose=1,
-                metrics_enabled=True,
-                subparser='run',
-                cache='/tmp/.cache/cloud-custodian.cache',
-                command='c7n.commands.run',
-                output_dir='cloud-custodian-ACCT-REGION/logs',
-                vars=None,
-                dryrun=False
-            )
+        assert self.mock_rp.mock_calls == []
+        assert mock_ldc.mock_calls == [call(cls, True)]
+        assert mock_empty.mock_calls == [self._conf_call()]
+        assert mock_dm.mock_calls[1:] == [
+            call().load(),
+            call().save({'p2': 'fp2', 'p3': 'fp3'})
+        ]
+
+    def test_run_unchanged(self):
+        mock_run, mock_empty, mock_ldc, mock_dm, mock_conf, cls = self._run(
+            {'p2': 'old', 'p3': 'fp3'},
+            options={'skip_unchanged_lambdas': True}
+        )
+        assert mock_run.mock_calls == []
+        assert self.mock_rp.mock_calls == [
+            call(cls, mock_conf, {'p1', 'p2'})
+        ]
+        assert mock_ldc.mock_calls == [call(cls, True)]
+        assert mock_empty.mock_calls == [self._conf_call()]
+        assert mock_dm.mock_calls[1:] == [
+            call().load(),
+            call().save({'p2': 'fp2', 'p3': 'fp3'})
+        ]
+
+    def test_run_no_skip(self):
+        # skipping is opt-in; everything is run, but the manifest is updated
+        mock_run, mock_empty, mock_ldc, mock_dm, mock_conf, cls = self._run(
+            {'p2': 'fp2', 'p3': 'fp3'}
+        )
+        assert mock_run.mock_calls == [call(mock_conf)]
+        assert self.mock_rp.mock_calls == []
+        assert mock_empty.mock_calls == [self._conf_call()]
+        assert mock_dm.mock_calls[1:] == [
+            call().save({'p2': 'fp2', 'p3': 'fp3'})
+        ]
+
+    def test_run_policies(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'custodian_us-east-1.yml').write_text(yaml.dump({
+            'policies': [
+                {'name': 'p1', 'resource': 'ec2'},
+                {'name': 'p[2]', 'resource': 'ec2'},
+                {'name': 'p2', 'resource': 'ebs'}
+            ]
+        }))
+        conf = Config.empty(
+            region='us-east-1', regions=['us-east-1'],
+            account_id='123456789012'
+        )
+        PolicyArtifacts.clear()
+        try:
+            with patch('c7n.commands.run') as mock_run:
+                mock_run.__wrapped__ = Mock()
+                runner.CustodianStep('us-east-1', self.m_conf)._run_policies(
+                    conf, {'p1', 'p[2]'}
+                )
+        finally:
+            PolicyArtifacts.clear()
+        # c7n's own policy loading and filtering is not used
+        assert mock_run.call_count == 0
+        assert len(mock_run.__wrapped__.mock_calls) == 1
+        options, policies = mock_run.__wrapped__.mock_calls[0][1]
+        assert options is conf
+        assert [
+            (p.name, p.options.region) for p in policies
+        ] == [('p1', 'us-east-1'), ('p[2]', 'us-east-1')]
+
+    def test_run_policies_expand(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'custodian_us-east-1.yml').write_text(yaml.dump({
+            'policies': [
+                {
+                    'name': 'p1',
+                    'resource': 'ec2',
+                    'mode': {
+                        'type': 'periodic',
+                        'schedule': 'rate(1 day)',
+                        'role': 'custodian-role'
+                    },
+                    'filters': [{
+                        'type': 'value',
+                        'key': 'KeyName',
+                        'value': 'key-{account_id}-{region}'
+                    }]
+                }
+            ]
+        }))
+        conf = Config.empty(
+            region='us-east-1', regions=['us-east-1'],
+            account_id='123456789012'
+        )
+        PolicyArtifacts.clear()
+        try:
+            with patch('c7n.commands.run') as mock_run:
+                mock_run.__wrapped__ = Mock()
+                runner.CustodianStep('us-east-1', self.m_conf)._run_policies(
+                    conf, {'p1'}
+                )
+        finally:
+            PolicyArtifacts.clear()
+        assert len(mock_run.__wrapped__.mock_calls) == 1
+        policies = mock_run.__wrapped__.mock_calls[0][1][1]
+        assert len(policies) == 1
+        assert policies[0].data['mode']['role'] == \
+            'arn:aws:iam::123456789012:role/custodian-role'
+        assert policies[0].data['filters'][0]['value'] == \
+            'key-123456789012-us-east-1'
+
+    def test_run_nothing_to_run(self):
+        type(self.m_conf).output_s3_bucket_name = PropertyMock(
+            return_value='cloud-custodian-ACCT-REGION'
+        )
+        type(self.m_conf).custodian_log_group = PropertyMock(
+            return_value='/cloud-custodian/ACCT/REGION'
+        )
+        with patch('%s.logger' % pbm) as mock_logger:
+            with patch('c7n.commands.run') as mock_run:
+                with patch('c7n.config.Config.empty') as mock_empty:
+                    with patch(
+                        '%s.PolicyArtifacts.load' % pbm
+                    ) as mock_load, patch.multiple(
+                        'manheim_c7n_tools.deploy_manifest',
+                        DeployManifest=DEFAULT,
+                        deploy_fingerprints=DEFAULT
+                    ) as mocks:
+                        mock_load.return_value.policies = [
+                            {'name': 'p2', 'mode': {'type': 'periodic'}}
+                        ]
+                        mocks['deploy_fingerprints'].return_value = {
+                            'p2': 'fp2'
+                        }
+                        mocks['DeployManifest'].return_value.load.\
+                            return_value = {'p2': 'fp2'}
+                        runner.CustodianStep(
+                            'rName', self.m_conf,
+                            options={'skip_unchanged_lambdas': True}
+                        ).run()
+        assert mock_run.mock_calls == []
+        assert mock_empty.mock_calls == []
+        assert mocks['DeployManifest'].mock_calls[1:] == [call().load()]
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Skipping %d of %d Lambda-mode policies that are unchanged '
+                'since they were last deployed', 1, 1
+            ),
+            call.info('No policies to run in %s', 'rName')
         ]
 
     def test_dryrun(self):
@@ -280,11 +584,17 @@ class TestCustodianStep(StepTester):
             return_value='/cloud-custodian/ACCT/REGION'
         )
         mock_conf = Mock(spec_set=Config)
-        with patch('%s.run' % pbm) as mock_run:
-            with patch('%s.Config.empty' % pbm) as mock_empty:
-                mock_empty.return_value = mock_conf
-                runner.CustodianStep('rName', self.m_conf).dryrun()
+        with patch('c7n.commands.run') as mock_run:
+            with patch('c7n.config.Config.empty') as mock_empty:
+                with patch(
+                    '%s.CustodianStep._log_describe_calls' % pbm,
+                    autospec=True
+                ) as mock_ldc:
+                    mock_empty.return_value = mock_conf
+                    cls = runner.CustodianStep('rName', self.m_conf)
+                    cls.dryrun()
         assert mock_run.mock_calls == [call(mock_conf)]
+        assert mock_ldc.mock_calls == [call(cls, False)]
         assert mock_empty.mock_calls == [
             call(
                 configs=['custodian_rName.yml'],
@@ -305,6 +615,33 @@ class TestCustodianStep(StepTester):
         for rname in ALL_REGIONS:
             assert runner.CustodianStep.run_in_region(rname, None) is True
 
+    def test_log_describe_calls(self):
+        pull = {'mode': {'type': 'pull'}}
+        periodic = {'mode': {'type': 'periodic'}}
+        policies = [
+            dict(name='a', resource='ec2', **pull),
+            dict(name='d', resource='aws.ec2'),
+            dict(name='e', resource='ec2', **periodic),
+            dict(name='b', resource='ebs'),
+            dict(name='c', resource='ebs', **periodic)
+        ]
+        with patch('%s.PolicyArtifacts.load' % pbm) as mock_load:
+            mock_load.return_value.policies = policies
+            with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                cls = runner.CustodianStep('rName', self.m_conf)
+                cls._log_describe_calls(True)
+                cls._log_describe_calls(False)
+        assert mock_load.mock_calls == [
+            call('custodian_rName.yml', validate=False),
+            call('custodian_rName.yml', validate=False)
+        ]
+        msg = 'Policy ordering in %s avoids an estimated %d of %d ' \
+              'resource describe calls (compared to ordering by name)'
+        assert mock_logger.mock_calls == [
+            call.info(msg, 'custodian_rName.yml', 1, 3),
+            call.info(msg, 'custodian_rName.yml', 1, 3)
+        ]
+
 
 class TestMailerStep(StepTester):
 
@@ -327,10 +664,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -379,10 +716,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -429,10 +766,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -480,10 +817,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -531,10 +868,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -581,10 +918,10 @@ class TestMailerStep(StepTester):
             return f'/abspath/{p}'
 
         with patch(
-            '%s.jsonschema.validate' % pbm, autospec=True
+            'jsonschema.validate', autospec=True
         ) as mock_validate:
             with patch(
-                '%s.mailer_setup_defaults' % pbm, autospec=True
+                'c7n_mailer.utils.setup_defaults', autospec=True
             ) as mock_msd:
                 mock_msd.side_effect = se_mailer_setup_defaults
                 with patch(
@@ -623,10 +960,10 @@ class TestMailerStep(StepTester):
             '%s.MailerStep.mailer_config' % pbm, new_callable=PropertyMock
         ) as mock_config:
             with patch(
-                '%s.mailer_deploy.provision' % pbm, autospec=True
+                'c7n_mailer.deploy.provision', autospec=True
             ) as mock_prov:
                 with patch(
-                    '%s.session_factory' % pbm, autospec=True
+                    'c7n_mailer.cli.session_factory', autospec=True
                 ) as mock_sf:
                     with patch(
                         '%s.functools.partial' % pbm, autospec=True
@@ -645,10 +982,10 @@ class TestMailerStep(StepTester):
             '%s.MailerStep.mailer_config' % pbm, new_callable=PropertyMock
         ) as mock_config:
             with patch(
-                '%s.mailer_deploy.provision' % pbm, autospec=True
+                'c7n_mailer.deploy.provision', autospec=True
             ) as mock_prov:
                 with patch(
-                    '%s.session_factory' % pbm, autospec=True
+                    'c7n_mailer.cli.session_factory', autospec=True
                 ):
                     with patch(
                         '%s.functools.partial' % pbm, autospec=True
@@ -687,31 +1024,29 @@ class TestMailerStep(StepTester):
 class TestDryRunDiffStep(StepTester):
 
     def test_run(self):
-        with patch('%s.DryRunDiffer' % pbm, autospec=True) as mock_drd:
+        with patch(
+            'manheim_c7n_tools.dryrun_diff.DryRunDiffer', autospec=True
+        ) as mock_drd:
             runner.DryRunDiffStep('rName', self.m_conf).run()
         assert mock_drd.mock_calls == []
 
     def test_dryrun(self):
-        with patch('%s.DryRunDiffer' % pbm, autospec=True) as mock_drd:
-            runner.DryRunDiffStep('rName', self.m_conf).dryrun()
+        with patch(
+            'manheim_c7n_tools.dryrun_diff.DryRunDiffer', autospec=True
+        ) as mock_drd:
+            runner.DryRunDiffStep(
+                'rName', self.m_conf, session=self.m_sess
+            ).dryrun()
         assert mock_drd.mock_calls == [
-            call(self.m_conf),
+            call(self.m_conf, session=self.m_sess),
             call().run(diff_against='origin/master')
         ]
 
-    def test_run_in_region(self):
-        type(self.m_conf).regions = PropertyMock(
-            return_value=ALL_REGIONS
-        )
-        for rname in ALL_REGIONS:
-            if rname == 'us-west-2':
-                assert runner.DryRunDiffStep.run_in_region(
-                    rname, self.m_conf
-                ) is True
-            else:
-                assert runner.DryRunDiffStep.run_in_region(
-                    rname, self.m_conf
-                ) is False
+    def test_is_global(self):
+        assert runner.DryRunDiffStep.is_global is True
+        assert runner.DryRunDiffStep.depends_on == [
+            ('custodian', runner.ALL_REGIONS)
+        ]
 
 
 class TestS3ArchiverStep(StepTester):
@@ -720,32 +1055,54 @@ class TestS3ArchiverStep(StepTester):
         type(self.m_conf).output_s3_bucket_name = PropertyMock(
             return_value='cloud-custodian-ACCT-REGION'
         )
-        with patch('%s.S3Archiver' % pbm, autospec=True) as mock_s3a:
-            runner.S3ArchiverStep('rName', self.m_conf).run()
+        with patch(
+            'manheim_c7n_tools.s3_archiver.S3Archiver', autospec=True
+        ) as mock_s3a:
+            with patch('%s.PolicyArtifacts.load' % pbm) as mock_load:
+                mock_load.return_value.names = frozenset(['p1', 'p2'])
+                runner.S3ArchiverStep(
+                    'rName', self.m_conf, session=self.m_sess
+                ).run()
         assert mock_s3a.mock_calls == [
             call(
                 'rName',
                 'cloud-custodian-ACCT-REGION',
-                'custodian_rName.yml'
+                'custodian_rName.yml',
+                session=self.m_sess,
+                policy_names=frozenset(['p1', 'p2'])
             ),
             call().run()
         ]
+        assert mock_load.mock_calls == [
+            call('custodian_rName.yml', validate=False)
+        ]
 
     def test_dryrun(self):
         type(self.m_conf).output_s3_bucket_name = PropertyMock(
             return_value='cloud-custodian-ACCT-REGION'
         )
-        with patch('%s.S3Archiver' % pbm, autospec=True) as mock_s3a:
-            runner.S3ArchiverStep('rName', self.m_conf).dryrun()
+        with patch(
+            'manheim_c7n_tools.s3_archiver.S3Archiver', autospec=True
+        ) as mock_s3a:
+            with patch('%s.PolicyArtifacts.load' % pbm) as mock_load:
+                mock_load.return_value.names = frozenset(['p1', 'p2'])
+                runner.S3ArchiverStep(
+                    'rName', self.m_conf, session=self.m_sess
+                ).dryrun()
         assert mock_s3a.mock_calls == [
             call(
                 'rName',
                 'cloud-custodian-ACCT-REGION',
                 'custodian_rName.yml',
-                dryrun=True
+                dryrun=True,
+                session=self.m_sess,
+                policy_names=frozenset(['p1', 'p2'])
             ),
             call().run()
         ]
+        assert mock_load.mock_calls == [
+            call('custodian_rName.yml', validate=False)
+        ]
 
     def test_run_in_region(self):
         for rname in ALL_REGIONS:
@@ -774,7 +1131,7 @@ class TestDocsBuildStep(StepTester):
         with patch('%s.os.path.exists' % pbm, autospec=True) as mock_ope:
             with patch('%s.rmtree' % pbm, autospec=True) as mock_rmtree:
                 with patch(
-                    '%s.sphinx_main' % pbm, autospec=True
+                    'sphinx.cmd.build.main', autospec=True
                 ) as mock_sphinx:
                     mock_ope.return_value = False
                     mock_sphinx.return_value = 0
@@ -791,7 +1148,7 @@ class TestDocsBuildStep(StepTester):
         with patch('%s.os.path.exists' % pbm, autospec=True) as mock_ope:
             with patch('%s.rmtree' % pbm, autospec=True) as mock_rmtree:
                 with patch(
-                    '%s.sphinx_main' % pbm, autospec=True
+                    'sphinx.cmd.build.main', autospec=True
                 ) as mock_sphinx:
                     mock_ope.return_value = True
                     mock_sphinx.return_value = 3
@@ -806,13 +1163,11 @@ class TestDocsBuildStep(StepTester):
             call(['-W', 'docs/source', 'docs/_build', '-b', 'dirhtml'])
         ]
 
-    def test_run_in_region(self):
-        conf = FakeConfig(ALL_REGIONS)
-        for rname in ALL_REGIONS:
-            if rname == ALL_REGIONS[0]:
-                assert runner.DocsBuildStep.run_in_region(rname, conf) is True
-            else:
-                assert runner.DocsBuildStep.run_in_region(rname, conf) is False
+    def test_is_global(self):
+        assert runner.DocsBuildStep.is_global is True
+        assert runner.DocsBuildStep.depends_on == [
+            ('policygen', runner.ALL_REGIONS)
+        ]
 
 
 class TestStepClasses(object):
@@ -830,6 +1185,19 @@ class TestStepClasses(object):
     def test_base_step_run_in_region(self):
         assert runner.BaseStep.run_in_region('foo', None) is True
 
+    def test_base_step_session(self):
+        m_sess = Mock()
+        step = runner.PolicygenStep(None, Mock(), session=m_sess)
+        assert step.session == m_sess
+
+    def test_base_step_session_default(self):
+        with patch('boto3.session.Session') as mock_sess:
+            step = runner.PolicygenStep(None, Mock())
+            assert mock_sess.mock_calls == []
+            assert step.session is mock_sess.return_value
+            assert step.session is mock_sess.return_value
+        assert mock_sess.mock_calls == [call()]
+
 
 class TestCustodianRunner(object):
 
@@ -854,6 +1222,11 @@ class TestCustodianRunner(object):
         type(self.cls4).name = PropertyMock(return_value='cls4')
         self.cls4.run_in_region.return_value = True
         self.steps = [self.cls1, self.cls2, self.cls3, self.cls4]
+        for cls in self.steps:
+            type(cls).is_global = PropertyMock(return_value=False)
+            type(cls).region_independent = PropertyMock(return_value=False)
+            type(cls).depends_on = PropertyMock(return_value=[])
+            type(cls).checkpoint = PropertyMock(return_value=True)
 
     def test_init(self):
         m_conf = Mock(spec_set=ManheimConfig)
@@ -869,30 +1242,47 @@ class TestCustodianRunner(object):
         type(m_conf).regions = PropertyMock(
             return_value=['r1', 'r2', 'r3']
         )
+        type(m_conf).account_name = PropertyMock(return_value='acctName')
         with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
             with patch.multiple(
                 '%s.CustodianRunner' % pbm,
                 autospec=True,
                 _steps_to_run=DEFAULT,
-                _run_step_in_regions=DEFAULT,
+                _build_graph=DEFAULT,
+                _run_graph=DEFAULT,
                 _validate_account=DEFAULT
             ) as mocks:
                 mocks['_steps_to_run'].return_value = [
                     self.cls1, self.cls2, self.cls3, self.cls4
                 ]
+                mocks['_build_graph'].return_value = ('graph', 'configs')
                 with patch('%s.logger' % pbm, autospec=True) as mock_logger:
                     with patch(
-                        '%s.ManheimConfig.from_file' % pbm
-                    ) as mock_cff:
-                        mock_cff.return_value = m_conf
-                        cls = runner.CustodianRunner('acctName')
-                        cls.run('run')
+                        '%s.CheckpointJournal' % pbm, autospec=True
+                    ) as mock_cj:
+                        with patch(
+                            '%s.ManheimConfig.from_file' % pbm
+                        ) as mock_cff, patch(
+                            '%s.PolicyArtifacts.clear' % pbm
+                        ) as mock_clear:
+                            mock_cff.return_value = m_conf
+                            cls = runner.CustodianRunner('acctName')
+                            cls.run('run')
+        assert mock_clear.mock_calls == [call()]
         assert mocks['_steps_to_run'].mock_calls == [call(cls, [], [])]
-        assert mocks['_run_step_in_regions'].mock_calls == [
-            call(cls, 'run', self.cls1, ['r1', 'r2', 'r3']),
-            call(cls, 'run', self.cls2, ['r1', 'r2', 'r3']),
-            call(cls, 'run', self.cls3, ['r1', 'r2', 'r3']),
-            call(cls, 'run', self.cls4, ['r1', 'r2', 'r3'])
+        assert mock_cj.mock_calls == [
+            call(
+                '.c7n-runner-checkpoint.json', 'acctName', 'run', resume=False
+            ),
+            call().remove()
+        ]
+        assert mocks['_build_graph'].mock_calls == [
+            call(cls, self.steps, ['r1', 'r2', 'r3'])
+        ]
+        assert mocks['_run_graph'].mock_calls == [
+            call(
+                cls, 'run', self.steps, ['r1', 'r2', 'r3'], 'graph', 'configs'
+            )
         ]
         assert self.cls1.mock_calls == []
         assert self.cls2.mock_calls == []
@@ -900,10 +1290,6 @@ class TestCustodianRunner(object):
         assert self.cls4.mock_calls == []
         assert mock_logger.mock_calls == [
             call.info(bold('Beginning run - 4 steps')),
-            call.info(bold('Step 1 of 4 - cls1')),
-            call.info(bold('Step 2 of 4 - cls2')),
-            call.info(bold('Step 3 of 4 - cls3')),
-            call.info(bold('Step 4 of 4 - cls4')),
             call.info(bold('SUCCESS: All 4 steps complete!'))
         ]
         assert mock_cff.mock_calls == [
@@ -916,42 +1302,56 @@ class TestCustodianRunner(object):
         type(m_conf).regions = PropertyMock(
             return_value=['r1', 'r2', 'r3']
         )
+        type(m_conf).account_name = PropertyMock(return_value='aName')
         with patch('%s.CustodianRunner.ordered_step_classes' % pbm, self.steps):
             with patch.multiple(
                 '%s.CustodianRunner' % pbm,
                 autospec=True,
                 _steps_to_run=DEFAULT,
-                _run_step_in_regions=DEFAULT,
+                _build_graph=DEFAULT,
+                _run_graph=DEFAULT,
                 _validate_account=DEFAULT
             ) as mocks:
                 mocks['_steps_to_run'].return_value = [
                     self.cls2, self.cls3
                 ]
+                mocks['_build_graph'].return_value = ('graph', 'configs')
                 with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-                    with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
-                        mock_cff.return_value = m_conf
-                        cls = runner.CustodianRunner('aName')
-                        cls.run(
-                            'dryrun',
-                            regions=['r2'],
-                            step_names=['cls2', 'cls3', 'cls4'],
-                            skip_steps=['cls4']
-                        )
+                    with patch(
+                        '%s.CheckpointJournal' % pbm, autospec=True
+                    ) as mock_cj:
+                        with patch(
+                            '%s.ManheimConfig.from_file' % pbm
+                        ) as mock_cff:
+                            mock_cff.return_value = m_conf
+                            cls = runner.CustodianRunner(
+                                'aName', resume=True,
+                                checkpoint_path='cp.json'
+                            )
+                            cls.run(
+                                'dryrun',
+                                regions=['r2'],
+                                step_names=['cls2', 'cls3', 'cls4'],
+                                skip_steps=['cls4']
+                            )
         assert mocks['_steps_to_run'].mock_calls == [
             call(cls, ['cls2', 'cls3', 'cls4'], ['cls4'])
         ]
-        assert mocks['_run_step_in_regions'].mock_calls == [
-            call(cls, 'dryrun', self.cls2, ['r2']),
-            call(cls, 'dryrun', self.cls3, ['r2'])
+        assert mock_cj.mock_calls == [
+            call('cp.json', 'aName', 'dryrun', resume=True),
+            call().remove()
+        ]
+        assert mocks['_build_graph'].mock_calls == [
+            call(cls, [self.cls2, self.cls3], ['r2'])
+        ]
+        assert mocks['_run_graph'].mock_calls == [
+            call(
+                cls, 'dryrun', [self.cls2, self.cls3], ['r2'], 'graph',
+                'configs'
+            )
         ]
-        assert self.cls1.mock_calls == []
-        assert self.cls2.mock_calls == []
-        assert self.cls3.mock_calls == []
-        assert self.cls4.mock_calls == []
         assert mock_logger.mock_calls == [
             call.info(bold('Beginning dryrun - 2 of 4 steps selected')),
-            call.info(bold('Step 1 of 2 - cls2')),
-            call.info(bold('Step 2 of 2 - cls3')),
             call.info(bold('SUCCESS: All 2 steps complete!'))
         ]
         assert mock_cff.mock_calls == [call('manheim-c7n-tools.yml', 'aName')]
@@ -967,7 +1367,8 @@ class TestCustodianRunner(object):
                 '%s.CustodianRunner' % pbm,
                 autospec=True,
                 _steps_to_run=DEFAULT,
-                _run_step_in_regions=DEFAULT,
+                _build_graph=DEFAULT,
+                _run_graph=DEFAULT,
                 _validate_account=DEFAULT
             ) as mocks:
                 mocks['_steps_to_run'].return_value = [
@@ -990,11 +1391,8 @@ class TestCustodianRunner(object):
         assert mocks['_steps_to_run'].mock_calls == [
             call(cls, ['cls2', 'cls3', 'cls4'], ['cls4'])
         ]
-        assert mocks['_run_step_in_regions'].mock_calls == []
-        assert self.cls1.mock_calls == []
-        assert self.cls2.mock_calls == []
-        assert self.cls3.mock_calls == []
-        assert self.cls4.mock_calls == []
+        assert mocks['_build_graph'].mock_calls == []
+        assert mocks['_run_graph'].mock_calls == []
         assert mock_logger.mock_calls == [
             call.info(bold('Beginning dryrun - 2 of 4 steps selected'))
         ]
@@ -1007,7 +1405,7 @@ class TestCustodianRunner(object):
         )
         type(m_conf).account_id = PropertyMock(return_value='0234567890')
 
-        with patch('%s.boto3.client' % pbm) as mock_client:
+        with patch('boto3.client') as mock_client:
             mock_client.return_value.get_caller_identity.return_value = {
                 'UserId': 'MyUID',
                 'Arn': 'myARN',
@@ -1025,6 +1423,26 @@ class TestCustodianRunner(object):
             call().get_caller_identity()
         ]
 
+    def test_validate_account_session(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_conf).account_id = PropertyMock(return_value='0234567890')
+        m_sess = Mock()
+        m_sess.client.return_value.get_caller_identity.return_value = {
+            'UserId': 'MyUID',
+            'Arn': 'myARN',
+            'Account': '0234567890'
+        }
+        with patch('boto3.client') as mock_client:
+            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+                mock_cff.return_value = m_conf
+                cls = runner.CustodianRunner('acctName', session=m_sess)
+                cls._validate_account()
+        assert mock_client.mock_calls == []
+        assert m_sess.mock_calls == [
+            call.client('sts', region_name='us-east-1'),
+            call.client().get_caller_identity()
+        ]
+
     def test_validate_account_failed(self):
         m_conf = Mock(spec_set=ManheimConfig)
         type(m_conf).account_name = PropertyMock(
@@ -1032,7 +1450,7 @@ class TestCustodianRunner(object):
         )
         type(m_conf).account_id = PropertyMock(return_value='1234567890')
 
-        with patch('%s.boto3.client' % pbm) as mock_client:
+        with patch('boto3.client') as mock_client:
             mock_client.return_value.get_caller_identity.return_value = {
                 'UserId': 'MyUID',
                 'Arn': 'myARN',
@@ -1101,129 +1519,766 @@ class TestCustodianRunner(object):
                 mock_cff.return_value = m_conf
                 assert isinstance(klass(None, m_conf), runner.BaseStep)
 
-    def test_run_in_regions_run(self):
+    def test_init_parallel_regions_invalid(self):
         m_conf = Mock(spec_set=ManheimConfig)
-        m_conf_r1 = Mock(spec_set=ManheimConfig)
-        m_conf_r2 = Mock(spec_set=ManheimConfig)
-        m_conf_r3 = Mock(spec_set=ManheimConfig)
+        with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+            mock_cff.return_value = m_conf
+            with pytest.raises(RuntimeError) as exc:
+                runner.CustodianRunner('acctName', parallel_regions=0)
+        assert str(exc.value) == 'ERROR: parallel_regions must be at ' \
+                                 'least 1, not 0'
 
-        def se_conf_for_region(rname):
-            if rname == 'r1':
-                return m_conf_r1
-            if rname == 'r2':
-                return m_conf_r2
-            if rname == 'r3':
-                return m_conf_r3
+    def _runner(self, m_conf, **kwargs):
+        with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+            mock_cff.return_value = m_conf
+            with patch(
+                '%s.CustodianRunner.ordered_step_classes' % pbm, self.steps
+            ):
+                cls = runner.CustodianRunner('acctName', **kwargs)
+        cls.ordered_step_classes = self.steps
+        return cls
 
-        m_conf.config_for_region.side_effect = se_conf_for_region
+    def test_build_graph(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.side_effect = lambda x: 'conf-%s' % x
+        type(self.cls1).is_global = PropertyMock(return_value=True)
+        type(self.cls2).depends_on = PropertyMock(
+            return_value=[('cls1', runner.ALL_REGIONS)]
+        )
+        type(self.cls3).depends_on = PropertyMock(
+            return_value=[('cls2', runner.SAME_REGION)]
+        )
+        type(self.cls4).depends_on = PropertyMock(
+            return_value=[('cls3', runner.ALL_REGIONS)]
+        )
+        cls = self._runner(m_conf)
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            graph, configs = cls._build_graph(self.steps, ['r1', 'r2', 'r3'])
+        assert configs == {
+            (self.cls1, None): m_conf,
+            (self.cls2, 'r1'): 'conf-r1',
+            (self.cls2, 'r3'): 'conf-r3',
+            (self.cls3, 'r1'): 'conf-r1',
+            (self.cls4, 'r1'): 'conf-r1',
+            (self.cls4, 'r2'): 'conf-r2',
+            (self.cls4, 'r3'): 'conf-r3'
+        }
+        assert graph == {
+            (self.cls1, None): set(),
+            (self.cls2, 'r1'): {(self.cls1, None)},
+            (self.cls2, 'r3'): {(self.cls1, None)},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')},
+            # cls3 doesn't run in r2 or r3; depend on its dependencies there
+            (self.cls4, 'r1'): {
+                (self.cls3, 'r1'), (self.cls2, 'r3'), (self.cls1, None)
+            },
+            (self.cls4, 'r2'): {
+                (self.cls3, 'r1'), (self.cls2, 'r3'), (self.cls1, None)
+            },
+            (self.cls4, 'r3'): {
+                (self.cls3, 'r1'), (self.cls2, 'r3'), (self.cls1, None)
+            }
+        }
+        assert m_conf.config_for_region.mock_calls == [
+            call('r1'), call('r2'), call('r3')
+        ]
+        assert self.cls1.mock_calls == []
+        assert mock_logger.mock_calls == [
+            call.info(bold('SKIPPING Step cls2 in REGION 2 of 3 (r2)')),
+            call.info(bold('SKIPPING Step cls3 in REGION 2 of 3 (r2)')),
+            call.info(bold('SKIPPING Step cls3 in REGION 3 of 3 (r3)'))
+        ]
 
+    def test_build_graph_deps_not_selected(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.side_effect = lambda x: 'conf-%s' % x
+        type(self.cls1).is_global = PropertyMock(return_value=True)
+        type(self.cls2).depends_on = PropertyMock(
+            return_value=[('cls1', runner.ALL_REGIONS)]
+        )
+        type(self.cls3).depends_on = PropertyMock(
+            return_value=[('cls2', runner.SAME_REGION)]
+        )
+        type(self.cls4).is_global = PropertyMock(return_value=True)
+        type(self.cls4).depends_on = PropertyMock(
+            return_value=[('cls3', runner.SAME_REGION)]
+        )
+        cls = self._runner(m_conf)
+        with patch('%s.logger' % pbm, autospec=True):
+            graph, configs = cls._build_graph(
+                [self.cls1, self.cls3, self.cls4], ['r1', 'r2']
+            )
+        assert graph == {
+            (self.cls1, None): set(),
+            (self.cls3, 'r1'): {(self.cls1, None)},
+            (self.cls4, None): {(self.cls3, 'r1'), (self.cls1, None)}
+        }
+
+    def test_build_graph_real_steps(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        m_conf.config_for_region.side_effect = lambda x: Mock(
+            mailer_regions=['r1']
+        )
+        with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
+            mock_cff.return_value = m_conf
+            cls = runner.CustodianRunner('acctName')
+        with patch('%s.logger' % pbm, autospec=True):
+            graph, _ = cls._build_graph(
+                cls.ordered_step_classes, ['r1', 'r2']
+            )
+        pg = (runner.PolicygenStep, None)
+        assert graph[pg] == set()
+        assert graph[(runner.ValidateStep, 'r2')] == {pg}
+        assert graph[(runner.MugcStep, 'r2')] == {
+            (runner.ValidateStep, 'r2')
+        }
+        assert graph[(runner.CustodianStep, 'r2')] == {
+            (runner.MugcStep, 'r2')
+        }
+        assert graph[(runner.MailerStep, 'r1')] == {pg}
+        assert (runner.MailerStep, 'r2') not in graph
+        assert graph[(runner.DryRunDiffStep, None)] == {
+            (runner.CustodianStep, 'r1'), (runner.CustodianStep, 'r2')
+        }
+        assert graph[(runner.S3ArchiverStep, 'r1')] == {
+            (runner.CustodianStep, 'r1')
+        }
+        assert graph[(runner.DocsBuildStep, None)] == {pg}
+        assert len(graph) == 12
+
+    def test_run_graph_serial(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        graph = {
+            (self.cls1, None): set(),
+            (self.cls2, 'r1'): {(self.cls1, None)},
+            (self.cls2, 'r2'): {(self.cls1, None)},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')},
+            (self.cls3, 'r2'): {(self.cls2, 'r2')},
+            (self.cls4, None): {(self.cls3, 'r1'), (self.cls3, 'r2')}
+        }
+        configs = {k: 'conf-%s' % k[1] for k in graph}
+        m_sess = Mock()
+        cls = self._runner(m_conf, session=m_sess)
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
-                mock_cff.return_value = m_conf
-                runner.CustodianRunner('acctName')._run_step_in_regions(
-                    'run', self.cls1, ['r1', 'r2', 'r3']
+            with patch('%s.ProcessPoolExecutor' % pbm) as mock_ppe:
+                cls._run_graph(
+                    'run', self.steps, ['r1', 'r2'], graph, configs
                 )
+        assert mock_ppe.mock_calls == []
         assert self.cls1.mock_calls == [
-            call.run_in_region('r1', m_conf_r1),
-            call('r1', m_conf_r1),
-            call().run(),
-            call.run_in_region('r2', m_conf_r2),
-            call('r2', m_conf_r2),
-            call().run(),
-            call.run_in_region('r3', m_conf_r3),
-            call('r3', m_conf_r3),
-            call().run()
+            call(None, 'conf-None', session=m_sess, options={}), call().run()
         ]
-        assert m_conf.config_for_region.mock_calls == [
-            call('r1'),
-            call('r2'),
-            call('r3')
+        assert self.cls2.mock_calls == [
+            call('r1', 'conf-r1', session=m_sess, options={}), call().run(),
+            call('r2', 'conf-r2', session=m_sess, options={}), call().run()
+        ]
+        assert self.cls3.mock_calls == [
+            call('r1', 'conf-r1', session=m_sess, options={}), call().run(),
+            call('r2', 'conf-r2', session=m_sess, options={}), call().run()
+        ]
+        assert self.cls4.mock_calls == [
+            call(None, 'conf-None', session=m_sess, options={}), call().run()
+        ]
+        assert mock_logger.mock_calls == [
+            call.info(bold('Step cls1 (global)')),
+            call.info(bold('Step cls2 in REGION 1 of 2 (r1)')),
+            call.info(bold('Step cls2 in REGION 2 of 2 (r2)')),
+            call.info(bold('Step cls3 in REGION 1 of 2 (r1)')),
+            call.info(bold('Step cls3 in REGION 2 of 2 (r2)')),
+            call.info(bold('Step cls4 (global)'))
+        ]
+
+    def _journal(self, complete):
+        m_journal = Mock(spec_set=CheckpointJournal)
+        m_journal.is_complete.side_effect = lambda k, f: k in complete
+        return m_journal
+
+    def test_run_graph_serial_checkpoint(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(self.cls1).checkpoint = PropertyMock(return_value=False)
+        graph = {
+            (self.cls1, None): set(),
+            (self.cls2, 'r1'): {(self.cls1, None)},
+            (self.cls2, 'r2'): {(self.cls1, None)},
+            (self.cls4, None): {(self.cls2, 'r1'), (self.cls2, 'r2')}
+        }
+        configs = {k: 'conf-%s' % k[1] for k in graph}
+        cls = self._runner(m_conf)
+        cls._journal = self._journal(['Step cls2 in REGION r1'])
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch(
+                '%s.CheckpointJournal.fingerprint' % pbm
+            ) as mock_fp:
+                mock_fp.side_effect = lambda c, p: '%s:%s' % (c, ','.join(p))
+                cls._run_graph('run', self.steps, ['r1', 'r2'], graph, configs)
+        assert self.cls1.mock_calls == [
+            call(None, 'conf-None', session=None, options={}), call().run()
+        ]
+        assert self.cls2.mock_calls == [
+            call('r2', 'conf-r2', session=None, options={}), call().run()
+        ]
+        assert self.cls4.mock_calls == [
+            call(None, 'conf-None', session=None, options={}), call().run()
+        ]
+        assert cls._journal.mock_calls == [
+            call.is_complete(
+                'Step cls2 in REGION r1', 'conf-r1:custodian_r1.yml'
+            ),
+            call.is_complete(
+                'Step cls2 in REGION r2', 'conf-r2:custodian_r2.yml'
+            ),
+            call.complete('Step cls2 in REGION r2'),
+            call.is_complete(
+                'Step cls4 (global)',
+                'conf-None:custodian_r1.yml,custodian_r2.yml'
+            ),
+            call.complete('Step cls4 (global)')
         ]
         assert mock_logger.mock_calls == [
-            call.info(bold('Step cls1 in REGION 1 of 3 (r1)')),
-            call.info(bold('Step cls1 in REGION 2 of 3 (r2)')),
-            call.info(bold('Step cls1 in REGION 3 of 3 (r3)'))
+            call.info(bold('Step cls1 (global)')),
+            call.info(bold(
+                'SKIPPING Step cls2 in REGION r1 - already complete '
+                '(checkpoint)'
+            )),
+            call.info(bold('Step cls2 in REGION 2 of 2 (r2)')),
+            call.info(bold('Step cls4 (global)'))
         ]
 
-    def test_run_in_regions_policygen_run(self):
+    def test_run_graph_parallel_checkpoint(self):
         m_conf = Mock(spec_set=ManheimConfig)
-        m_conf_r1 = Mock(spec_set=ManheimConfig)
-        m_conf_r2 = Mock(spec_set=ManheimConfig)
-        m_conf_r3 = Mock(spec_set=ManheimConfig)
+        type(self.cls2).region_independent = PropertyMock(return_value=True)
+        graph = {
+            (self.cls2, 'r1'): set(),
+            (self.cls2, 'r2'): set(),
+            (self.cls3, 'r1'): {(self.cls2, 'r1')},
+            (self.cls4, None): {(self.cls2, 'r1'), (self.cls2, 'r2')}
+        }
+        configs = {k: 'conf-%s' % k[1] for k in graph}
+        cls = self._runner(m_conf, parallel_regions=2)
+        cls._journal = self._journal([
+            'Step cls2 in REGION r1', 'Step cls3 in REGION r1'
+        ])
+        with patch('%s.logger' % pbm, autospec=True):
+            with patch.multiple(
+                pbm,
+                ProcessPoolExecutor=ThreadPoolExecutor,
+                run_task=DEFAULT
+            ) as mocks:
+                mocks['run_task'].return_value = ('', None)
+                with patch(
+                    '%s.CheckpointJournal.fingerprint' % pbm
+                ) as mock_fp:
+                    mock_fp.return_value = 'fp'
+                    with patch('%s.sys.stderr' % pbm):
+                        cls._run_graph(
+                            'run', self.steps, ['r1', 'r2'], graph, configs
+                        )
+        assert mocks['run_task'].mock_calls == [
+            call('run', self.cls2, 'r2', 'conf-r2', {})
+        ]
+        assert self.cls3.mock_calls == []
+        assert self.cls4.mock_calls == [
+            call(None, 'conf-None', session=None, options={}), call().run()
+        ]
+        assert call.complete('Step cls2 in REGION r2') in \
+            cls._journal.mock_calls
+        assert call.complete('Step cls4 (global)') in cls._journal.mock_calls
+        assert call.complete('Step cls2 in REGION r1') not in \
+            cls._journal.mock_calls
+        # each task's inputs are only fingerprinted once, however many
+        # scheduler passes it is checked in
+        assert sorted(
+            c[1][0] for c in mock_fp.mock_calls
+        ) == ['conf-None', 'conf-r1', 'conf-r1', 'conf-r2']
+
+    def test_run_graph_serial_failure(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        graph = {
+            (self.cls1, 'r1'): set(),
+            (self.cls2, 'r1'): {(self.cls1, 'r1')}
+        }
+        configs = {k: 'conf' for k in graph}
+        self.cls1.return_value.dryrun.side_effect = RuntimeError('foo')
+        cls = self._runner(m_conf)
+        with patch('%s.logger' % pbm, autospec=True):
+            with pytest.raises(RuntimeError) as exc:
+                cls._run_graph('dryrun', self.steps, ['r1'], graph, configs)
+        assert str(exc.value) == 'foo'
+        assert self.cls2.mock_calls == []
+
+    def test_run_graph_serial_circular(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        graph = {
+            (self.cls1, 'r1'): set(),
+            (self.cls2, 'r1'): {(self.cls3, 'r1')},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')}
+        }
+        configs = {k: 'conf' for k in graph}
+        cls = self._runner(m_conf)
+        with patch('%s.logger' % pbm, autospec=True):
+            with pytest.raises(RuntimeError) as exc:
+                cls._run_graph('run', self.steps, ['r1'], graph, configs)
+        assert str(exc.value) == 'ERROR: Circular step dependencies ' \
+                                 'between: Step cls2 in REGION r1, ' \
+                                 'Step cls3 in REGION r1'
+        assert self.cls1.mock_calls == [
+            call('r1', 'conf', session=None, options={}), call().run()
+        ]
 
-        def se_conf_for_region(rname):
-            if rname == 'r1':
-                return m_conf_r1
-            if rname == 'r2':
-                return m_conf_r2
-            if rname == 'r3':
-                return m_conf_r3
+    def test_run_graph_parallel(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(self.cls2).region_independent = PropertyMock(return_value=True)
+        type(self.cls3).region_independent = PropertyMock(return_value=True)
+        graph = {
+            (self.cls1, None): set(),
+            (self.cls2, 'r1'): {(self.cls1, None)},
+            (self.cls2, 'r2'): {(self.cls1, None)},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')},
+            (self.cls3, 'r2'): {(self.cls2, 'r2')},
+            (self.cls4, None): {(self.cls3, 'r1'), (self.cls3, 'r2')}
+        }
+        configs = {k: 'conf-%s' % k[1] for k in graph}
+        order = []
 
-        m_conf.config_for_region.side_effect = se_conf_for_region
+        def se_run(action, step, region_name, region_conf, options):
+            order.append((step.name, region_name))
+            return 'out-%s-%s\n' % (step.name, region_name), None
 
+        cls = self._runner(m_conf, parallel_regions=2)
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
-                mock_cff.return_value = m_conf
-                with patch('%s.PolicygenStep' % pbm, autospec=True) as mock_pgs:
-                    type(mock_pgs).name = PropertyMock(return_value='policygen')
-                    mock_pgs.run_in_region.return_value = True
-                    runner.CustodianRunner('acctName')._run_step_in_regions(
-                        'run', mock_pgs, ['r1', 'r2', 'r3']
+            with patch.multiple(
+                pbm,
+                ProcessPoolExecutor=ThreadPoolExecutor,
+                run_task=DEFAULT
+            ) as mocks:
+                mocks['run_task'].side_effect = se_run
+                with patch('%s.sys.stderr' % pbm) as mock_stderr:
+                    cls._run_graph(
+                        'dryrun', self.steps, ['r1', 'r2'], graph, configs
                     )
-        assert mock_pgs.mock_calls == [
-            call.run_in_region('r1', m_conf),
-            call('r1', m_conf),
-            call().run(),
-            call.run_in_region('r2', m_conf),
-            call('r2', m_conf),
-            call().run(),
-            call.run_in_region('r3', m_conf),
-            call('r3', m_conf),
-            call().run()
+        assert self.cls1.mock_calls == [
+            call(None, 'conf-None', session=None, options={}), call().dryrun()
         ]
-        assert m_conf.config_for_region.mock_calls == []
-        assert mock_logger.mock_calls == [
-            call.info(bold('Step policygen in REGION 1 of 3 (r1)')),
-            call.info(bold('Step policygen in REGION 2 of 3 (r2)')),
-            call.info(bold('Step policygen in REGION 3 of 3 (r3)'))
+        assert self.cls2.mock_calls == []
+        assert self.cls3.mock_calls == []
+        assert self.cls4.mock_calls == [
+            call(None, 'conf-None', session=None, options={}), call().dryrun()
+        ]
+        assert sorted(order) == [
+            ('cls2', 'r1'), ('cls2', 'r2'), ('cls3', 'r1'), ('cls3', 'r2')
         ]
+        assert order.index(('cls2', 'r1')) < order.index(('cls3', 'r1'))
+        assert order.index(('cls2', 'r2')) < order.index(('cls3', 'r2'))
+        assert sorted(
+            c for c in mock_stderr.mock_calls if c != call.flush()
+        ) == [
+            call.write('out-cls2-r1\n'), call.write('out-cls2-r2\n'),
+            call.write('out-cls3-r1\n'), call.write('out-cls3-r2\n')
+        ]
+        assert mock_logger.mock_calls[0] == call.info(
+            bold('Step cls1 (global)')
+        )
+        assert mock_logger.mock_calls[-1] == call.info(
+            bold('Step cls4 (global)')
+        )
+        assert call.info(bold('Starting Step cls3 in REGION 2 of 2 (r2)')) \
+            in mock_logger.mock_calls
+        assert call.info(bold('Finished: Step cls3 in REGION r2')) in \
+            mock_logger.mock_calls
 
-    def test_run_in_regions_dryrun_skip_some(self):
+    def test_run_graph_parallel_failures(self):
         m_conf = Mock(spec_set=ManheimConfig)
-        m_conf_r1 = Mock(spec_set=ManheimConfig)
-        m_conf_r2 = Mock(spec_set=ManheimConfig)
-        m_conf_r3 = Mock(spec_set=ManheimConfig)
-
-        def se_conf_for_region(rname):
-            if rname == 'r1':
-                return m_conf_r1
-            if rname == 'r2':
-                return m_conf_r2
-            if rname == 'r3':
-                return m_conf_r3
+        type(self.cls2).region_independent = PropertyMock(return_value=True)
+        graph = {
+            (self.cls1, None): set(),
+            (self.cls2, 'r1'): {(self.cls1, None)},
+            (self.cls2, 'r2'): {(self.cls1, None)},
+            (self.cls2, 'r3'): {(self.cls1, None)},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')},
+            (self.cls3, 'r3'): {(self.cls2, 'r3')},
+            (self.cls4, None): {(self.cls1, None)}
+        }
+        configs = {k: 'conf-%s' % k[1] for k in graph}
+        self.cls4.return_value.run.side_effect = SystemExit(1)
 
-        m_conf.config_for_region.side_effect = se_conf_for_region
+        def se_run(action, step, region_name, region_conf, options):
+            if region_name == 'r1':
+                return 'out-r1\n', 'Traceback r1'
+            if region_name == 'r2':
+                raise RuntimeError('pool broke')
+            return 'out-r3\n', None
 
+        cls = self._runner(m_conf, parallel_regions=8)
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
-            with patch('%s.ManheimConfig.from_file' % pbm) as mock_cff:
-                mock_cff.return_value = m_conf
-                runner.CustodianRunner('acctName')._run_step_in_regions(
-                    'dryrun', self.cls2, ['r2', 'r3']
+            with patch.multiple(
+                pbm,
+                ProcessPoolExecutor=ThreadPoolExecutor,
+                run_task=DEFAULT
+            ) as mocks:
+                mocks['run_task'].side_effect = se_run
+                with patch('%s.sys.stderr' % pbm):
+                    with pytest.raises(RuntimeError) as exc:
+                        cls._run_graph(
+                            'run', self.steps, ['r1', 'r2', 'r3'], graph,
+                            configs
+                        )
+        assert str(exc.value) == 'ERROR: 3 tasks failed (Step cls2 in ' \
+                                 'REGION r1, Step cls2 in REGION r2, ' \
+                                 'Step cls4 (global)); 1 tasks not run'
+        assert len(mocks['run_task'].mock_calls) == 3
+        # cls3 in r3 ran; cls3 in r1 did not, as cls2 failed there
+        assert self.cls3.mock_calls == [
+            call('r3', 'conf-r3', session=None, options={}), call().run()
+        ]
+        assert call.error(bold('FAILED: Step cls2 in REGION r1')) in \
+            mock_logger.mock_calls
+        assert call.error(bold('FAILED: Step cls2 in REGION r2')) in \
+            mock_logger.mock_calls
+        assert call.error(bold('FAILED: Step cls4 (global)')) in \
+            mock_logger.mock_calls
+        assert call.error(
+            'Not run because of failed dependencies: %s',
+            'Step cls3 in REGION r1'
+        ) in mock_logger.mock_calls
+        errs = [
+            c for c in mock_logger.mock_calls
+            if c[0] == 'error' and c[1][0] == 'Failure in %s:\n%s'
+        ]
+        assert len(errs) == 3
+        assert errs[0][1][1:] == ('Step cls2 in REGION r1', 'Traceback r1')
+        assert errs[1][1][1] == 'Step cls2 in REGION r2'
+        assert 'RuntimeError: pool broke' in errs[1][1][2]
+        assert errs[2][1][1] == 'Step cls4 (global)'
+        assert 'SystemExit: 1' in errs[2][1][2]
+
+    def test_run_graph_parallel_circular(self):
+        m_conf = Mock(spec_set=ManheimConfig)
+        graph = {
+            (self.cls2, 'r1'): {(self.cls3, 'r1')},
+            (self.cls3, 'r1'): {(self.cls2, 'r1')}
+        }
+        configs = {k: 'conf' for k in graph}
+        cls = self._runner(m_conf, parallel_regions=2)
+        with patch('%s.logger' % pbm, autospec=True):
+            with pytest.raises(RuntimeError) as exc:
+                cls._run_graph('run', self.steps, ['r1'], graph, configs)
+        assert str(exc.value) == 'ERROR: Circular step dependencies ' \
+                                 'between: Step cls2 in REGION r1, ' \
+                                 'Step cls3 in REGION r1'
+
+
+class FakeRegionStep(BaseStep):
+
+    name = 'fakeregion'
+
+    def run(self):
+        logging.getLogger('foo').warning('running in %s', self.region_name)
+
+    def dryrun(self):
+        logging.getLogger('foo').warning(
+            'dryrun with %s', self.config
+        )
+        sys.exit(1)
+
+
+class TestRunTask(object):
+
+    def test_run(self):
+        orig_handlers = logging.getLogger().handlers[:]
+        output, error = runner.run_task(
+            'run', FakeRegionStep, 'rName', 'rConf', {}
+        )
+        assert error is None
+        assert output.endswith('WARNING] [rName] running in rName\n')
+        assert logging.getLogger().handlers == orig_handlers
+
+    def test_dryrun_failure(self):
+        orig_handlers = logging.getLogger().handlers[:]
+        output, error = runner.run_task(
+            'dryrun', FakeRegionStep, 'rName', 'rConf', {}
+        )
+        assert output.endswith('WARNING] [rName] dryrun with rConf\n')
+        assert error.startswith('Traceback')
+        assert 'SystemExit: 1' in error
+        assert logging.getLogger().handlers == orig_handlers
+
+
+class FakeProcess(object):
+
+    def __init__(self, exitcodes, started, target=None, name=None, args=()):
+        self.exitcode = None
+        self._exitcodes = exitcodes
+        self._started = started
+        self.target = target
+        self.name = name
+        self.args = args
+        self.sentinel = name
+
+    def start(self):
+        self._started.append(self)
+
+    def join(self):
+        self.exitcode = self._exitcodes[self.args[1]]
+
+
+class TestMultiAccountRunner(object):
+
+    def setup(self):
+        self.accts = {'a1': '111', 'a2': '222', 'a3': '333'}
+
+    def _runner(self, account_names, **kwargs):
+        with patch('%s.ManheimConfig.list_accounts' % pbm) as mock_la:
+            mock_la.return_value = self.accts
+            with patch('%s.os.path.abspath' % pbm) as mock_abspath:
+                mock_abspath.side_effect = lambda x: '/abs/' + x
+                cls = runner.MultiAccountRunner(
+                    account_names, 'conf.yml', **kwargs
                 )
-        assert self.cls2.mock_calls == [
-            call.run_in_region('r2', m_conf_r2),
-            call.run_in_region('r3', m_conf_r3),
-            call('r3', m_conf_r3),
-            call().dryrun()
+        assert mock_la.mock_calls == [call('conf.yml')]
+        return cls
+
+    def test_init(self):
+        cls = self._runner(
+            ['a1', 'a3'], parallel_regions=2, parallel_accounts=3,
+            assume_role=False, resume=True
+        )
+        assert cls.resume is True
+        assert cls.account_names == ['a1', 'a3']
+        assert cls._config_path == '/abs/conf.yml'
+        assert cls.parallel_regions == 2
+        assert cls.parallel_accounts == 3
+        assert cls.assume_role is False
+
+    def test_init_unknown_accounts(self):
+        with pytest.raises(RuntimeError) as exc:
+            self._runner(['a1', 'foo', 'bar'])
+        assert str(exc.value) == 'ERROR: No account with name(s) "foo", ' \
+                                 '"bar" in conf.yml'
+
+    def test_init_parallel_invalid(self):
+        with pytest.raises(RuntimeError) as exc:
+            self._runner(['a1'], parallel_accounts=0)
+        assert str(exc.value) == 'ERROR: parallel_accounts must be at ' \
+                                 'least 1, not 0'
+        with pytest.raises(RuntimeError) as exc:
+            self._runner(['a1'], parallel_regions=0)
+        assert str(exc.value) == 'ERROR: parallel_regions must be at ' \
+                                 'least 1, not 0'
+
+    def _run(self, cls, exitcodes):
+        started = []
+        max_running = []
+
+        def se_wait(sentinels):
+            max_running.append(len(sentinels))
+            return [sentinels[0]]
+
+        with patch('%s.multiprocessing' % pbm) as mock_mp:
+            mock_mp.Process.side_effect = partial(
+                FakeProcess, exitcodes, started
+            )
+            mock_mp.connection.wait.side_effect = se_wait
+            with patch('%s.setup_account_workdir' % pbm) as mock_saw:
+                mock_saw.side_effect = lambda x: 'wd/' + x
+                with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+                    with patch('%s.os.path.abspath' % pbm) as mock_abspath:
+                        mock_abspath.side_effect = lambda x: '/abs/' + x
+                        try:
+                            cls.run('dryrun', ['r1'], step_names=['s1'],
+                                    skip_steps=['s2'])
+                        finally:
+                            self.mock_logger = mock_logger
+        assert mock_saw.mock_calls == [call(p.args[1]) for p in started]
+        return started, max(max_running)
+
+    def test_run(self):
+        cls = self._runner(['a1', 'a2', 'a3'], parallel_accounts=2)
+        assert cls.resume is False
+        started, max_running = self._run(cls, {'a1': 0, 'a2': 0, 'a3': 0})
+        assert max_running == 2
+        assert [p.name for p in started] == [
+            'account-a1', 'account-a2', 'account-a3'
         ]
-        assert m_conf.config_for_region.mock_calls == [
-            call('r2'),
-            call('r3')
+        assert started[1].target == runner.run_account
+        assert started[1].args == (
+            'dryrun', 'a2', '/abs/conf.yml', 'wd/a2', ['r1'], ['s1'], ['s2'],
+            1, True, False, '/abs/.c7n-accounts/a2.checkpoint.json', {
+                'policygen_cache_path':
+                    '/abs/.c7n-accounts/a2.policygen-cache',
+                'validation_cache_path':
+                    '/abs/.c7n-accounts/a2.validation-cache'
+            }
+        )
+        assert self.mock_logger.mock_calls == [
+            call.info(bold('Beginning dryrun - 3 accounts')),
+            call.info(bold('Starting ACCOUNT a1 (1 of 3) in wd/a1')),
+            call.info(bold('Starting ACCOUNT a2 (2 of 3) in wd/a2')),
+            call.info(bold('Finished: ACCOUNT a1')),
+            call.info(bold('Starting ACCOUNT a3 (3 of 3) in wd/a3')),
+            call.info(bold('Finished: ACCOUNT a2')),
+            call.info(bold('Finished: ACCOUNT a3')),
+            call.info(bold('SUCCESS: All 3 accounts complete!'))
         ]
-        assert mock_logger.mock_calls == [
-            call.info(bold('SKIPPING Step cls2 in REGION 1 of 2 (r2)')),
-            call.info(bold('Step cls2 in REGION 2 of 2 (r3)'))
+
+    def test_run_failures(self):
+        cls = self._runner(['a1', 'a2', 'a3'], parallel_accounts=8)
+        with pytest.raises(RuntimeError) as exc:
+            self._run(cls, {'a1': 1, 'a2': 0, 'a3': -9})
+        assert str(exc.value) == 'ERROR: 2 of 3 accounts failed (a1, a3)'
+        assert self.mock_logger.mock_calls[-3:] == [
+            call.error(bold('FAILED: ACCOUNT a1 (exit code 1)')),
+            call.info(bold('Finished: ACCOUNT a2')),
+            call.error(bold('FAILED: ACCOUNT a3 (exit code -9)'))
+        ]
+
+
+class TestSetupAccountWorkdir(object):
+
+    def test_setup(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'policies' / 'common').mkdir(parents=True)
+        (tmp_path / 'policies' / 'common' / 'foo.yml').write_text('foo')
+        (tmp_path / '.git').mkdir()
+        (tmp_path / '.git' / 'HEAD').write_text('head')
+        (tmp_path / 'manheim-c7n-tools.yml').write_text('conf')
+        # generated outputs, caches and virtualenvs aren't copied
+        (tmp_path / 'custodian_r1.yml').write_text('gen')
+        (tmp_path / 'custodian_r1.json').write_text('gen')
+        (tmp_path / 'dryrun' / 'r1').mkdir(parents=True)
+        (tmp_path / 'docs' / '_build').mkdir(parents=True)
+        (tmp_path / 'docs' / 'index.rst').write_text('docs')
+        (tmp_path / '.tox').mkdir()
+        (tmp_path / '.policygen-cache').mkdir()
+        (tmp_path / '.c7n-validation-cache').mkdir()
+        (tmp_path / '.policygen-manifest.json').write_text('{}')
+        (tmp_path / '.c7n-runner-checkpoint.json').write_text('{}')
+        (tmp_path / 'myenv').mkdir()
+        (tmp_path / 'myenv' / 'pyvenv.cfg').write_text('home = /usr')
+        (tmp_path / 'policies' / '__pycache__').mkdir()
+        # stale copy from a previous run
+        (tmp_path / '.c7n-accounts' / 'a1' / 'old').mkdir(parents=True)
+        (tmp_path / '.c7n-accounts' / 'a2').mkdir(parents=True)
+        res = runner.setup_account_workdir('a1')
+        assert res == os.path.join('.c7n-accounts', 'a1')
+        wd = tmp_path / '.c7n-accounts' / 'a1'
+        assert sorted(os.listdir(str(wd))) == [
+            '.git', 'docs', 'manheim-c7n-tools.yml', 'policies'
+        ]
+        assert os.listdir(str(wd / 'docs')) == ['index.rst']
+        assert os.listdir(str(wd / 'policies')) == ['common']
+        assert (wd / 'policies' / 'common' / 'foo.yml').read_text() == 'foo'
+        assert (wd / '.git').is_symlink()
+        assert os.readlink(str(wd / '.git')) == str(tmp_path / '.git')
+        assert (tmp_path / '.c7n-accounts' / 'a2').exists()
+
+    def test_setup_no_git(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'manheim-c7n-tools.yml').write_text('conf')
+        runner.setup_account_workdir('a1')
+        assert os.listdir(str(tmp_path / '.c7n-accounts' / 'a1')) == [
+            'manheim-c7n-tools.yml'
+        ]
+
+
+class TestRunAccount(object):
+
+    def _run(self, do_assume_role, creds=None, run_exc=None):
+        m_cr = Mock(spec=runner.CustodianRunner)
+        m_cr.config = Mock()
+        m_cr.session = None
+        if run_exc is not None:
+            m_cr.run.side_effect = run_exc
+        m_sess = Mock()
+        m_sess.get_credentials.return_value = creds
+        m_handler = Mock()
+        with patch.multiple(
+            pbm,
+            CustodianRunner=DEFAULT,
+            assume_role_session=DEFAULT
+        ) as mocks:
+            mocks['CustodianRunner'].return_value = m_cr
+            mocks['assume_role_session'].return_value = m_sess
+            with patch('%s.os.chdir' % pbm) as mock_chdir:
+                with patch('%s.logger' % pbm) as mock_logger:
+                    mock_logger.handlers = [m_handler]
+                    runner.run_account(
+                        'run', 'a1', '/conf.yml', 'wd/a1', ['r1'], ['s1'],
+                        ['s2'], 3, do_assume_role, True, '/a1.checkpoint.json',
+                        {
+                            'incremental_policygen': True,
+                            'policygen_cache': True, 'policygen_workers': 1,
+                            'policygen_output_format': 'yaml'
+                        }
+                    )
+        assert mock_chdir.mock_calls == [call('wd/a1')]
+        fmt = m_handler.setFormatter.mock_calls[0][1][0]
+        assert fmt._fmt == '[%(asctime)s %(levelname)s] [a1] %(message)s'
+        assert mocks['CustodianRunner'].mock_calls == [
+            call(
+                'a1', '/conf.yml', parallel_regions=3, resume=True,
+                checkpoint_path='/a1.checkpoint.json',
+                options={
+                    'incremental_policygen': True, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml'
+                }
+            ),
+            call().run(
+                'run', ['r1'], step_names=['s1'], skip_steps=['s2']
+            )
+        ]
+        return m_cr, m_sess, mocks, mock_logger
+
+    def test_assume_role(self):
+        creds = Mock()
+        creds.get_frozen_credentials.return_value = Mock(
+            access_key='AKID', secret_key='SKey', token='SToken'
+        )
+        with patch.dict(os.environ, {'FOO': 'bar'}, clear=True):
+            m_cr, m_sess, mocks, _ = self._run(True, creds=creds)
+            assert os.environ == {
+                'FOO': 'bar',
+                'AWS_ACCESS_KEY_ID': 'AKID',
+                'AWS_SECRET_ACCESS_KEY': 'SKey',
+                'AWS_SESSION_TOKEN': 'SToken'
+            }
+        assert mocks['assume_role_session'].mock_calls == [
+            call(m_cr.config),
+            call().get_credentials(),
+            call().get_credentials().get_frozen_credentials()
         ]
+        assert m_cr.session == m_sess
+
+    def test_assume_role_no_token(self):
+        creds = Mock()
+        creds.get_frozen_credentials.return_value = Mock(
+            access_key='AKID', secret_key='SKey', token=None
+        )
+        with patch.dict(
+            os.environ, {'AWS_SESSION_TOKEN': 'old'}, clear=True
+        ):
+            self._run(True, creds=creds)
+            assert os.environ == {
+                'AWS_ACCESS_KEY_ID': 'AKID',
+                'AWS_SECRET_ACCESS_KEY': 'SKey'
+            }
+
+    def test_assume_role_no_credentials(self):
+        with patch.dict(os.environ, {}, clear=True):
+            m_cr, m_sess, _, _ = self._run(True)
+            assert os.environ == {}
+        assert m_cr.session == m_sess
+
+    def test_no_assume_role(self):
+        with patch.dict(os.environ, {}, clear=True):
+            m_cr, _, mocks, _ = self._run(False)
+            assert os.environ == {}
+        assert mocks['assume_role_session'].mock_calls == []
+        assert m_cr.session is None
+
+    def test_failure(self):
+        with pytest.raises(SystemExit) as exc:
+            self._run(False, run_exc=SystemExit(2))
+        assert exc.value.code == 1
 
 
 class TestParseArgs(object):
@@ -1236,8 +2291,92 @@ class TestParseArgs(object):
         assert p.ACTION == 'run'
         assert p.regions == []
         assert p.config == 'manheim-c7n-tools.yml'
-        assert p.ACCT_NAME == 'aName'
+        assert p.ACCT_NAME == ['aName']
         assert p.assume_role is True
+        assert p.parallel_regions == 1
+        assert p.all_accounts is False
+        assert p.parallel_accounts == 1
+        assert p.incremental_policygen is False
+        assert p.policygen_cache is True
+        assert p.policygen_workers == 1
+        assert p.output_format == 'yaml'
+        assert p.validation_cache is True
+        assert p.mugc_workers == 8
+        assert p.skip_unchanged_lambdas is False
+
+    def test_run_incremental_policygen(self):
+        p = runner.parse_args(['--incremental-policygen', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.incremental_policygen is True
+
+    def test_run_no_policygen_cache(self):
+        p = runner.parse_args(['--no-policygen-cache', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.policygen_cache is False
+
+    def test_run_output_format(self):
+        p = runner.parse_args(['--output-format', 'json', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.output_format == 'json'
+
+    def test_run_no_validation_cache(self):
+        p = runner.parse_args(['--no-validation-cache', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.validation_cache is False
+
+    def test_run_skip_unchanged_lambdas(self):
+        p = runner.parse_args(['--skip-unchanged-lambdas', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.skip_unchanged_lambdas is True
+
+    def test_run_mugc_jobs(self):
+        p = runner.parse_args(['--mugc-jobs', '2', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.mugc_workers == 2
+
+    def test_run_policygen_jobs(self):
+        p = runner.parse_args(['--policygen-jobs', '4', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.policygen_workers == 4
+
+    def test_run_parallel_regions(self):
+        p = runner.parse_args(['--parallel-regions', '4', 'run', 'aName'])
+        assert p.ACTION == 'run'
+        assert p.ACCT_NAME == ['aName']
+        assert p.parallel_regions == 4
+        p = runner.parse_args(['-p', '2', 'dryrun', 'aName'])
+        assert p.ACTION == 'dryrun'
+        assert p.parallel_regions == 2
+
+    def test_run_multiple_accounts(self):
+        p = runner.parse_args(['-P', '3', 'run', 'aName', 'bName'])
+        assert p.ACTION == 'run'
+        assert p.ACCT_NAME == ['aName', 'bName']
+        assert p.all_accounts is False
+        assert p.parallel_accounts == 3
+
+    def test_dryrun_all_accounts(self):
+        p = runner.parse_args(
+            ['--parallel-accounts', '2', 'dryrun', '--all-accounts']
+        )
+        assert p.ACTION == 'dryrun'
+        assert p.ACCT_NAME == []
+        assert p.all_accounts is True
+        assert p.parallel_accounts == 2
+
+    def test_run_no_accounts(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            runner.parse_args(['run'])
+        assert exc.value.code == 2
+        assert 'ACCT_NAME or --all-accounts must be specified' in \
+            capsys.readouterr().err
+
+    def test_run_accounts_and_all_accounts(self, capsys):
+        with pytest.raises(SystemExit) as exc:
+            runner.parse_args(['run', '--all-accounts', 'aName'])
+        assert exc.value.code == 2
+        assert 'ACCT_NAME cannot be specified with --all-accounts' in \
+            capsys.readouterr().err
 
     def test_run_skip_steps(self):
         p = runner.parse_args(
@@ -1249,7 +2388,7 @@ class TestParseArgs(object):
         assert p.ACTION == 'run'
         assert p.regions == []
         assert p.config == 'manheim-c7n-tools.yml'
-        assert p.ACCT_NAME == 'acctName'
+        assert p.ACCT_NAME == ['acctName']
         assert p.assume_role is True
 
     def test_dryrun_info_region(self):
@@ -1260,7 +2399,7 @@ class TestParseArgs(object):
         assert p.ACTION == 'dryrun'
         assert p.regions == ['us-east-1']
         assert p.config == 'manheim-c7n-tools.yml'
-        assert p.ACCT_NAME == 'aName'
+        assert p.ACCT_NAME == ['aName']
         assert p.assume_role is True
 
     def test_list(self):
@@ -1293,7 +2432,7 @@ class TestParseArgs(object):
         assert p.ACTION == 'run'
         assert p.regions == []
         assert p.config == 'manheim-c7n-tools.yml'
-        assert p.ACCT_NAME == 'aName'
+        assert p.ACCT_NAME == ['aName']
         assert p.assume_role is False
 
 
@@ -1305,8 +2444,19 @@ class FakeArgs(object):
     ACTION = None
     regions = []
     config = 'manheim-c7n-tools.yml'
-    ACCT_NAME = 'acctName'
+    ACCT_NAME = ['acctName']
+    all_accounts = False
     assume_role = True
+    parallel_regions = 1
+    parallel_accounts = 1
+    resume = False
+    incremental_policygen = False
+    policygen_cache = True
+    policygen_workers = 1
+    output_format = 'yaml'
+    validation_cache = True
+    mugc_workers = 8
+    skip_unchanged_lambdas = False
 
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
@@ -1341,7 +2491,15 @@ class TestMain(object):
         assert mocks['set_log_debug'].mock_calls == []
         assert mocks['set_log_info'].mock_calls == []
         assert mocks['CustodianRunner'].mock_calls == [
-            call('acctName', 'manheim-c7n-tools.yml'),
+            call(
+                'acctName', 'manheim-c7n-tools.yml', parallel_regions=1,
+                resume=False, options={
+                    'incremental_policygen': False, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml',
+                    'validation_cache': True, 'mugc_workers': 8,
+                    'skip_unchanged_lambdas': False
+                }
+            ),
             call().run(
                 'run', ['foo2'], step_names=[], skip_steps=[]
             )
@@ -1444,7 +2602,8 @@ class TestMain(object):
         ) as mocks:
             mocks['parse_args'].return_value = FakeArgs(
                 ACTION='dryrun', verbose=2, steps=['foo'], skip=['bar'],
-                config='foo.yml', ACCT_NAME='aName', assume_role=True
+                config='foo.yml', ACCT_NAME=['aName'], assume_role=True,
+                parallel_regions=4, resume=True, incremental_policygen=True
             )
             mocks['CustodianRunner'].return_value = m_cr
             runner.main()
@@ -1455,7 +2614,15 @@ class TestMain(object):
         assert mocks['set_log_debug'].mock_calls == [call(runner.logger)]
         assert mocks['set_log_info'].mock_calls == []
         assert mocks['CustodianRunner'].mock_calls == [
-            call('aName', 'foo.yml'),
+            call(
+                'aName', 'foo.yml', parallel_regions=4, resume=True,
+                options={
+                    'incremental_policygen': True, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml',
+                    'validation_cache': True, 'mugc_workers': 8,
+                    'skip_unchanged_lambdas': False
+                }
+            ),
             call().run(
                 'dryrun', [], step_names=['foo'], skip_steps=['bar']
             )
@@ -1464,3 +2631,112 @@ class TestMain(object):
         assert captured.out == ''
         assert captured.err == ''
         assert mocks['assume_role'].mock_calls == [call(m_conf)]
+
+    def test_run_multiple_accounts(self, capsys):
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            MultiAccountRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', ACCT_NAME=['a1', 'a2'], parallel_regions=2,
+                parallel_accounts=3, regions=['r1']
+            )
+            runner.main()
+        assert mocks['CustodianRunner'].mock_calls == []
+        assert mocks['MultiAccountRunner'].mock_calls == [
+            call(
+                ['a1', 'a2'], 'manheim-c7n-tools.yml', parallel_regions=2,
+                parallel_accounts=3, assume_role=True, resume=False,
+                options={
+                    'incremental_policygen': False, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml',
+                    'validation_cache': True, 'mugc_workers': 8,
+                    'skip_unchanged_lambdas': False
+                }
+            ),
+            call().run('run', ['r1'], step_names=[], skip_steps=[])
+        ]
+        assert mocks['ManheimConfig'].mock_calls == []
+        assert mocks['assume_role'].mock_calls == []
+
+    def test_dryrun_all_accounts(self, capsys):
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            MultiAccountRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='dryrun', ACCT_NAME=[], all_accounts=True,
+                assume_role=False, resume=True
+            )
+            mocks['ManheimConfig'].list_accounts.return_value = {
+                'b': '2', 'a': '1', 'c': '3'
+            }
+            runner.main()
+        assert mocks['CustodianRunner'].mock_calls == []
+        assert mocks['MultiAccountRunner'].mock_calls == [
+            call(
+                ['a', 'b', 'c'], 'manheim-c7n-tools.yml', parallel_regions=1,
+                parallel_accounts=1, assume_role=False, resume=True,
+                options={
+                    'incremental_policygen': False, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml',
+                    'validation_cache': True, 'mugc_workers': 8,
+                    'skip_unchanged_lambdas': False
+                }
+            ),
+            call().run('dryrun', [], step_names=[], skip_steps=[])
+        ]
+        assert mocks['ManheimConfig'].mock_calls == [
+            call.list_accounts('manheim-c7n-tools.yml')
+        ]
+        assert mocks['assume_role'].mock_calls == []
+
+    def test_run_all_accounts_single(self, capsys):
+        m_cr = Mock(spec_set=runner.CustodianRunner)
+        m_conf = Mock(spec_set=ManheimConfig)
+        type(m_cr).config = m_conf
+        with patch.multiple(
+            pbm,
+            autospec=True,
+            parse_args=DEFAULT,
+            set_log_debug=DEFAULT,
+            set_log_info=DEFAULT,
+            CustodianRunner=DEFAULT,
+            MultiAccountRunner=DEFAULT,
+            ManheimConfig=DEFAULT,
+            assume_role=DEFAULT
+        ) as mocks:
+            mocks['parse_args'].return_value = FakeArgs(
+                ACTION='run', ACCT_NAME=[], all_accounts=True
+            )
+            mocks['ManheimConfig'].list_accounts.return_value = {'a': '1'}
+            mocks['CustodianRunner'].return_value = m_cr
+            runner.main()
+        assert mocks['MultiAccountRunner'].mock_calls == []
+        assert mocks['CustodianRunner'].mock_calls == [
+            call(
+                'a', 'manheim-c7n-tools.yml', parallel_regions=1,
+                resume=False, options={
+                    'incremental_policygen': False, 'policygen_cache': True,
+                    'policygen_workers': 1, 'policygen_output_format': 'yaml',
+                    'validation_cache': True, 'mugc_workers': 8,
+                    'skip_unchanged_lambdas': False
+                }
+            ),
+            call().run('run', [], step_names=[], skip_steps=[])
+        ]
+        assert mocks['assume_role'].mock_calls == [call(m_conf)]
@@ -19,7 +19,8 @@ from datetime import datetime
 
 from manheim_c7n_tools.utils import (
     set_log_debug, set_log_info, set_log_level_format, red, green, bold,
-    git_html_url, assume_role
+    git_html_url, assume_role, assume_role_session, env_macros,
+    MacroSubstituter
 )
 from manheim_c7n_tools.config import ManheimConfig
 
@@ -162,7 +163,7 @@ class TestAssumeRole(object):
         })
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch.dict(os.environ, {}, clear=True):
-                with patch('%s.boto3.session.Session' % pbm) as mock_boto:
+                with patch('boto3.session.Session') as mock_boto:
                     mock_boto.return_value = m_sess
                     assume_role(self.m_conf)
                     assert os.environ == {
@@ -215,7 +216,7 @@ class TestAssumeRole(object):
         })
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch.dict(os.environ, {}, clear=True):
-                with patch('%s.boto3.session.Session' % pbm) as mock_boto:
+                with patch('boto3.session.Session') as mock_boto:
                     mock_boto.return_value = m_sess
                     assume_role(self.m_conf)
                     assert os.environ == {
@@ -265,7 +266,7 @@ class TestAssumeRole(object):
         m_sess.client.return_value = m_sts
         with patch('%s.logger' % pbm, autospec=True) as mock_logger:
             with patch.dict(os.environ, {}, clear=True):
-                with patch('%s.boto3.session.Session' % pbm) as mock_boto:
+                with patch('boto3.session.Session') as mock_boto:
                     mock_boto.return_value = m_sess
                     assume_role(self.m_conf)
                     assert os.environ == {}
@@ -273,3 +274,152 @@ class TestAssumeRole(object):
         assert mock_logger.mock_calls == [
             call.debug('No assume_role configuration; not assuming a role.')
         ]
+
+
+class TestAssumeRoleSession(object):
+
+    def setup(self):
+        self.m_conf = Mock(spec_set=ManheimConfig)
+        type(self.m_conf).account_name = PropertyMock(return_value='aName')
+
+    def test_success(self):
+        m_sts = Mock()
+        m_sts.assume_role.return_value = {
+            'Credentials': {
+                'AccessKeyId': 'AKID',
+                'SecretAccessKey': 'SKey',
+                'SessionToken': 'SToken',
+                'Expiration': datetime(2018, 10, 8, 12, 13, 14)
+            },
+            'AssumedRoleUser': {
+                'AssumedRoleId': 'ARid',
+                'Arn': 'UserARN'
+            },
+            'PackedPolicySize': 123
+        }
+        m_sess = Mock()
+        m_sess.client.return_value = m_sts
+        type(self.m_conf).assume_role = PropertyMock(return_value={
+            'role_arn': 'assumeRoleArn'
+        })
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch.dict(os.environ, {}, clear=True):
+                with patch('boto3.session.Session') as mock_boto:
+                    mock_boto.return_value = m_sess
+                    res = assume_role_session(self.m_conf)
+                    assert os.environ == {}
+        assert res == m_sess
+        expected_args = {
+            'RoleArn': 'assumeRoleArn',
+            'RoleSessionName': 'manheim-c7n-tools_aName'
+        }
+        assert mock_boto.mock_calls == [
+            call(region_name='us-east-1'),
+            call().client('sts'),
+            call().client().assume_role(**expected_args),
+            call(
+                aws_access_key_id='AKID',
+                aws_secret_access_key='SKey',
+                aws_session_token='SToken'
+            )
+        ]
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Calling sts:AssumeRole via boto3 with arguments: %s',
+                expected_args
+            ),
+            call.info(
+                'Created boto3 Session with AssumeRole credentials; '
+                'AccessKeyId %s expires at %s; AssumedRoleUser ARN: %s',
+                'AKID', datetime(2018, 10, 8, 12, 13, 14), 'UserARN'
+            )
+        ]
+
+    def test_no_role_arn(self):
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            with patch('boto3.session.Session') as mock_boto:
+                res = assume_role_session(self.m_conf)
+        assert mock_boto.mock_calls == [call()]
+        assert res == mock_boto.return_value
+        assert mock_logger.mock_calls == [
+            call.debug('No assume_role configuration; not assuming a role.')
+        ]
+
+
+class TestEnvMacros(object):
+
+    @patch.dict(
+        'os.environ',
+        {'POLICYGEN_ENV_foo': 'bar', 'POLICYGEN_ENV_X': 'y', 'Other': 'z'},
+        clear=True
+    )
+    def test_env_macros(self):
+        assert env_macros() == {
+            'POLICYGEN_ENV_foo': 'bar', 'POLICYGEN_ENV_X': 'y'
+        }
+
+
+class TestMacroSubstituter(object):
+
+    def test_substitute(self):
+        m = MacroSubstituter({
+            'AWS_REGION': 'us-east-1', 'ACCOUNT': 'acct', 'ACCOUNT_ID': '123'
+        })
+        assert m.substitute(
+            'a%%AWS_REGION%%b%%ACCOUNT%%%%ACCOUNT_ID%%c%%AWS_REGION%%'
+        ) == ('aus-east-1bacct123cus-east-1', [])
+
+    def test_no_macros(self):
+        m = MacroSubstituter({'AWS_REGION': 'us-east-1'})
+        assert m.substitute('foo % bar %% baz') == ('foo % bar %% baz', [])
+
+    def test_empty(self):
+        m = MacroSubstituter({})
+        assert m.substitute('a%%AWS_REGION%%') == (
+            'a%%AWS_REGION%%', ['AWS_REGION']
+        )
+
+    def test_unresolved(self):
+        m = MacroSubstituter({'BAR': 'x'})
+        assert m.substitute('%%FOO%% %%BAR%% %%BAZ%% %%FOO%% %%bad name%%') == (
+            '%%FOO%% x %%BAZ%% %%FOO%% %%bad name%%', ['BAZ', 'FOO']
+        )
+
+    def test_overlapping(self):
+        # same leftmost-match semantics as str.replace() for known macros
+        m = MacroSubstituter({'BAR': 'x'})
+        assert m.substitute('%%FOO%%BAR%%')[0] == '%%FOOx'
+
+    def test_nested(self):
+        m = MacroSubstituter({
+            'DLQ_ARN': 'arn:%%AWS_REGION%%:%%ACCOUNT_ID%%',
+            'AWS_REGION': 'us-east-2',
+            'ACCOUNT_ID': '%%POLICYGEN_ENV_id%%',
+            'POLICYGEN_ENV_id': '1234'
+        })
+        assert m.substitute('x%%DLQ_ARN%%x') == ('xarn:us-east-2:1234x', [])
+
+    def test_cycle(self):
+        m = MacroSubstituter({'A': 'a%%B%%', 'B': 'b%%A%%', 'C': '%%C%%c'})
+        assert m.substitute('%%A%% %%C%%') == ('ab%%A%% %%C%%c', ['A', 'C'])
+
+    def test_substitute_structure(self):
+        m = MacroSubstituter({'A': 'a', 'B': 'b'})
+        orig = {
+            'x%%A%%': ['%%B%%', 1, None, {'k': '%%C%%'}],
+            'y': True,
+            2: '%%A%%%%D%%'
+        }
+        res, unresolved = m.substitute_structure(orig)
+        assert res == {
+            'xa': ['b', 1, None, {'k': '%%C%%'}],
+            'y': True,
+            2: 'a%%D%%'
+        }
+        assert unresolved == ['C', 'D']
+        assert orig['x%%A%%'][3] == {'k': '%%C%%'}
+        assert res['xa'][3] is not orig['x%%A%%'][3]
+
+    def test_special_characters(self):
+        m = MacroSubstituter({'A': r'\1 $0 \g<0>'})
+        assert m.substitute('x%%A%%x') == (r'x\1 $0 \g<0>x', [])
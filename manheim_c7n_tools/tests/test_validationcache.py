@@ -0,0 +1,224 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+from unittest.mock import patch, call, DEFAULT
+
+import pytest
+from c7n.version import version as c7n_version
+
+from manheim_c7n_tools.policy_artifacts import PolicyArtifacts
+from manheim_c7n_tools.policygen import policy_fingerprint
+from manheim_c7n_tools.validationcache import (
+    ValidationCache, validate_custodian_config, _validate_policy,
+    CACHE_VERSION
+)
+
+pbm = 'manheim_c7n_tools.validationcache'
+
+P1 = {'name': 'p1', 'resource': 'ec2', 'filters': [{'State.Name': 'running'}]}
+P2 = {'name': 'p2', 'resource': 'aws.s3'}
+P3 = {'name': 'p3', 'resource': 'ec2', 'actions': [{'type': 'stop', 'foo': 1}]}
+
+
+class TestValidationCache(object):
+
+    def test_miss_and_hit(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        cls = ValidationCache('foo/custodian_r1.yml', path=cdir)
+        assert cls.get('h1') is None
+        cls.add('h1', 'p1')
+        cls.add('h2', 'p2', 'deprecated')
+        cls.save()
+        fpath = os.path.join(cdir, 'custodian_r1.json')
+        with open(fpath) as fh:
+            data = json.load(fh)
+        assert data == {
+            'version': [CACHE_VERSION, c7n_version],
+            'policies': {
+                'h1': {'name': 'p1', 'deprecations': None},
+                'h2': {'name': 'p2', 'deprecations': 'deprecated'}
+            }
+        }
+        # same config name in a different format shares the cache
+        cls = ValidationCache('custodian_r1.json', path=cdir)
+        assert cls.get('h2') == {'name': 'p2', 'deprecations': 'deprecated'}
+        assert cls.get('h3') is None
+        assert cls.hits == 1
+        assert cls.misses == 1
+        cls.save()
+        with open(fpath) as fh:
+            data = json.load(fh)
+        # h1 evicted
+        assert list(data['policies'].keys()) == ['h2']
+
+    def test_unchanged(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        cls = ValidationCache('custodian_r1.yml', path=cdir)
+        cls.get('h1')
+        cls.add('h1', 'p1')
+        cls.save()
+        cls = ValidationCache('custodian_r1.yml', path=cdir)
+        assert cls.get('h1') is not None
+        with patch('%s.os.replace' % pbm) as mock_replace:
+            cls.save()
+        assert mock_replace.mock_calls == []
+
+    def test_never_loaded(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        ValidationCache('custodian_r1.yml', path=cdir).save()
+        assert not os.path.exists(cdir)
+
+    def test_other_version(self, tmp_path):
+        cdir = tmp_path / 'cache'
+        cdir.mkdir()
+        (cdir / 'custodian_r1.json').write_text(json.dumps({
+            'version': [CACHE_VERSION, '0.0.1'],
+            'policies': {'h1': {'name': 'p1', 'deprecations': None}}
+        }))
+        cls = ValidationCache('custodian_r1.yml', path=str(cdir))
+        assert cls.get('h1') is None
+
+    def test_unreadable(self, tmp_path):
+        cdir = tmp_path / 'cache'
+        cdir.mkdir()
+        (cdir / 'custodian_r1.json').write_text('{not json')
+        cls = ValidationCache('custodian_r1.yml', path=str(cdir))
+        assert cls.get('h1') is None
+
+
+class TestValidatePolicy(object):
+
+    def _args(self):
+        from c7n import schema
+        from c7n.config import Config
+        from c7n.resources import load_resources
+        load_resources(['aws.ec2', 'aws.s3'])
+        return schema.generate(), Config.empty(
+            dryrun=True, account_id='na', region='na'
+        )
+
+    def test_valid(self):
+        assert _validate_policy(P1, *self._args()) == ([], None)
+
+    def test_invalid_schema(self):
+        errors, deprecations = _validate_policy(P3, *self._args())
+        assert len(errors) > 0
+        assert deprecations is None
+
+    def test_invalid_policy(self):
+        errors, deprecations = _validate_policy(
+            {
+                'name': 'p4', 'resource': 'ec2',
+                'actions': [{'type': 'mark-for-op', 'op': 'nope'}]
+            },
+            *self._args()
+        )
+        assert len(errors) == 1
+        assert errors[0].startswith('Policy: p4 is invalid: ')
+        assert deprecations is None
+
+
+class TestValidateCustodianConfig(object):
+
+    def setup_method(self):
+        PolicyArtifacts.clear()
+
+    def teardown_method(self):
+        PolicyArtifacts.clear()
+
+    def _write(self, tmp_path, policies):
+        path = tmp_path / 'custodian_r1.json'
+        path.write_text(json.dumps({'policies': policies}))
+        PolicyArtifacts.clear()
+        return str(path)
+
+    def test_cached(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(tmp_path, [P1, P2])
+        with patch(
+            '%s._validate_policy' % pbm, wraps=_validate_policy
+        ) as mock_vp:
+            validate_custodian_config(path, ValidationCache(path, cdir))
+            assert [c[1][0] for c in mock_vp.mock_calls] == [P1, P2]
+            mock_vp.reset_mock()
+            validate_custodian_config(path, ValidationCache(path, cdir))
+            assert mock_vp.mock_calls == []
+            # change one policy
+            p2 = dict(P2, comment='changed')
+            path = self._write(tmp_path, [P1, p2])
+            validate_custodian_config(path, ValidationCache(path, cdir))
+            assert [c[1][0] for c in mock_vp.mock_calls] == [p2]
+
+    def test_cached_skips_schema(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(tmp_path, [P1])
+        validate_custodian_config(path, ValidationCache(path, cdir))
+        with patch('c7n.schema.generate') as mock_generate:
+            with patch('%s.logger' % pbm) as mock_logger:
+                validate_custodian_config(path, ValidationCache(path, cdir))
+        assert mock_generate.mock_calls == []
+        assert mock_logger.info.mock_calls[-1][1][:4] == (
+            'Configuration valid: %s (%d of %d policies validated, others '
+            'cached; %.2fs)', path, 0, 1
+        )
+
+    def test_invalid(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(tmp_path, [P1, P3])
+        with pytest.raises(SystemExit):
+            validate_custodian_config(path, ValidationCache(path, cdir))
+        # the valid policy was still cached
+        cache = ValidationCache(path, cdir)
+        assert cache.get(policy_fingerprint(P1)) is not None
+        assert cache.get(policy_fingerprint(P3)) is None
+
+    def test_duplicate_names(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(tmp_path, [P1, dict(P2, name='p1')])
+        with patch('%s.logger' % pbm) as mock_logger:
+            with pytest.raises(SystemExit):
+                validate_custodian_config(path, ValidationCache(path, cdir))
+        assert call.error(
+            '%s', 'Only one policy with a given name allowed, duplicates: p1'
+        ) in mock_logger.mock_calls
+
+    def test_invalid_structure(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(
+            tmp_path, [{'name': 'p1', 'resource': 'ec2', 'foo': 1}]
+        )
+        with pytest.raises(SystemExit):
+            validate_custodian_config(path, ValidationCache(path, cdir))
+
+    def test_deprecations(self, tmp_path):
+        cdir = str(tmp_path / 'cache')
+        path = self._write(tmp_path, [P1, P2])
+        with patch.multiple(
+            pbm, _validate_policy=DEFAULT, logger=DEFAULT
+        ) as mocks:
+            mocks['_validate_policy'].side_effect = [
+                ([], None), ([], 'p2 is deprecated')
+            ]
+            validate_custodian_config(path, ValidationCache(path, cdir))
+            assert call.warning(
+                'deprecated usage found in policy\n%s', 'p2 is deprecated'
+            ) in mocks['logger'].mock_calls
+            mocks['logger'].reset_mock()
+            validate_custodian_config(path, ValidationCache(path, cdir))
+            assert call.warning(
+                'deprecated usage found in policy\n%s', 'p2 is deprecated'
+            ) in mocks['logger'].mock_calls
+        assert len(mocks['_validate_policy'].mock_calls) == 2
@@ -0,0 +1,154 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+from unittest.mock import patch, call, Mock
+
+import pytest
+import yaml
+
+from manheim_c7n_tools.yamlcache import YamlCache, BaseCache
+
+pbm = 'manheim_c7n_tools.yamlcache'
+
+
+def parse(path, contents):
+    return yaml.safe_load(contents)
+
+
+class TestBaseCache(object):
+
+    def test_abstract(self, tmp_path):
+        with pytest.raises(TypeError):
+            BaseCache(str(tmp_path), 'foo')
+
+        class Incomplete(BaseCache):
+
+            def _read(self, fh):
+                return {}
+
+        with pytest.raises(TypeError):
+            Incomplete(str(tmp_path), 'foo')
+
+
+class TestYamlCache(object):
+
+    def _write(self, path, content, mtime_ns=None):
+        path.write_text(content)
+        if mtime_ns is not None:
+            os.utime(str(path), ns=(mtime_ns, mtime_ns))
+        return str(path)
+
+    def test_miss_and_hit(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n')
+        cdir = str(tmp_path / 'cache')
+        m_parse = Mock(wraps=parse)
+        cls = YamlCache(cdir)
+        assert cls.get(f1, m_parse) == {'name': 'f1'}
+        cls.save()
+        assert os.path.exists(os.path.join(cdir, 'yaml.pickle'))
+        cls = YamlCache(cdir)
+        res = cls.get(f1, m_parse)
+        assert res == {'name': 'f1'}
+        # each call returns a new object
+        assert cls.get(f1, m_parse) is not res
+        assert m_parse.mock_calls == [call(f1, 'name: f1\n')]
+        assert cls.hits == 2
+        assert cls.misses == 0
+
+    def test_changed(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n', 1000)
+        cdir = str(tmp_path / 'cache')
+        cls = YamlCache(cdir)
+        cls.get(f1, parse)
+        cls.save()
+        # same size, but different mtime and hash
+        self._write(tmp_path / 'f1.yml', 'name: f2\n', 2000)
+        cls = YamlCache(cdir)
+        assert cls.get(f1, parse) == {'name': 'f2'}
+        assert cls.misses == 1
+
+    def test_touched(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n', 1000)
+        cdir = str(tmp_path / 'cache')
+        cls = YamlCache(cdir)
+        cls.get(f1, parse)
+        cls.save()
+        self._write(tmp_path / 'f1.yml', 'name: f1\n', 2000)
+        m_parse = Mock(wraps=parse)
+        cls = YamlCache(cdir)
+        assert cls.get(f1, m_parse) == {'name': 'f1'}
+        assert m_parse.mock_calls == []
+        cls.save()
+        with open(os.path.join(cdir, 'yaml.pickle'), 'rb') as fh:
+            data = pickle.load(fh)
+        assert data['files'][f1][1] == 2000
+
+    def test_evict(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n')
+        f2 = self._write(tmp_path / 'f2.yml', 'name: f2\n')
+        cdir = str(tmp_path / 'cache')
+        cls = YamlCache(cdir)
+        cls.get(f1, parse)
+        cls.get(f2, parse)
+        cls.save()
+        cls = YamlCache(cdir)
+        cls.get(f1, parse)
+        cls.save()
+        with open(os.path.join(cdir, 'yaml.pickle'), 'rb') as fh:
+            data = pickle.load(fh)
+        assert list(data['files'].keys()) == [f1]
+
+    def test_save_unchanged(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n')
+        cdir = str(tmp_path / 'cache')
+        cls = YamlCache(cdir)
+        cls.save()
+        assert not os.path.exists(cdir)
+        cls.get(f1, parse)
+        cls.save()
+        cls = YamlCache(cdir)
+        cls.get(f1, parse)
+        with patch('%s.pickle.dump' % pbm) as mock_dump:
+            cls.save()
+        assert mock_dump.mock_calls == []
+
+    def test_other_version(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n')
+        cdir = tmp_path / 'cache'
+        cdir.mkdir()
+        with open(str(cdir / 'yaml.pickle'), 'wb') as fh:
+            pickle.dump({'version': [0, 'x'], 'files': {
+                f1: (0, 0, 'x', pickle.dumps('wrong'))
+            }}, fh)
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = YamlCache(str(cdir))
+            assert cls.get(f1, parse) == {'name': 'f1'}
+        assert mock_logger.mock_calls == [
+            call.info(
+                'Ignoring %s at %s from a different version', 'YAML cache',
+                str(cdir / 'yaml.pickle')
+            )
+        ]
+
+    def test_unreadable(self, tmp_path):
+        f1 = self._write(tmp_path / 'f1.yml', 'name: f1\n')
+        cdir = tmp_path / 'cache'
+        cdir.mkdir()
+        (cdir / 'yaml.pickle').write_text('garbage')
+        with patch('%s.logger' % pbm, autospec=True) as mock_logger:
+            cls = YamlCache(str(cdir))
+            assert cls.get(f1, parse) == {'name': 'f1'}
+        assert mock_logger.warning.call_count == 1
@@ -17,8 +17,6 @@ import subprocess
 import re
 import os
 
-import boto3
-
 logger = logging.getLogger(__name__)
 
 
@@ -134,22 +132,21 @@ def git_html_url():
     return 'https://%s/%s/' % (m.group('hostname'), m.group('path'))
 
 
-def assume_role(config):
+def _sts_assume_role(config):
     """
     Call sts:AssumeRole (via boto3) to assume the role specified by the
-    configuration. Export the resulting credentials as environment variables
-    for the current process.
-
-    The configuration is taken from the ``assume_role`` section of the config.
+    ``assume_role`` section of the configuration, if present.
 
     :param config: ManheimConfig object containing assume_role configuration
     :type config: ManheimConfig
+    :return: sts:AssumeRole response, or None if no role is configured
+    :rtype: dict
     """
     try:
         conf = config.assume_role
     except AttributeError:
         logger.debug('No assume_role configuration; not assuming a role.')
-        return
+        return None
     kwargs = {
         'RoleArn': conf['role_arn'],
         'RoleSessionName': 'manheim-c7n-tools_%s' % config.account_name
@@ -164,9 +161,26 @@ def assume_role(config):
     # We need to prevent STS from using the botocore/boto3 default session,
     # or else the default session will have the creds from the previous
     # account, not the assumed role, and none of this will work...
+    import boto3
     sess = boto3.session.Session(region_name='us-east-1')
     sts = sess.client('sts')
-    resp = sts.assume_role(**kwargs)
+    return sts.assume_role(**kwargs)
+
+
+def assume_role(config):
+    """
+    Call sts:AssumeRole (via boto3) to assume the role specified by the
+    configuration. Export the resulting credentials as environment variables
+    for the current process.
+
+    The configuration is taken from the ``assume_role`` section of the config.
+
+    :param config: ManheimConfig object containing assume_role configuration
+    :type config: ManheimConfig
+    """
+    resp = _sts_assume_role(config)
+    if resp is None:
+        return
     os.environ['AWS_ACCESS_KEY_ID'] = resp['Credentials']['AccessKeyId']
     os.environ['AWS_SECRET_ACCESS_KEY'] = resp[
         'Credentials'
@@ -178,3 +192,151 @@ def assume_role(config):
         resp['Credentials']['Expiration'],
         resp['AssumedRoleUser']['Arn']
     )
+
+
+def assume_role_session(config):
+    """
+    Return a new boto3 Session for the account specified by the
+    configuration. If the configuration has an ``assume_role`` section, the
+    session uses credentials from calling sts:AssumeRole for that role;
+    otherwise it uses boto3's default credential chain. Unlike
+    :py:func:`~.assume_role`, this does not modify the environment of the
+    current process.
+
+    :param config: ManheimConfig object containing assume_role configuration
+    :type config: ManheimConfig
+    :return: boto3 Session for the account
+    :rtype: boto3.session.Session
+    """
+    import boto3
+    resp = _sts_assume_role(config)
+    if resp is None:
+        return boto3.session.Session()
+    logger.info(
+        'Created boto3 Session with AssumeRole credentials; AccessKeyId %s '
+        'expires at %s; AssumedRoleUser ARN: %s',
+        resp['Credentials']['AccessKeyId'], resp['Credentials']['Expiration'],
+        resp['AssumedRoleUser']['Arn']
+    )
+    return boto3.session.Session(
+        aws_access_key_id=resp['Credentials']['AccessKeyId'],
+        aws_secret_access_key=resp['Credentials']['SecretAccessKey'],
+        aws_session_token=resp['Credentials']['SessionToken']
+    )
+
+
+#: Regex matching any ``%%NAME%%`` macro
+MACRO_RE = re.compile(r'%%([A-Za-z0-9_]+)%%')
+
+
+def env_macros():
+    """
+    Return a dict of the names and values of all ``POLICYGEN_ENV_*``
+    environment variables, for use as macros with
+    :py:class:`~.MacroSubstituter`.
+
+    :return: dict of environment variable names to values
+    :rtype: dict
+    """
+    return {
+        k: v for k, v in os.environ.items() if k.startswith('POLICYGEN_ENV_')
+    }
+
+
+class MacroSubstituter(object):
+    """
+    Substitute ``%%NAME%%`` macros in strings, in a single pass regardless of
+    the number of macros. Macros in the values of other macros are expanded
+    when the substituter is constructed.
+    """
+
+    def __init__(self, macros):
+        """
+        :param macros: dict of macro names (without the surrounding ``%%``) to
+          their string values
+        :type macros: dict
+        """
+        self._macros = {}
+        for name in macros:
+            self._resolve(name, macros, [])
+        self._re = None
+        if self._macros:
+            self._re = re.compile('%%(' + '|'.join(
+                re.escape(k) for k in sorted(
+                    self._macros, key=len, reverse=True
+                )
+            ) + ')%%')
+
+    def _resolve(self, name, macros, resolving):
+        """
+        Expand any macros in the value of macro ``name``, recursively, and
+        store the result in ``self._macros``. Macros that refer to themselves
+        (directly or indirectly) are left unexpanded.
+
+        :param name: name of the macro to resolve
+        :type name: str
+        :param macros: dict of macro names to unexpanded values
+        :type macros: dict
+        :param resolving: names of the macros currently being resolved
+        :type resolving: list
+        :return: expanded value of the macro
+        :rtype: str
+        """
+        if name in self._macros:
+            return self._macros[name]
+
+        stack = resolving + [name]
+
+        def _repl(m):
+            n = m.group(1)
+            if n not in macros or n in stack:
+                return m.group(0)
+            return self._resolve(n, macros, stack)
+
+        val = MACRO_RE.sub(_repl, macros[name])
+        self._macros[name] = val
+        return val
+
+    def substitute(self, s):
+        """
+        Replace all occurrences of known macros in ``s`` with their values.
+
+        :param s: the string to substitute macros in
+        :type s: str
+        :return: 2-tuple of the resulting string, and a sorted list of the
+          names of any ``%%NAME%%`` macros in it that were not known
+        :rtype: tuple
+        """
+        if '%%' not in s:
+            return s, []
+        if self._re is not None:
+            s = self._re.sub(lambda m: self._macros[m.group(1)], s)
+            if '%%' not in s:
+                return s, []
+        return s, sorted(set(MACRO_RE.findall(s)))
+
+    def substitute_structure(self, obj):
+        """
+        Return a copy of a structure of nested dicts and lists with macros
+        substituted in all strings within it, including dict keys. Values
+        other than dicts, lists and strings are returned unchanged.
+
+        :param obj: the structure to substitute macros in
+        :return: 2-tuple of the resulting structure, and a sorted list of the
+          names of any ``%%NAME%%`` macros in it that were not known
+        :rtype: tuple
+        """
+        unresolved = set()
+
+        def _walk(o):
+            if isinstance(o, str):
+                res, missing = self.substitute(o)
+                unresolved.update(missing)
+                return res
+            if isinstance(o, dict):
+                return {_walk(k): _walk(v) for k, v in o.items()}
+            if isinstance(o, list):
+                return [_walk(x) for x in o]
+            return o
+
+        return _walk(obj), sorted(unresolved)
@@ -0,0 +1,250 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Persistent on-disk cache of the policies that c7n has validated, used by the
+:py:mod:`~.runner` ``validate`` step to only validate policies that are new or
+have changed since the last run.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from collections import Counter
+
+from manheim_c7n_tools.policy_artifacts import PolicyArtifacts
+from manheim_c7n_tools.policygen import policy_fingerprint
+from manheim_c7n_tools.yamlcache import BaseCache
+
+logger = logging.getLogger(__name__)
+
+#: Default path (relative to the current directory) of the cache directory.
+DEFAULT_PATH = '.c7n-validation-cache'
+
+#: Version of the cache file format; caches written with a different version
+#: (or a different c7n version) are discarded.
+CACHE_VERSION = 1
+
+#: Number of slowest policies to log after validating a config.
+SLOWEST_POLICIES = 5
+
+
+class ValidationCache(BaseCache):
+    """
+    Cache of the policies in one custodian config that c7n has found to be
+    valid, stored as JSON in the cache directory, in a file named for the
+    config (i.e. ``custodian_us-east-1.json``), so that concurrent ``validate``
+    steps for different regions never write the same file.
+
+    Each entry is keyed by the policy's :py:func:`~.policy_fingerprint`, and
+    records the policy name and any deprecation warnings that c7n reported for
+    it, so that they can be logged again when it is served from the cache.
+    The whole cache is discarded if it was written by a different version of
+    c7n, as its schema and validation may have changed. Entries for policies
+    that were not looked up since the cache was loaded (i.e. policies that
+    have been changed or removed) are evicted when it is saved.
+    """
+
+    description = 'validation cache'
+
+    entries_key = 'policies'
+
+    def __init__(self, config_path, path=DEFAULT_PATH):
+        """
+        Initialize the cache. The cache file is not read until the first call
+        to :py:meth:`~.get`.
+
+        :param config_path: path to the custodian config that the cache is for
+        :type config_path: str
+        :param path: path to the cache directory
+        :type path: str
+        """
+        super(ValidationCache, self).__init__(path, '%s.json' % (
+            os.path.splitext(os.path.basename(config_path))[0]
+        ))
+
+    @property
+    def _version(self):
+        from c7n.version import version
+        return [CACHE_VERSION, version]
+
+    def _read(self, fh):
+        return json.loads(fh.read().decode('utf-8'))
+
+    def _write(self, data, fh):
+        fh.write(json.dumps(data, sort_keys=True).encode('utf-8'))
+
+    def get(self, digest):
+        """
+        Return the cache entry for a policy, if it is known to be valid.
+
+        :param digest: the policy's :py:func:`~.policy_fingerprint`
+        :type digest: str
+        :return: dict with ``name`` and ``deprecations`` (str or None) keys,
+          or None if the policy is not in the cache
+        :rtype: dict
+        """
+        entry = self._get(digest)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def add(self, digest, name, deprecations=None):
+        """
+        Record a policy as valid.
+
+        :param digest: the policy's :py:func:`~.policy_fingerprint`
+        :type digest: str
+        :param name: the policy name
+        :type name: str
+        :param deprecations: deprecation warnings reported for the policy, if
+          any
+        :type deprecations: str
+        """
+        self._set(digest, {'name': name, 'deprecations': deprecations})
+
+
+def _validate_policy(policy, schm, null_config):
+    """
+    Validate one policy the same way that ``c7n.commands.validate()`` does;
+    its schema, then the policy itself, then check it for deprecated usage.
+
+    :param policy: policy dict
+    :type policy: dict
+    :param schm: c7n schema, from ``c7n.schema.generate()``
+    :type schm: dict
+    :param null_config: c7n options to load the policy with
+    :type null_config: c7n.config.Config
+    :return: 2-tuple of list of errors, and deprecation warnings (str) or None
+    :rtype: tuple
+    """
+    from c7n import deprecated, schema
+    from c7n.config import Bag
+    from c7n.policy import Policy
+    errors = schema.validate({'policies': [policy]}, schm)
+    if errors:
+        return errors, None
+    try:
+        p = Policy(policy, null_config, Bag())
+        p.validate()
+        report = deprecated.report(p)
+    except Exception as e:
+        return [
+            'Policy: %s is invalid: %s' % (policy.get('name', 'unknown'), e)
+        ], None
+    if not report:
+        return [], None
+    footnotes = deprecated.Footnotes()
+    res = report.format(footnotes=footnotes)
+    notes = footnotes()
+    if notes:
+        res += '\n' + notes
+    return [], res
+
+
+def validate_custodian_config(path, cache):
+    """
+    Validate a generated custodian config the same way that
+    ``c7n.commands.validate()`` does, but one policy at a time, and skipping
+    policies that ``cache`` records as valid. Only new or changed policies
+    are validated, and c7n's schema is only generated if there are any. The
+    time taken to validate each policy is logged at debug level, and the
+    slowest :py:const:`~.SLOWEST_POLICIES` at info level.
+
+    Like ``c7n.commands.validate()``, this logs all errors and then exits
+    non-zero if the config is invalid. Policies that were found to be valid
+    are added to the cache, and it is saved, either way.
+
+    :param path: path to the custodian config
+    :type path: str
+    :param cache: the cache of valid policies for this config
+    :type cache: ValidationCache
+    """
+    from c7n import schema
+    from c7n.config import Config
+    from c7n.exceptions import PolicyValidationError
+    from c7n.resources import load_resources
+    from c7n.schema import StructureParser
+    start = time.time()
+    data = PolicyArtifacts.load(path, validate=False).data
+    structure = StructureParser()
+    try:
+        structure.validate(data)
+    except PolicyValidationError as e:
+        logger.error('Configuration invalid: %s', path)
+        logger.error('%s', e)
+        sys.exit(1)
+    policies = data.get('policies') or []
+    errors = []
+    dupes = sorted(
+        name for name, count in Counter(
+            p.get('name', 'unknown') for p in policies
+        ).items() if count > 1
+    )
+    if dupes:
+        errors.append(
+            'Only one policy with a given name allowed, duplicates: %s' %
+            ', '.join(dupes)
+        )
+    todo = []
+    for p in policies:
+        digest = policy_fingerprint(p)
+        entry = cache.get(digest)
+        if entry is None:
+            todo.append((p, digest))
+        elif entry['deprecations']:
+            logger.warning(
+                'deprecated usage found in policy\n%s', entry['deprecations']
+            )
+    timings = []
+    if todo and not errors:
+        load_resources(structure.get_resource_types(
+            {'policies': [p for p, _ in todo]}
+        ))
+        schm = schema.generate()
+        null_config = Config.empty(dryrun=True, account_id='na', region='na')
+        for p, digest in todo:
+            name = p.get('name', 'unknown')
+            pstart = time.time()
+            perrors, deprecations = _validate_policy(p, schm, null_config)
+            duration = time.time() - pstart
+            logger.debug('Validated policy %s in %.3fs', name, duration)
+            timings.append((duration, name))
+            if deprecations:
+                logger.warning(
+                    'deprecated usage found in policy\n%s', deprecations
+                )
+            if perrors:
+                errors.extend(perrors)
+            else:
+                cache.add(digest, name, deprecations)
+    cache.save()
+    if timings:
+        logger.info('Slowest policies to validate: %s', ', '.join(
+            '%s (%.3fs)' % (name, duration) for duration, name in sorted(
+                timings, key=lambda x: (-x[0], x[1])
+            )[:SLOWEST_POLICIES]
+        ))
+    if errors:
+        logger.error('Configuration invalid: %s', path)
+        for e in errors:
+            logger.error('%s', e)
+        sys.exit(1)
+    logger.info(
+        'Configuration valid: %s (%d of %d policies validated, others cached; '
+        '%.2fs)', path, len(todo), len(policies), time.time() - start
+    )
@@ -0,0 +1,299 @@
+# Copyright 2017-2019 Manheim / Cox Automotive
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Persistent on-disk cache of parsed YAML files, used by :py:mod:`~.policygen`
+to avoid re-parsing policy files that have not changed since the last run,
+and the :py:class:`~.BaseCache` class that it (and
+:py:class:`~.ValidationCache`) are built on.
+"""
+
+import abc
+import os
+import pickle
+import hashlib
+import logging
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+#: Default path (relative to the current directory) of the cache directory.
+DEFAULT_PATH = '.policygen-cache'
+
+#: Version of the cache file format; caches written with a different version
+#: (or a different PyYAML version) are discarded.
+CACHE_VERSION = 1
+
+
+class BaseCache(object, metaclass=abc.ABCMeta):
+    """
+    Base class for persistent on-disk caches, stored in a single file in the
+    cache directory. The file holds a dict of entries (keyed by str), along
+    with the :py:attr:`~._version` that wrote it. It is not read until the
+    first lookup, and is discarded if it was written by a different version.
+    Subclasses look up entries with :py:meth:`~._get` and record new or
+    updated ones with :py:meth:`~._set`. Entries that were not looked up or
+    set since the cache was loaded are evicted when it is saved.
+    """
+
+    #: Name of the cache, for log messages.
+    description = 'cache'
+
+    #: Key of the dict of entries in the cache file.
+    entries_key = 'entries'
+
+    def __init__(self, path, filename):
+        """
+        Initialize the cache.
+
+        :param path: path to the cache directory
+        :type path: str
+        :param filename: name of the cache file within the directory
+        :type filename: str
+        """
+        self.path = path
+        self._file = os.path.join(path, filename)
+        self._entries = None
+        self._used = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    @abc.abstractmethod
+    def _version(self):
+        """
+        Return the version of the cache; a JSON-serializable list of the
+        cache format version and the versions of anything that affects the
+        cached data.
+
+        :rtype: list
+        """
+        pass  # nocoverage
+
+    @abc.abstractmethod
+    def _read(self, fh):
+        """
+        Deserialize and return the contents of the cache file.
+
+        :param fh: the cache file, opened for reading in binary mode
+        :return: dict with ``version`` and :py:attr:`~.entries_key` keys
+        :rtype: dict
+        """
+        pass  # nocoverage
+
+    @abc.abstractmethod
+    def _write(self, data, fh):
+        """
+        Serialize ``data`` to the cache file.
+
+        :param data: dict with ``version`` and :py:attr:`~.entries_key` keys
+        :type data: dict
+        :param fh: the cache file, opened for writing in binary mode
+        """
+        pass  # nocoverage
+
+    def _load(self):
+        """
+        Load entries from the cache file, if it exists and was written by the
+        same :py:attr:`~._version`. A missing or unreadable cache is treated
+        as empty.
+        """
+        self._entries = {}
+        if not os.path.exists(self._file):
+            logger.debug('No %s at %s', self.description, self._file)
+            return
+        try:
+            with open(self._file, 'rb') as fh:
+                data = self._read(fh)
+        except Exception as ex:
+            logger.warning(
+                'Ignoring unreadable %s at %s: %s',
+                self.description, self._file, ex
+            )
+            return
+        if data.get('version') != self._version:
+            logger.info(
+                'Ignoring %s at %s from a different version',
+                self.description, self._file
+            )
+            return
+        self._entries = data[self.entries_key]
+        logger.debug(
+            'Loaded %s at %s with %d entries',
+            self.description, self._file, len(self._entries)
+        )
+
+    def _get(self, key):
+        """
+        Return the cached entry for ``key`` (loading the cache if needed) and
+        keep it when the cache is saved, or return None if there is no entry.
+        Does not count hits or misses.
+
+        :param key: the entry's key
+        :type key: str
+        :return: the entry, or None
+        """
+        if self._entries is None:
+            self._load()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._used[key] = entry
+        return entry
+
+    def _set(self, key, entry):
+        """
+        Add or replace the entry for ``key``, to be written when the cache is
+        saved.
+
+        :param key: the entry's key
+        :type key: str
+        :param entry: the entry
+        """
+        self._used[key] = entry
+        self._dirty = True
+
+    def save(self):
+        """
+        Atomically write every entry that was looked up with :py:meth:`~._get`
+        or set with :py:meth:`~._set` to the cache file, evicting all others.
+        Does nothing if the cache was never loaded, or if it is unchanged.
+        """
+        if self._entries is None:
+            return
+        logger.info(
+            '%s: %d hits, %d misses',
+            self.description[0].upper() + self.description[1:],
+            self.hits, self.misses
+        )
+        if not self._dirty and len(self._used) == len(self._entries):
+            return
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        tmp = self._file + '.tmp'
+        with open(tmp, 'wb') as fh:
+            self._write(
+                {'version': self._version, self.entries_key: self._used}, fh
+            )
+        os.replace(tmp, self._file)
+        logger.debug(
+            'Wrote %s at %s with %d entries (%d evicted)', self.description,
+            self._file, len(self._used),
+            len(set(self._entries) - set(self._used))
+        )
+        self._entries = dict(self._used)
+        self._dirty = False
+
+
+class YamlCache(BaseCache):
+    """
+    Cache of parsed YAML files, stored as a pickle at ``yaml.pickle`` in the
+    cache directory.
+
+    Each entry is keyed by file path, and records the file's size, mtime and
+    SHA256 hash along with the (pickled) parse tree. A file whose size and
+    mtime are unchanged is served from the cache without being read; if
+    either has changed, the file is read and hashed, and only parsed again if
+    its hash has changed. Entries for files that were not read since the cache
+    was loaded (i.e. files that have been removed) are evicted when it is
+    saved.
+    """
+
+    description = 'YAML cache'
+
+    entries_key = 'files'
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Initialize the cache. The cache file is not read until the first call
+        to :py:meth:`~.get` or :py:meth:`~.get_many`.
+
+        :param path: path to the cache directory
+        :type path: str
+        """
+        super(YamlCache, self).__init__(path, 'yaml.pickle')
+
+    @property
+    def _version(self):
+        return [CACHE_VERSION, yaml.__version__]
+
+    def _read(self, fh):
+        return pickle.load(fh)
+
+    def _write(self, data, fh):
+        pickle.dump(data, fh, pickle.HIGHEST_PROTOCOL)
+
+    def get(self, path, parse):
+        """
+        Return the parsed contents of the YAML file at ``path``; from the
+        cache if the file is unchanged, otherwise by calling ``parse``.
+
+        :param path: path to the YAML file
+        :type path: str
+        :param parse: callable taking the path and the file contents (str),
+          and returning the parsed contents
+        :type parse: callable
+        :return: parsed file contents
+        """
+        return self.get_many(
+            [path], lambda items: [parse(p, c) for p, c in items]
+        )[path]
+
+    def get_many(self, paths, parse):
+        """
+        Return the parsed contents of each of the YAML files at ``paths``;
+        from the cache for files that are unchanged, otherwise by calling
+        ``parse`` once with all of the others (i.e. so that they can be parsed
+        in parallel).
+
+        :param paths: paths to the YAML files
+        :type paths: list
+        :param parse: callable taking a list of (path, file contents) tuples,
+          and returning a list of the parsed contents of each, in order
+        :type parse: callable
+        :return: dict of path to parsed file contents
+        :rtype: dict
+        """
+        res = {}
+        misses = []
+        for path in paths:
+            st = os.stat(path)
+            entry = self._get(path)
+            if entry is not None and entry[:2] == (
+                st.st_size, st.st_mtime_ns
+            ):
+                self.hits += 1
+                res[path] = pickle.loads(entry[3])
+                continue
+            with open(path, 'rb') as fh:
+                raw = fh.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if entry is not None and entry[2] == digest:
+                self.hits += 1
+                self._set(path, (st.st_size, st.st_mtime_ns) + entry[2:])
+                res[path] = pickle.loads(entry[3])
+                continue
+            self.misses += 1
+            misses.append(
+                (path, raw.decode('utf-8'), st.st_size, st.st_mtime_ns, digest)
+            )
+        if not misses:
+            return res
+        parsed = parse([m[:2] for m in misses])
+        for m, data in zip(misses, parsed):
+            self._set(m[0], (
+                m[2], m[3], m[4], pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+            ))
+            res[m[0]] = data
+        return res